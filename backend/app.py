@@ -1,19 +1,82 @@
+import logging
+import os
+import queue
+from contextlib import asynccontextmanager
+from logging.handlers import QueueHandler, QueueListener
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 # Import database manager
 from database import db_manager
 
+# Import response cache
+from cache import cache_manager, ResponseCacheMiddleware, IdempotencyMiddleware
+from services.analysis_service import AnalysisJobService
+from responses import FastJSONResponse
+from crossmint.crossmint import Crossmint
+
 # Import routers
 from routes import users, accounts, transactions, collaterals
 
+
+def start_log_listener() -> QueueListener:
+    """
+    Route log records through a queue so formatting and writing them happens
+    on a background thread instead of in request handlers
+    """
+    root = logging.getLogger()
+    handlers = root.handlers[:]
+    if not handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        handlers = [handler]
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+
+    log_queue = queue.SimpleQueue()
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the database pool, response cache and Crossmint client on startup and close them on shutdown"""
+    log_listener = start_log_listener()
+    await db_manager.initialize()
+    await cache_manager.initialize()
+    AnalysisJobService.require_shared_store()
+    app.state.pool = db_manager.pool
+    app.state.crossmint = Crossmint()
+    yield
+    await app.state.crossmint.aclose()
+    AnalysisJobService.shutdown()
+    await cache_manager.close()
+    await db_manager.close()
+    log_listener.stop()
+
+
 app = FastAPI(
     title="Celebral Valley API",
     description="A DeFi lending and borrowing platform API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
-# Add CORS middleware
+# Cache read-heavy GET endpoints
+app.add_middleware(ResponseCacheMiddleware)
+
+# Replay retried writes carrying an Idempotency-Key
+app.add_middleware(IdempotencyMiddleware)
+
+# Add CORS middleware. Added last so it is outermost: cached, stale, 304 and
+# replayed responses are built without the inner response's headers, and the
+# allowed origin depends on the request, so it must not be cached.
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Configure this properly for production
@@ -55,17 +118,3 @@ async def health_check():
         "message": "API is running",
         "database": db_health
     }
-
-@app.on_event("startup")
-async def startup_event():
-    """Initialize database connections on startup"""
-    ...
-    await db_manager.initialize()
-
-@app.on_event("shutdown") 
-async def shutdown_event():
-    """Close database connections on shutdown"""
-    await db_manager.close()
-
-
-
@@ -0,0 +1,406 @@
+import os
+import re
+import time
+import hashlib
+import fnmatch
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+from email.utils import formatdate
+import orjson
+from fastapi import Request
+from fastapi.responses import Response
+from starlette.datastructures import Headers
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send, Message
+from dotenv import load_dotenv
+
+try:
+    import redis.asyncio as redis
+except ImportError:
+    redis = None
+
+# Load environment variables
+load_dotenv()
+
+# Cache lifetimes in seconds
+TTL_SHORT = 5
+TTL_NORMAL = 30
+TTL_LONG = 60
+
+# How long an expired entry is kept around to be served if the database is down
+STALE_WINDOW = 300
+
+# Cached GET routes and their lifetimes; the first matching pattern wins
+CACHE_RULES = [
+    (re.compile(r"^/accounts/number/[^/]+$"), TTL_LONG),
+    (re.compile(r"^/accounts/user/[^/]+$"), TTL_NORMAL),
+    (re.compile(r"^/accounts/[^/]+$"), TTL_NORMAL),
+    (re.compile(r"^/collaterals/?$"), TTL_SHORT),
+    (re.compile(r"^/collaterals/[^/]+$"), TTL_NORMAL),
+    (re.compile(r"^/users/email/[^/]+$"), TTL_LONG),
+    (re.compile(r"^/users/username/[^/]+$"), TTL_LONG),
+    (re.compile(r"^/users/[^/]+$"), TTL_LONG),
+]
+
+# Without Redis, entries are kept in process: at most LOCAL_MAX_ENTRIES, least
+# recently used evicted first, with expired ones swept every LOCAL_SWEEP_INTERVAL
+LOCAL_MAX_ENTRIES = int(os.getenv("LOCAL_CACHE_MAX_ENTRIES", "10000"))
+LOCAL_SWEEP_INTERVAL = 60
+
+# Idempotency records: a request in progress holds its key for IN_FLIGHT_TTL,
+# a finished response is replayed for IDEMPOTENCY_TTL
+IN_FLIGHT_TTL = 300
+IDEMPOTENCY_TTL = 86400
+IN_FLIGHT = b"IN-FLIGHT"
+
+# Cache namespaces made stale by a successful write under each path prefix.
+# Collateral approval and loan extension post transactions, which move
+# account balances, so they also invalidate accounts.
+INVALIDATION_RULES = {
+    "/accounts": ("accounts",),
+    "/collaterals": ("collaterals", "accounts"),
+    "/transactions": ("accounts",),
+    "/users": ("users", "accounts"),
+}
+
+
+class CacheManager:
+    """Response cache backed by Redis, or a bounded in-process LRU when Redis is unavailable"""
+
+    def __init__(self):
+        self.redis_url: Optional[str] = None
+        self.client = None
+        self._local: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._next_sweep = 0.0
+        self._initialized = False
+
+    @property
+    def backend(self) -> str:
+        return "redis" if self.client is not None else "memory"
+
+    async def initialize(self) -> None:
+        """Connect to Redis if REDIS_URL is set, otherwise use the local cache"""
+        if self._initialized:
+            return
+
+        self.redis_url = os.getenv("REDIS_URL")
+
+        if self.redis_url and redis is not None:
+            try:
+                self.client = redis.from_url(self.redis_url)
+                await self.client.ping()
+            except Exception as e:
+                print(f"⚠️  Redis unavailable ({e}), using in-process cache")
+                self.client = None
+
+        self._initialized = True
+        print(f"Response cache initialized ({self.backend})")
+
+    def _local_get(self, key: str) -> Optional[Any]:
+        item = self._local.get(key)
+        if item is None:
+            return None
+        if item[0] < time.time():
+            self._local.pop(key, None)
+            return None
+        self._local.move_to_end(key)
+        return item[1]
+
+    def _local_set(self, key: str, value: Any, ttl: int) -> None:
+        now = time.time()
+        if now >= self._next_sweep:
+            for expired in [k for k, (expires_at, _) in self._local.items() if expires_at < now]:
+                del self._local[expired]
+            self._next_sweep = now + LOCAL_SWEEP_INTERVAL
+        self._local[key] = (now + ttl, value)
+        self._local.move_to_end(key)
+        while len(self._local) > LOCAL_MAX_ENTRIES:
+            self._local.popitem(last=False)
+
+    async def close(self) -> None:
+        """Close the Redis connection and drop local entries"""
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+        self._local.clear()
+        self._initialized = False
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a cached entry, or None on a miss or cache failure"""
+        if self.client is None:
+            return self._local_get(key)
+
+        try:
+            fields = await self.client.hgetall(key)
+        except Exception as e:
+            print(f"⚠️  Cache read failed: {e}")
+            return None
+        if not fields:
+            return None
+        return {
+            "body": fields[b"body"],
+            "etag": fields[b"etag"].decode(),
+            "last_modified": fields[b"last_modified"].decode(),
+            "media_type": fields[b"media_type"].decode(),
+            "stored_at": float(fields[b"stored_at"]),
+        }
+
+    async def set(self, key: str, entry: Dict[str, Any], ttl: int) -> None:
+        """Store an entry for ttl seconds"""
+        if self.client is None:
+            self._local_set(key, entry, ttl)
+            return
+
+        try:
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.hset(key, mapping=entry)
+                pipe.expire(key, ttl)
+                await pipe.execute()
+        except Exception as e:
+            print(f"⚠️  Cache write failed: {e}")
+
+    async def get_value(self, key: str) -> Optional[bytes]:
+        """Return a raw cached value, or None on a miss or cache failure"""
+        if self.client is None:
+            return self._local_get(key)
+
+        try:
+            return await self.client.get(key)
+        except Exception as e:
+            print(f"⚠️  Cache read failed: {e}")
+            return None
+
+    async def set_value(self, key: str, value: bytes, ttl: int) -> None:
+        """Store a raw value for ttl seconds"""
+        if self.client is None:
+            self._local_set(key, value, ttl)
+            return
+
+        try:
+            await self.client.setex(key, ttl, value)
+        except Exception as e:
+            print(f"⚠️  Cache write failed: {e}")
+
+    async def set_value_if_absent(self, key: str, value: bytes, ttl: int) -> bool:
+        """
+        Store a raw value only if the key is not set; returns whether it was stored
+
+        Returns False if Redis fails, so callers using this as a lock back off
+        rather than proceed unguarded.
+        """
+        if self.client is None:
+            if self._local_get(key) is not None:
+                return False
+            self._local_set(key, value, ttl)
+            return True
+
+        try:
+            return bool(await self.client.set(key, value, ex=ttl, nx=True))
+        except Exception as e:
+            print(f"⚠️  Cache write failed: {e}")
+            return False
+
+    async def delete(self, key: str) -> None:
+        """Remove a single key"""
+        if self.client is None:
+            self._local.pop(key, None)
+            return
+
+        try:
+            await self.client.delete(key)
+        except Exception as e:
+            print(f"⚠️  Cache delete failed: {e}")
+
+    async def invalidate(self, namespace: str) -> None:
+        """Drop every entry in a namespace"""
+        pattern = f"{namespace}:*"
+        if self.client is None:
+            for key in [k for k in self._local if fnmatch.fnmatchcase(k, pattern)]:
+                self._local.pop(key, None)
+            return
+
+        try:
+            keys = [key async for key in self.client.scan_iter(match=pattern, count=500)]
+            if keys:
+                await self.client.delete(*keys)
+        except Exception as e:
+            print(f"⚠️  Cache invalidation failed: {e}")
+
+
+def _cache_ttl(path: str) -> Optional[int]:
+    """TTL for a cacheable GET path, or None if the path is not cached"""
+    for pattern, ttl in CACHE_RULES:
+        if pattern.match(path):
+            return ttl
+    return None
+
+
+def _cache_key(request: Request) -> str:
+    """Build a cache key from the path and the sorted query string"""
+    path = request.url.path
+    namespace = path.strip("/").split("/", 1)[0]
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    return f"{namespace}:{path}?{query}"
+
+
+def _cached_response(entry: Dict[str, Any], ttl: int, state: str) -> Response:
+    """Rebuild a response from a cache entry"""
+    return Response(
+        content=entry["body"],
+        media_type=entry["media_type"],
+        headers={
+            "ETag": entry["etag"],
+            "Last-Modified": entry["last_modified"],
+            "Cache-Control": f"max-age={ttl}",
+            "X-Cache": state,
+        },
+    )
+
+
+class ResponseCacheMiddleware(BaseHTTPMiddleware):
+    """Cache read-heavy GET endpoints and invalidate them on writes"""
+
+    async def dispatch(self, request: Request, call_next):
+        if request.method in ("POST", "PUT", "PATCH", "DELETE"):
+            response = await call_next(request)
+            if response.status_code < 400:
+                for prefix, namespaces in INVALIDATION_RULES.items():
+                    if request.url.path.startswith(prefix):
+                        for namespace in namespaces:
+                            await cache_manager.invalidate(namespace)
+            return response
+
+        ttl = _cache_ttl(request.url.path) if request.method == "GET" else None
+        if ttl is None:
+            return await call_next(request)
+
+        key = _cache_key(request)
+        entry = await cache_manager.get(key)
+
+        if entry is not None and time.time() - entry["stored_at"] < ttl:
+            if request.headers.get("if-none-match") == entry["etag"]:
+                return Response(status_code=304, headers={"ETag": entry["etag"]})
+            return _cached_response(entry, ttl, "HIT")
+
+        try:
+            response = await call_next(request)
+        except Exception:
+            if entry is None:
+                raise
+            response = None
+
+        # Serve the last good copy if the handler failed (e.g. database outage)
+        if response is None or response.status_code >= 500:
+            if entry is not None:
+                stale = _cached_response(entry, ttl, "STALE")
+                stale.headers["Warning"] = '110 - "Response is Stale"'
+                return stale
+            return response
+
+        if response.status_code != 200:
+            return response
+
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        entry = {
+            "body": body,
+            "etag": f'"{hashlib.sha1(body).hexdigest()}"',
+            "last_modified": formatdate(usegmt=True),
+            "media_type": response.headers.get("content-type", "application/json"),
+            "stored_at": time.time(),
+        }
+        await cache_manager.set(key, entry, ttl + STALE_WINDOW)
+        return _cached_response(entry, ttl, "MISS")
+
+
+class IdempotencyMiddleware:
+    """Replay the stored response for a write retried with the same Idempotency-Key"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT", "PATCH"):
+            await self.app(scope, receive, send)
+            return
+
+        idempotency_key = Headers(scope=scope).get("idempotency-key")
+        if not idempotency_key:
+            await self.app(scope, receive, send)
+            return
+
+        # Read the whole body up front; it is part of the key and is replayed
+        # to the route below
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+        digest = hashlib.sha256()
+        for part in (idempotency_key.encode(), scope["path"].encode(), body):
+            digest.update(part)
+            digest.update(b"\0")
+        key = f"idem:{digest.hexdigest()}"
+
+        stored = await cache_manager.get_value(key)
+        if stored is None and not await cache_manager.set_value_if_absent(key, IN_FLIGHT, IN_FLIGHT_TTL):
+            stored = IN_FLIGHT
+
+        if stored == IN_FLIGHT:
+            response = Response(
+                content=orjson.dumps({"detail": "A request with this Idempotency-Key is still in progress"}),
+                status_code=409,
+                media_type="application/json"
+            )
+            await response(scope, receive, send)
+            return
+
+        if stored is not None:
+            # Stored as a JSON head line followed by the raw body
+            head, _, replay_body = stored.partition(b"\n")
+            head = orjson.loads(head)
+            await send({
+                "type": "http.response.start",
+                "status": head["status"],
+                "headers": [(k.encode("latin-1"), v.encode("latin-1")) for k, v in head["headers"]]
+                           + [(b"idempotent-replayed", b"true")]
+            })
+            await send({"type": "http.response.body", "body": replay_body})
+            return
+
+        body_sent = False
+
+        async def replay_receive() -> Message:
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        status = 500
+        headers = []
+        chunks = []
+
+        async def capture_send(message: Message) -> None:
+            nonlocal status, headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = [(k.decode("latin-1"), v.decode("latin-1")) for k, v in message.get("headers", [])]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        finally:
+            if status >= 500:
+                # Let the client retry a failed request
+                await cache_manager.delete(key)
+            else:
+                head = orjson.dumps({"status": status, "headers": headers})
+                await cache_manager.set_value(key, head + b"\n" + b"".join(chunks), IDEMPOTENCY_TTL)
+
+
+# Global cache manager instance
+cache_manager = CacheManager()
@@ -0,0 +1,50 @@
+"""
+Shared pytest fixtures
+
+Expensive objects are built once per session and shared by every test that
+asks for them.
+"""
+
+import base64
+from pathlib import Path
+from typing import Optional, Tuple
+
+import pytest
+import pytest_asyncio
+
+ROLEX_IMAGE = Path(__file__).parent / "rolex.jpeg"
+
+
+def load_rolex_image() -> Optional[Tuple[bytes, str]]:
+    """Read rolex.jpeg and return (raw bytes, base64 text), or None if it is missing"""
+    if not ROLEX_IMAGE.exists():
+        return None
+    image_data = ROLEX_IMAGE.read_bytes()
+    return image_data, base64.b64encode(image_data).decode('utf-8')
+
+
+@pytest.fixture(scope="session")
+def integrator():
+    """One RAG3LLAMPIIntegrator for the whole session"""
+    # Imported here so test modules can stub rag3 and llmapi first
+    from rag3_llampi_integration import RAG3LLAMPIIntegrator
+    return RAG3LLAMPIIntegrator(verbose=False)
+
+
+@pytest.fixture(scope="session")
+def rolex_image() -> Optional[Tuple[bytes, str]]:
+    """rolex.jpeg read and base64-encoded once for the whole session"""
+    return load_rolex_image()
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def e2e_flow():
+    """One E2ETestFlow against the running backend, with its user and account
+    already looked up; the e2e tests are skipped when no backend is running"""
+    from test_yashvika_e2e_flow import BASE_URL, E2ETestFlow
+    async with E2ETestFlow() as flow:
+        if not await flow.make_request("GET", "/health"):
+            pytest.skip(f"Backend server is not running on {BASE_URL}")
+        if not (await flow.step_1_get_user() and await flow.step_2_get_account()):
+            pytest.fail("Could not look up the test user and account")
+        yield flow
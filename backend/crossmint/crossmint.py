@@ -1,12 +1,30 @@
 import requests
 import os
-import asyncio
 import logging
+from typing import Optional
+
+import httpx
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Keep-alive HTTP/2 connection pool for Crossmint API calls"""
+    return httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+        timeout=10
+    )
+
 
 class Crossmint:
-    def __init__(self):
+    def __init__(self, http: Optional[httpx.AsyncClient] = None):
         self.api_key = os.getenv("CROSSMINT_API_KEY")
         self.logger = logging.getLogger(__name__)
+        # Shared across transfers so each one skips the TCP/TLS handshake
+        self.http = http or create_http_client()
+
+    async def aclose(self):
+        """Close the HTTP connection pool"""
+        await self.http.aclose()
 
     def get_balance(self, user_id):
         url = "https://staging.crossmint.com/api/2025-06-09/wallets/userId:"+user_id+":evm/balances"
@@ -31,9 +49,7 @@ class Crossmint:
             
             self.logger.info(f"Making Crossmint transfer: {signer} -> {recipient_address}, amount: {amount}")
             
-            # Use asyncio to run the synchronous requests call
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(None, lambda: requests.post(url, json=payload, headers=headers))
+            response = await self.http.post(url, json=payload, headers=headers)
             
             if response.status_code == 200 or response.status_code == 201:
                 result = response.json()
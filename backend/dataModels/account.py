@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ConfigDict
 from typing import Optional
 from datetime import datetime
 from enum import Enum
@@ -43,8 +43,7 @@ class Account(AccountBase):
     updated_at: datetime = Field(..., title="Updated At", description="Last update timestamp")
     closed_at: Optional[datetime] = Field(None, title="Closed At", description="When the account was closed")
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class AccountResponse(Account):
@@ -54,10 +53,11 @@ class AccountResponse(Account):
 
 class AccountListResponse(BaseModel):
     """Response model for listing accounts"""
-    accounts: list[Account] = Field(..., title="Accounts", description="List of accounts")
-    total: int = Field(..., title="Total", description="Total number of accounts")
-    page: int = Field(..., title="Page", description="Current page number")
+    accounts: list[Account] = Field(..., title="Accounts", description="Accounts on this page")
+    total: Optional[int] = Field(None, title="Total", description="Estimated total number of accounts (only reported for unfiltered listings)")
     page_size: int = Field(..., title="Page Size", description="Number of accounts per page")
+    next_cursor: Optional[str] = Field(None, title="Next Cursor", description="Cursor for the next page, or null on the last page")
+    has_more: bool = Field(False, title="Has More", description="Whether another page is available")
 
 
 class AccountSearchParams(BaseModel):
@@ -65,5 +65,5 @@ class AccountSearchParams(BaseModel):
     user_id: Optional[str] = Field(None, title="User ID", description="Filter by user ID")
     account_number: Optional[str] = Field(None, title="Account Number", description="Filter by account number (partial match)")
     status: Optional[AccountStatus] = Field(None, title="Status", description="Filter by status")
-    page: int = Field(default=1, title="Page", description="Page number", ge=1)
     page_size: int = Field(default=20, title="Page Size", description="Number of accounts per page", ge=1, le=100)
+    cursor: Optional[str] = Field(None, title="Cursor", description="Opaque cursor returned as next_cursor by the previous page")
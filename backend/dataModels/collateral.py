@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import Optional, List
+from pydantic import BaseModel, Field, ConfigDict
+from typing import Optional, List, Dict, Any
 from datetime import datetime
 from enum import Enum
 from decimal import Decimal
@@ -13,6 +13,13 @@ class CollateralStatus(str, Enum):
     DEFAULTED = "defaulted"
 
 
+class AnalysisJobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
 class CollateralBase(BaseModel):
     """Base collateral model with common fields"""
     user_id: str = Field(..., title="User ID", description="ID of the user who owns this collateral")
@@ -34,7 +41,8 @@ class CollateralCreateRequest(BaseModel):
     user_id: str = Field(..., title="User ID", description="ID of the user who owns this collateral")
     name: str = Field(..., title="Name", description="Name of the collateral", min_length=1, max_length=200)
     description: str = Field(..., title="Description", description="Description of the collateral", min_length=1, max_length=1000)
-    images: Optional[List[str]] = Field([], title="Images", description="List of image URLs/paths for the collateral")
+    images: Optional[List[str]] = Field([], title="Images", description="Paths returned by /collaterals/upload-image for the collateral's images")
+    reuse_analysis: bool = Field(True, title="Reuse Analysis", description="Reuse a cached analysis of an identical or near-identical image; false forces a fresh analysis")
 
 
 class CollateralCreate(CollateralBase):
@@ -50,7 +58,7 @@ class CollateralUpdate(BaseModel):
     due_date: Optional[datetime] = Field(None, title="Due Date", description="Due date for the collateral loan")
     status: Optional[CollateralStatus] = Field(None, title="Status", description="Collateral status")
     images: Optional[List[str]] = Field(None, title="Images", description="List of image URLs/paths for the collateral")
-    metadata: Optional[dict] = Field(None, title="Metadata", description="Additional collateral metadata")
+    metadata: Optional[dict] = Field(None, title="Metadata", description="Metadata keys to set; merged into the existing metadata")
 
 
 class CollateralApproveRequest(BaseModel):
@@ -65,8 +73,7 @@ class Collateral(CollateralBase):
     created_at: datetime = Field(..., title="Created At", description="Collateral creation timestamp")
     updated_at: datetime = Field(..., title="Last update timestamp", description="Last update timestamp")
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class CollateralResponse(Collateral):
@@ -76,28 +83,42 @@ class CollateralResponse(Collateral):
 
 class CollateralListResponse(BaseModel):
     """Response model for listing collaterals"""
-    collaterals: list[Collateral] = Field(..., title="Collaterals", description="List of collaterals")
-    total: int = Field(..., title="Total", description="Total number of collaterals")
-    page: int = Field(..., title="Page", description="Current page number")
+    collaterals: list[Collateral] = Field(..., title="Collaterals", description="Collaterals on this page")
+    total: Optional[int] = Field(None, title="Total", description="Estimated total number of collaterals (only reported for unfiltered listings)")
     page_size: int = Field(..., title="Page Size", description="Number of collaterals per page")
+    next_cursor: Optional[str] = Field(None, title="Next Cursor", description="Cursor for the next page, or null on the last page")
+    has_more: bool = Field(False, title="Has More", description="Whether another page is available")
+
+
+class CollateralAnalysisDetails(BaseModel):
+    """Full per-image analysis results recorded when a collateral was created"""
+    collateral_id: str = Field(..., title="Collateral ID", description="ID of the analyzed collateral")
+    image_analyses: List[Dict[str, Any]] = Field(..., title="Image Analyses", description="Pricing and similar-image results for each image")
+    created_at: datetime = Field(..., title="Created At", description="When the analysis was recorded")
 
 
 class CollateralSearchParams(BaseModel):
     """Parameters for searching/filtering collaterals"""
     user_id: Optional[str] = Field(None, title="User ID", description="Filter by user ID")
     status: Optional[CollateralStatus] = Field(None, title="Status", description="Filter by status")
-    page: int = Field(default=1, title="Page", description="Page number", ge=1)
     page_size: int = Field(default=20, title="Page Size", description="Number of collaterals per page", ge=1, le=100)
+    cursor: Optional[str] = Field(None, title="Cursor", description="Opaque cursor returned as next_cursor by the previous page")
 
 
 # New models for image analysis integration
 class ImageAnalysisRequest(BaseModel):
     """Request model for analyzing an image for collateral assessment"""
     user_id: str = Field(..., title="User ID", description="ID of the user requesting the analysis")
-    image_path: str = Field(..., title="Image Path", description="Path to the image file to analyze")
+    image_path: str = Field(..., title="Image Path", description="Path returned by /collaterals/upload-image for the image to analyze")
     user_description: Optional[str] = Field("", title="User Description", description="User's description of the item")
     top_k: Optional[int] = Field(3, title="Top K", description="Number of similar images to find", ge=1, le=10)
     score_threshold: Optional[float] = Field(0.0, title="Score Threshold", description="Minimum similarity score threshold")
+    multiview: bool = Field(False, title="Multi-view", description="Search with several augmented views of the image in one batched query")
+
+
+class BatchImageAnalysisRequest(BaseModel):
+    """Request model for analyzing several images in one call"""
+    items: List[ImageAnalysisRequest] = Field(..., title="Items", description="Images to analyze", min_length=1, max_length=20)
 
 
 class SimilarImageAnalysis(BaseModel):
@@ -111,6 +132,7 @@ class SimilarImageAnalysis(BaseModel):
     currency: str = Field(..., title="Currency", description="Currency of the price")
     marketplace: str = Field(..., title="Marketplace", description="Marketplace where price was found")
     confidence: str = Field(..., title="Confidence", description="Confidence level of the analysis")
+    pricing_skipped: bool = Field(False, title="Pricing Skipped", description="Whether pricing was skipped for this low-similarity match")
 
 
 class InputImageAnalysis(BaseModel):
@@ -131,6 +153,7 @@ class ImageAnalysisSummary(BaseModel):
     total_images_processed: int = Field(..., title="Total Images Processed", description="Total number of images analyzed")
     successful_price_calculations: int = Field(..., title="Successful Price Calculations", description="Number of successful price calculations")
     failed_price_calculations: int = Field(..., title="Failed Price Calculations", description="Number of failed price calculations")
+    skipped_price_calculations: int = Field(0, title="Skipped Price Calculations", description="Number of low-similarity matches deliberately left unpriced")
     success_rate: str = Field(..., title="Success Rate", description="Percentage of successful calculations")
     input_image_found: bool = Field(..., title="Input Image Found", description="Whether input image analysis was successful")
     similar_images_found: int = Field(..., title="Similar Images Found", description="Number of similar images found")
@@ -142,3 +165,16 @@ class ImageAnalysisResponse(BaseModel):
     similar_images_analysis: List[SimilarImageAnalysis] = Field(..., title="Similar Images Analysis", description="Analysis results for similar images")
     summary: ImageAnalysisSummary = Field(..., title="Summary", description="Summary statistics of the analysis")
     metadata: dict = Field(..., title="Metadata", description="Additional metadata about the analysis")
+
+
+class ImageAnalysisJobResponse(BaseModel):
+    """Response model for a background image analysis job"""
+    job_id: str = Field(..., title="Job ID", description="ID to poll for the analysis result")
+    status: AnalysisJobStatus = Field(..., title="Status", description="Current status of the job")
+    result: Optional[ImageAnalysisResponse] = Field(None, title="Result", description="Analysis results once the job has completed")
+    error: Optional[str] = Field(None, title="Error", description="Error message if the job failed")
+
+
+class BatchImageAnalysisJobResponse(BaseModel):
+    """Response model for a batch of image analysis jobs"""
+    items: List[ImageAnalysisJobResponse] = Field(..., title="Items", description="One job per requested image, in request order")
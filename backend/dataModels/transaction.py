@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, ConfigDict
+from typing import Optional, List, Dict, Any
 from datetime import datetime
 from enum import Enum
 
@@ -69,8 +69,7 @@ class Transaction(TransactionBase):
     failed_at: Optional[datetime] = Field(None, title="Failed At", description="Transaction failure timestamp")
     failure_reason: Optional[str] = Field(None, title="Failure Reason", description="Reason for transaction failure")
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class TransactionResponse(Transaction):
@@ -80,10 +79,11 @@ class TransactionResponse(Transaction):
 
 class TransactionListResponse(BaseModel):
     """Response model for listing transactions"""
-    transactions: list[Transaction] = Field(..., title="Transactions", description="List of transactions")
-    total: int = Field(..., title="Total", description="Total number of transactions")
-    page: int = Field(..., title="Page", description="Current page number")
+    transactions: list[Transaction] = Field(..., title="Transactions", description="Transactions on this page")
+    total: Optional[int] = Field(None, title="Total", description="Estimated total number of transactions (only reported for unfiltered listings)")
     page_size: int = Field(..., title="Page Size", description="Number of transactions per page")
+    next_cursor: Optional[str] = Field(None, title="Next Cursor", description="Cursor for the next page, or null on the last page")
+    has_more: bool = Field(False, title="Has More", description="Whether another page is available")
 
 
 class TransactionSearchParams(BaseModel):
@@ -93,8 +93,8 @@ class TransactionSearchParams(BaseModel):
     transaction_type: Optional[TransactionType] = Field(None, title="Transaction Type", description="Filter by transaction type")
     status: Optional[TransactionStatus] = Field(None, title="Status", description="Filter by status")
     reference_number: Optional[str] = Field(None, title="Reference Number", description="Filter by reference number")
-    page: int = Field(default=1, title="Page", description="Page number", ge=1)
     page_size: int = Field(default=20, title="Page Size", description="Number of transactions per page", ge=1, le=100)
+    cursor: Optional[str] = Field(None, title="Cursor", description="Opaque cursor returned as next_cursor by the previous page")
 
 
 # Specific transaction request models
@@ -150,3 +150,27 @@ class CreateLoanRequest(BaseModel):
     description: Optional[str] = Field(None, title="Description", description="Loan description")
     reference_number: Optional[str] = Field(None, title="Reference Number", description="External reference number")
     metadata: Optional[dict] = Field(None, title="Metadata", description="Additional loan metadata")
+
+
+class TransactionBatchItem(BaseModel):
+    """One operation of a transaction batch"""
+    id: str = Field(..., title="ID", description="Client-chosen ID echoed in the matching response")
+    transaction_type: TransactionType = Field(..., title="Transaction Type", description="deposit, withdrawal or payment")
+    body: Dict[str, Any] = Field(..., title="Body", description="Request body of the matching single-transaction endpoint")
+
+
+class TransactionBatchRequest(BaseModel):
+    """Request model for submitting several transactions in one call"""
+    requests: List[TransactionBatchItem] = Field(..., title="Requests", description="Transactions to process", min_length=1, max_length=50)
+
+
+class TransactionBatchItemResponse(BaseModel):
+    """Outcome of one operation of a transaction batch"""
+    id: str = Field(..., title="ID", description="ID of the batch item")
+    status: int = Field(..., title="Status", description="HTTP status the single-transaction endpoint would have returned")
+    body: Any = Field(None, title="Body", description="Created transaction, or the error detail")
+
+
+class TransactionBatchResponse(BaseModel):
+    """Response model for a transaction batch, in request order"""
+    responses: List[TransactionBatchItemResponse] = Field(..., title="Responses", description="Outcome of each item")
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field, EmailStr, ConfigDict
 from typing import Optional, List
 from datetime import datetime
 from enum import Enum
@@ -65,8 +65,7 @@ class User(UserBase):
     created_at: datetime = Field(..., title="Created At", description="Account creation timestamp")
     updated_at: datetime = Field(..., title="Updated At", description="Last update timestamp")
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class UserResponse(User):
@@ -77,9 +76,22 @@ class UserResponse(User):
 class UserListResponse(BaseModel):
     """Response model for listing users"""
     users: List[User] = Field(..., title="Users", description="List of users")
-    total: int = Field(..., title="Total", description="Total number of users")
-    page: int = Field(..., title="Page", description="Current page number")
+    total: Optional[int] = Field(None, title="Total", description="Total number of users (an estimate, and only for unfiltered listings, when paging by cursor)")
+    page: Optional[int] = Field(None, title="Page", description="Current page number, or null when paging by cursor")
     page_size: int = Field(..., title="Page Size", description="Number of users per page")
+    next_cursor: Optional[str] = Field(None, title="Next Cursor", description="Cursor for the next page, or null on the last page")
+    has_more: bool = Field(False, title="Has More", description="Whether another page is available")
+
+
+class UserBatchRequest(BaseModel):
+    """Request model for fetching several users at once"""
+    ids: List[str] = Field(..., title="IDs", description="IDs of the users to fetch", min_length=1, max_length=100)
+
+
+class UserBatchResponse(BaseModel):
+    """Response model for fetching several users at once"""
+    users: List[User] = Field(..., title="Users", description="Users found, in request order")
+    missing: List[str] = Field(default_factory=list, title="Missing", description="Requested IDs with no user")
 
 
 class UserSearchParams(BaseModel):
@@ -89,6 +101,7 @@ class UserSearchParams(BaseModel):
     status: Optional[UserStatus] = Field(None, title="Status", description="Filter by status")
     role: Optional[UserRole] = Field(None, title="Role", description="Filter by role")
     kyc_verified: Optional[bool] = Field(None, title="KYC Verified", description="Filter by KYC verification status")
-    page: int = Field(default=1, title="Page", description="Page number", ge=1)
+    page: int = Field(default=1, title="Page", description="Page number (ignored when a cursor is given)", ge=1)
     page_size: int = Field(default=20, title="Page Size", description="Number of users per page", ge=1, le=100)
+    cursor: Optional[str] = Field(None, title="Cursor", description="Opaque cursor returned as next_cursor by the previous page")
 
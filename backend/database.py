@@ -4,6 +4,7 @@ from typing import Optional, Dict, Any, List
 from contextlib import asynccontextmanager
 import psycopg
 from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -12,8 +13,25 @@ load_dotenv()
 class DatabaseManager:
     """Database connection manager for PostgreSQL"""
     
+    # Connection pool bounds; a handler can hold several connections at once
+    # while its lookups run concurrently
+    POOL_MIN_SIZE = 10
+    POOL_MAX_SIZE = 50
+    
+    # Connections above POOL_MIN_SIZE are closed after this many idle seconds
+    POOL_MAX_IDLE = 60
+    
+    # The server cancels statements running longer than this (milliseconds)
+    STATEMENT_TIMEOUT_MS = 5000
+    
+    # Server-side prepared statements: a query is prepared on a connection the
+    # first time it runs there, and up to PREPARED_MAX plans are kept per connection
+    PREPARE_THRESHOLD = 0
+    PREPARED_MAX = 256
+    
     def __init__(self):
         self.database_url: Optional[str] = None
+        self.pool: Optional[AsyncConnectionPool] = None
         self._initialized = False
     
     async def initialize(self) -> None:
@@ -27,31 +45,53 @@ class DatabaseManager:
         if not self.database_url:
             raise ValueError("DATABASE_URL environment variable is required")
         
-        # Test connection
-        conn = await psycopg.AsyncConnection.connect(self.database_url)
-        await conn.execute("SELECT 1")
-        await conn.close()
+        # Prepared statements do not survive pgbouncer in transaction pooling
+        # mode; set DATABASE_PREPARED_STATEMENTS=false when running behind it
+        prepare = os.getenv("DATABASE_PREPARED_STATEMENTS", "true").lower() != "false"
+        
+        # Open the process-wide pool; waiting for min_size connections also
+        # tests connectivity
+        self.pool = AsyncConnectionPool(
+            self.database_url,
+            min_size=self.POOL_MIN_SIZE,
+            max_size=self.POOL_MAX_SIZE,
+            max_idle=self.POOL_MAX_IDLE,
+            kwargs={
+                "row_factory": dict_row,
+                "prepare_threshold": self.PREPARE_THRESHOLD if prepare else None,
+                "options": f"-c statement_timeout={self.STATEMENT_TIMEOUT_MS}"
+            },
+            configure=self._configure_connection,
+            # Test connections as they are handed out so one dropped by the
+            # server or a proxy is replaced instead of failing the request
+            check=AsyncConnectionPool.check_connection,
+            open=False
+        )
+        await self.pool.open(wait=True)
         
         self._initialized = True
         print("Database connections initialized successfully")
     
+    async def _configure_connection(self, conn: psycopg.AsyncConnection) -> None:
+        """Set up each new pooled connection"""
+        conn.prepared_max = self.PREPARED_MAX
+    
     async def close(self) -> None:
         """Close all database connections"""
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
         self._initialized = False
         print("Database connections closed")
     
     @asynccontextmanager
     async def get_connection(self):
-        """Get a database connection"""
+        """Borrow a connection from the pool; it is returned when the block exits"""
         if not self._initialized:
             raise RuntimeError("Database not initialized. Call initialize() first.")
         
-        connection = await psycopg.AsyncConnection.connect(self.database_url)
-        connection.row_factory = dict_row
-        try:
+        async with self.pool.connection() as connection:
             yield connection
-        finally:
-            await connection.close()
     
     async def execute(self, query: str, *args) -> str:
         """Execute a query and return the result"""
@@ -111,7 +151,8 @@ class DatabaseManager:
                     "status": "healthy",
                     "database": "postgresql",
                     "version": version_str.split()[1] if version_str else "unknown",
-                    "connection": "direct",
+                    "connection": "pooled",
+                    "pool": self.pool.get_stats(),
                     "test_query": "successful",
                     "test_result": result
                 }
@@ -128,8 +169,9 @@ db_manager = DatabaseManager()
 
 # Convenience functions for easy access
 async def get_db_connection():
-    """Get a database connection"""
-    return db_manager.get_connection()
+    """FastAPI dependency yielding a pooled connection for the request"""
+    async with db_manager.get_connection() as conn:
+        yield conn
 
 async def execute_query(query: str, *args) -> str:
     """Execute a query"""
@@ -4,13 +4,27 @@ Account database operations
 This module handles all database operations related to accounts.
 """
 
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime
+from decimal import Decimal
 import uuid
 import time
 
+from psycopg.errors import UniqueViolation
+
 from dataModels.account import Account, AccountCreate, AccountUpdate, AccountSearchParams
 from database import db_manager
+from db.pagination import encode_cursor, decode_cursor, estimate_row_count, page_limit
+from db.lookup_cache import LookupCache, SingleFlight
+
+# Cached account reads for request validation. The organization account's
+# balance moves with every loan, so it is only reused for a second.
+_account_cache = LookupCache(ttl=5)
+_organization_cache = LookupCache(ttl=1)
+# The organization account's ID does not change, so it is kept for an hour
+_organization_id_cache = LookupCache(ttl=3600)
+# Concurrent uncached reads of one account share a query
+_account_reads = SingleFlight()
 
 
 class AccountDB:
@@ -25,50 +39,50 @@ class AccountDB:
         return f"ACC{timestamp}{random_suffix}"
 
     @staticmethod
-    async def create_account(account_data: AccountCreate) -> Account:
-        """Create a new account (one per user)"""
-        # Check if user already has an account
-        existing_account = await AccountDB.get_account_by_user_id(account_data.user_id)
-        if existing_account:
-            raise Exception("User already has an account")
-        
+    async def create_account(account_data: AccountCreate) -> Optional[Account]:
+        """Create a new account (one per user); returns None if the user already has one"""
         account_id = str(uuid.uuid4())
-        account_number = AccountDB._generate_account_number()
         now = datetime.utcnow()
         
-        # Ensure account number is unique
-        while await AccountDB.account_exists(account_number=account_number):
-            account_number = AccountDB._generate_account_number()
-        
+        # The unique index on user_id makes "one account per user" atomic
         query = """
             INSERT INTO accounts (
                 id, user_id, account_number, status, created_at, updated_at
             ) VALUES (%s, %s, %s, %s, %s, %s)
+            ON CONFLICT (user_id) DO NOTHING
+            RETURNING id, user_id, account_number, status, wallet_id, loan_balance, investment_balance, created_at, updated_at, closed_at
         """
         
-        params = (
-            account_id,
-            account_data.user_id,
-            account_number,
-            "active",  # Default status
-            now,
-            now
-        )
-
         async with db_manager.get_connection() as conn:
-            await conn.execute(query, params)
-            await conn.commit()
-        
-        # Fetch the created account
-        created_account = await AccountDB.get_account_by_id(account_id)
-        if not created_account:
-            raise Exception("Failed to create account")
+            for _ in range(5):
+                params = (
+                    account_id,
+                    account_data.user_id,
+                    AccountDB._generate_account_number(),
+                    "active",  # Default status
+                    now,
+                    now
+                )
+                try:
+                    cursor = await conn.execute(query, params)
+                    row = await cursor.fetchone()
+                    await conn.commit()
+                    break
+                except UniqueViolation:
+                    # Account number collision; roll back and draw another
+                    await conn.rollback()
+            else:
+                raise Exception("Failed to generate a unique account number")
         
-        return created_account
+        return Account(**row) if row else None
 
     @staticmethod
     async def get_account_by_id(account_id: str) -> Optional[Account]:
-        """Get an account by ID"""
+        """Get an account by ID; concurrent calls for the same account share one query"""
+        return await _account_reads.do(account_id, lambda: AccountDB._fetch_account_by_id(account_id))
+
+    @staticmethod
+    async def _fetch_account_by_id(account_id: str) -> Optional[Account]:
         query = """
             SELECT id, user_id, account_number, status, wallet_id, loan_balance, investment_balance, created_at, updated_at, closed_at
             FROM accounts 
@@ -83,6 +97,19 @@ class AccountDB:
             
             return Account(**row)
 
+    @staticmethod
+    async def get_account_by_id_cached(account_id: str) -> Optional[Account]:
+        """Get an account by ID for validation; may be up to a few seconds old"""
+        return await _account_cache.get(account_id, lambda: AccountDB.get_account_by_id(account_id))
+
+    @staticmethod
+    def invalidate_cached(account_id: str) -> None:
+        """Drop cached reads of an account after it was written"""
+        _account_cache.pop(account_id)
+        _account_reads.forget(account_id)
+        # Any account may be the organization account
+        _organization_cache.clear()
+
     @staticmethod
     async def get_account_by_user_id(user_id: str) -> Optional[Account]:
         """Get an account by user ID (one account per user)"""
@@ -149,28 +176,35 @@ class AccountDB:
             UPDATE accounts 
             SET {', '.join(update_fields)}
             WHERE id = %s
+            RETURNING id, user_id, account_number, status, wallet_id, loan_balance, investment_balance, created_at, updated_at, closed_at
         """
         
         async with db_manager.get_connection() as conn:
-            await conn.execute(query, values)
+            cursor = await conn.execute(query, values)
+            row = await cursor.fetchone()
             await conn.commit()
         
-        # Fetch the updated account
-        return await AccountDB.get_account_by_id(account_id)
+        AccountDB.invalidate_cached(account_id)
+        # None means the account does not exist
+        return Account(**row) if row else None
 
     @staticmethod
     async def delete_account(account_id: str) -> bool:
-        """Delete an account"""
-        query = "DELETE FROM accounts WHERE id = %s"
+        """Delete an account; returns False if it does not exist"""
+        query = "DELETE FROM accounts WHERE id = %s RETURNING id"
         
         async with db_manager.get_connection() as conn:
             cursor = await conn.execute(query, (account_id,))
+            row = await cursor.fetchone()
             await conn.commit()
-            return cursor.rowcount > 0
+        
+        AccountDB.invalidate_cached(account_id)
+        _organization_id_cache.clear()
+        return row is not None
 
     @staticmethod
     async def list_accounts(search_params: AccountSearchParams) -> Dict[str, Any]:
-        """List accounts with filtering and pagination"""
+        """List accounts with filtering and pagination; accounts are returned as response-ready rows"""
         # Build WHERE clause
         where_conditions = []
         values = []
@@ -187,38 +221,43 @@ class AccountDB:
             where_conditions.append("status = %s")
             values.append(search_params.status.value)
         
-        where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
-        
         async with db_manager.get_connection() as conn:
-            # Count query
-            count_query = f"SELECT COUNT(*) FROM accounts {where_clause}"
-            cursor = await conn.execute(count_query, values)
-            total_row = await cursor.fetchone()
-            # Handle both dict and tuple results
-            if isinstance(total_row, dict):
-                total = total_row['count'] if total_row else 0
-            else:
-                total = total_row[0] if total_row else 0
+            # Exact counts cost a full scan, so only report the planner's
+            # estimate, and only when it is meaningful (no filters)
+            total = None if where_conditions else await estimate_row_count(conn, "accounts")
+            
+            if search_params.cursor:
+                cursor_created_at, cursor_id = decode_cursor(search_params.cursor)
+                where_conditions.append("(created_at, id) < (%s, %s)")
+                values.extend([cursor_created_at, cursor_id])
+            
+            page_size = page_limit(search_params.page_size)
+            where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
             
-            # Data query with pagination
-            offset = (search_params.page - 1) * search_params.page_size
+            # Fetch one extra row to know whether another page exists. Balances
+            # are cast to float here so rows serialize like Account models
             data_query = f"""
-                SELECT id, user_id, account_number, status, wallet_id, loan_balance, investment_balance, created_at, updated_at, closed_at
+                SELECT id, user_id, account_number, status, wallet_id,
+                       loan_balance::float8 AS loan_balance, investment_balance::float8 AS investment_balance,
+                       created_at, updated_at, closed_at
                 FROM accounts 
                 {where_clause}
-                ORDER BY created_at DESC
-                LIMIT %s OFFSET %s
+                ORDER BY created_at DESC, id DESC
+                LIMIT %s
             """
             
-            cursor = await conn.execute(data_query, values + [search_params.page_size, offset])
+            cursor = await conn.execute(data_query, values + [page_size + 1])
             rows = await cursor.fetchall()
-            accounts = [Account(**row) for row in rows]
+            
+            has_more = len(rows) > page_size
+            rows = rows[:page_size]
             
             return {
-                "accounts": accounts,
+                "accounts": rows,
                 "total": total,
-                "page": search_params.page,
-                "page_size": search_params.page_size
+                "page_size": page_size,
+                "next_cursor": encode_cursor(rows[-1]['created_at'], rows[-1]['id']) if has_more else None,
+                "has_more": has_more
             }
 
     @staticmethod
@@ -238,16 +277,23 @@ class AccountDB:
         if not conditions:
             return False
         
-        query = f"SELECT COUNT(*) FROM accounts WHERE ({' OR '.join(conditions)})"
+        # EXISTS stops at the first matching index entry instead of counting
+        query = f"SELECT EXISTS (SELECT 1 FROM accounts WHERE ({' OR '.join(conditions)})) AS exists"
         
         async with db_manager.get_connection() as conn:
             cursor = await conn.execute(query, values)
             result = await cursor.fetchone()
-            # Handle both dict and tuple results
-            if isinstance(result, dict):
-                return result['count'] > 0
-            else:
-                return result[0] > 0 if result else False
+            return result['exists']
+
+    @staticmethod
+    async def exists(account_id: str) -> bool:
+        """Check if an account exists by ID without fetching the row"""
+        query = "SELECT EXISTS (SELECT 1 FROM accounts WHERE id = %s) AS exists"
+        
+        async with db_manager.get_connection() as conn:
+            cursor = await conn.execute(query, (account_id,))
+            result = await cursor.fetchone()
+            return result['exists']
 
     @staticmethod
     async def update_account_status(account_id: str, status: str) -> Optional[Account]:
@@ -256,13 +302,16 @@ class AccountDB:
             UPDATE accounts 
             SET status = %s, updated_at = %s
             WHERE id = %s
+            RETURNING id, user_id, account_number, status, wallet_id, loan_balance, investment_balance, created_at, updated_at, closed_at
         """
         
         async with db_manager.get_connection() as conn:
-            await conn.execute(query, (status, datetime.utcnow(), account_id))
+            cursor = await conn.execute(query, (status, datetime.utcnow(), account_id))
+            row = await cursor.fetchone()
             await conn.commit()
         
-        return await AccountDB.get_account_by_id(account_id)
+        AccountDB.invalidate_cached(account_id)
+        return Account(**row) if row else None
 
     @staticmethod
     async def close_account(account_id: str) -> Optional[Account]:
@@ -271,18 +320,32 @@ class AccountDB:
             UPDATE accounts 
             SET status = %s, closed_at = %s, updated_at = %s
             WHERE id = %s
+            RETURNING id, user_id, account_number, status, wallet_id, loan_balance, investment_balance, created_at, updated_at, closed_at
         """
         
         now = datetime.utcnow()
         
         async with db_manager.get_connection() as conn:
-            await conn.execute(query, ("closed", now, now, account_id))
+            cursor = await conn.execute(query, ("closed", now, now, account_id))
+            row = await cursor.fetchone()
             await conn.commit()
         
-        return await AccountDB.get_account_by_id(account_id)
+        AccountDB.invalidate_cached(account_id)
+        return Account(**row) if row else None
 
     @staticmethod
-    async def update_account_balances(account_id: str, loan_balance: float = None, investment_balance: float = None) -> Optional[Account]:
+    async def get_account_balances(account_id: str) -> Optional[Tuple[Decimal, Decimal]]:
+        """Get an account's (loan_balance, investment_balance) as exact NUMERIC values"""
+        query = "SELECT loan_balance, investment_balance FROM accounts WHERE id = %s"
+        
+        async with db_manager.get_connection() as conn:
+            cursor = await conn.execute(query, (account_id,))
+            row = await cursor.fetchone()
+        
+        return (row['loan_balance'], row['investment_balance']) if row else None
+
+    @staticmethod
+    async def update_account_balances(account_id: str, loan_balance: Decimal = None, investment_balance: Decimal = None) -> Optional[Account]:
         """Update account balances"""
         update_fields = []
         values = []
@@ -315,6 +378,7 @@ class AccountDB:
             await conn.execute(query, values)
             await conn.commit()
         
+        AccountDB.invalidate_cached(account_id)
         return await AccountDB.get_account_by_id(account_id)
 
     @staticmethod
@@ -334,3 +398,17 @@ class AccountDB:
                 return None
             
             return Account(**row)
+
+    @staticmethod
+    async def get_organization_account_cached() -> Optional[Account]:
+        """Get the organization account for validation; may be up to a second old"""
+        return await _organization_cache.get("organization", AccountDB.get_organization_account)
+
+    @staticmethod
+    async def get_organization_account_id() -> Optional[str]:
+        """Get the organization account's ID, cached for an hour or until an account is deleted"""
+        async def load() -> Optional[str]:
+            account = await AccountDB.get_organization_account()
+            return account.id if account else None
+
+        return await _organization_id_cache.get("organization", load)
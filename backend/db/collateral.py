@@ -15,6 +15,7 @@ from pathlib import Path
 from dataModels.collateral import Collateral, CollateralCreate, CollateralCreateSimple, CollateralUpdate, CollateralSearchParams, CollateralApproveRequest
 from dataModels.transaction import TransactionCreate, TransactionType
 from database import db_manager
+from db.pagination import encode_cursor, decode_cursor, estimate_row_count, page_limit
 
 
 class CollateralDB:
@@ -55,6 +56,27 @@ class CollateralDB:
         
         return str(file_path.relative_to(CollateralDB.FILES_BASE_PATH))
 
+    @staticmethod
+    def _collateral_from_row(row: Dict[str, Any]) -> Collateral:
+        """Build a Collateral from a database row"""
+        # Parse JSON fields and map image_paths to images
+        if row['image_paths']:
+            if isinstance(row['image_paths'], str):
+                row['images'] = json.loads(row['image_paths'])
+            elif isinstance(row['image_paths'], list):
+                row['images'] = row['image_paths']
+            else:
+                row['images'] = []
+        else:
+            row['images'] = []
+        if row['metadata'] and isinstance(row['metadata'], str):
+            row['metadata'] = json.loads(row['metadata'])
+        
+        # Remove the old field name
+        del row['image_paths']
+        
+        return Collateral(**row)
+
     @staticmethod
     async def create_collateral_simple(collateral_data: CollateralCreateSimple) -> Collateral:
         """Create a new collateral with mocked data - only requires user_id"""
@@ -100,6 +122,103 @@ class CollateralDB:
         
         return created_collateral
 
+    @staticmethod
+    async def create_with_metadata(
+        user_id: str,
+        images: List[str],
+        loan_limit: float,
+        interest: float,
+        due_date: datetime,
+        metadata: Dict[str, Any],
+        image_analyses: Optional[List[Dict[str, Any]]] = None
+    ) -> Optional[Collateral]:
+        """
+        Create a valued collateral in one statement; returns None if the user does not exist
+        
+        The full image_analyses, if given, are stored alongside in
+        collateral_analysis_details by the same statement.
+        """
+        collateral_id = str(uuid.uuid4())
+        now = datetime.utcnow()
+        
+        # Process and save images to files folder
+        processed_image_paths = []
+        for i, image_data in enumerate(images):
+            try:
+                file_path = CollateralDB._save_image_to_files(image_data, collateral_id, i)
+                processed_image_paths.append(file_path)
+            except Exception as e:
+                print(f"Warning: Failed to process image {i}: {e}")
+        
+        # The user check and the inserts run as one statement, so nothing is
+        # written unless the user exists
+        query = """
+            WITH created AS (
+                INSERT INTO collaterals (
+                    id, user_id, status, loan_amount, loan_limit, interest, due_date,
+                    image_paths, metadata, created_at, updated_at
+                )
+                SELECT %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+                WHERE EXISTS (SELECT 1 FROM app_users WHERE id = %s)
+                RETURNING id, user_id, status, loan_amount, loan_limit, interest, due_date,
+                          image_paths, metadata, created_at, updated_at
+            ), details AS (
+                INSERT INTO collateral_analysis_details (collateral_id, image_analyses, created_at)
+                SELECT id, %s, created_at FROM created
+                WHERE %s::json IS NOT NULL
+            )
+            SELECT * FROM created
+        """
+        
+        details = json.dumps(image_analyses) if image_analyses is not None else None
+        params = (
+            collateral_id,
+            user_id,
+            "pending",  # Default status
+            5000.00,  # Placeholder until approval sets the actual loan amount
+            loan_limit,
+            interest,
+            due_date,
+            json.dumps(processed_image_paths),
+            json.dumps(metadata),
+            now,
+            now,
+            user_id,
+            details,
+            details
+        )
+        
+        async with db_manager.get_connection() as conn:
+            cursor = await conn.execute(query, params)
+            row = await cursor.fetchone()
+            await conn.commit()
+        
+        if not row:
+            # Nothing was inserted, so drop the copied images
+            shutil.rmtree(CollateralDB.FILES_BASE_PATH / collateral_id, ignore_errors=True)
+            return None
+        
+        return CollateralDB._collateral_from_row(row)
+
+    @staticmethod
+    async def get_analysis_details(collateral_id: str) -> Optional[Dict[str, Any]]:
+        """Get the full image analyses recorded when a collateral was created"""
+        query = """
+            SELECT collateral_id, image_analyses, created_at
+            FROM collateral_analysis_details
+            WHERE collateral_id = %s
+        """
+        
+        async with db_manager.get_connection() as conn:
+            cursor = await conn.execute(query, (collateral_id,))
+            row = await cursor.fetchone()
+            if not row:
+                return None
+            
+            if isinstance(row['image_analyses'], str):
+                row['image_analyses'] = json.loads(row['image_analyses'])
+            return row
+
     @staticmethod
     async def create_collateral(collateral_data: CollateralCreate) -> Collateral:
         """Create a new collateral with full data"""
@@ -157,30 +276,36 @@ class CollateralDB:
 
     @staticmethod
     async def approve_collateral(collateral_id: str, approve_request: CollateralApproveRequest) -> Collateral:
-        """Approve a collateral and create a loan transaction"""
-        # Get the collateral
-        collateral = await CollateralDB.get_collateral_by_id(collateral_id)
-        if not collateral:
-            raise Exception("Collateral not found")
-        
-        if collateral.status != "pending":
-            raise Exception("Collateral is not in pending status")
-        
-        if approve_request.loan_amount > collateral.loan_limit:
-            raise Exception(f"Loan amount {approve_request.loan_amount} exceeds limit {collateral.loan_limit}")
-        
-        # Update collateral status to approved
+        """Approve a collateral and create a loan transaction; returns None if it does not exist"""
+        # Validate and approve in one statement; the row only comes back if
+        # the collateral is pending and the amount is within its limit
         now = datetime.utcnow()
         query = """
             UPDATE collaterals 
             SET status = %s, loan_amount = %s, updated_at = %s
-            WHERE id = %s
+            WHERE id = %s AND status = %s AND loan_limit >= %s
+            RETURNING id, user_id, status, loan_amount, loan_limit, interest, due_date,
+                      image_paths, metadata, created_at, updated_at
         """
         
         async with db_manager.get_connection() as conn:
-            await conn.execute(query, ("approved", approve_request.loan_amount, now, collateral_id))
+            cursor = await conn.execute(query, (
+                "approved", approve_request.loan_amount, now, collateral_id, "pending", approve_request.loan_amount
+            ))
+            row = await cursor.fetchone()
             await conn.commit()
         
+        if not row:
+            # Only on failure do we read the row to explain why
+            collateral = await CollateralDB.get_collateral_by_id(collateral_id)
+            if not collateral:
+                return None
+            if collateral.status != "pending":
+                raise Exception("Collateral is not in pending status")
+            raise Exception(f"Loan amount {approve_request.loan_amount} exceeds limit {collateral.loan_limit}")
+        
+        collateral = CollateralDB._collateral_from_row(row)
+        
         # Create loan disbursement transaction
         # TODO: Get account_id from user - for now using a placeholder
         # In real implementation, you'd get the user's account
@@ -208,12 +333,7 @@ class CollateralDB:
         from db.transaction import TransactionDB
         await TransactionDB.create_transaction(transaction_data)
         
-        # Fetch the updated collateral
-        updated_collateral = await CollateralDB.get_collateral_by_id(collateral_id)
-        if not updated_collateral:
-            raise Exception("Failed to update collateral")
-        
-        return updated_collateral
+        return collateral
 
     @staticmethod
     async def get_collateral_by_id(collateral_id: str) -> Optional[Collateral]:
@@ -231,23 +351,7 @@ class CollateralDB:
             if not row:
                 return None
             
-            # Parse JSON fields and map image_paths to images
-            if row['image_paths']:
-                if isinstance(row['image_paths'], str):
-                    row['images'] = json.loads(row['image_paths'])
-                elif isinstance(row['image_paths'], list):
-                    row['images'] = row['image_paths']
-                else:
-                    row['images'] = []
-            else:
-                row['images'] = []
-            if row['metadata'] and isinstance(row['metadata'], str):
-                row['metadata'] = json.loads(row['metadata'])
-            
-            # Remove the old field name
-            del row['image_paths']
-            
-            return Collateral(**row)
+            return CollateralDB._collateral_from_row(row)
 
     @staticmethod
     async def get_collaterals_by_user_id(user_id: str) -> List[Collateral]:
@@ -266,23 +370,7 @@ class CollateralDB:
             
             collaterals = []
             for row in rows:
-                # Parse JSON fields and map image_paths to images
-                if row['image_paths']:
-                    if isinstance(row['image_paths'], str):
-                        row['images'] = json.loads(row['image_paths'])
-                    elif isinstance(row['image_paths'], list):
-                        row['images'] = row['image_paths']
-                    else:
-                        row['images'] = []
-                else:
-                    row['images'] = []
-                if row['metadata'] and isinstance(row['metadata'], str):
-                    row['metadata'] = json.loads(row['metadata'])
-                
-                # Remove the old field name
-                del row['image_paths']
-                
-                collaterals.append(Collateral(**row))
+                collaterals.append(CollateralDB._collateral_from_row(row))
             
             return collaterals
 
@@ -310,14 +398,17 @@ class CollateralDB:
                 if field == 'images':
                     update_fields.append("image_paths = %s")
                     values.append(json.dumps(processed_image_paths))
+                elif field == 'metadata':
+                    # Merge keys server-side so concurrent updates touching
+                    # different keys do not overwrite each other
+                    update_fields.append("metadata = (COALESCE(metadata::jsonb, '{}'::jsonb) || %s::jsonb)::json")
+                    values.append(json.dumps(value))
                 else:
                     update_fields.append(f"{field} = %s")
                     if isinstance(value, datetime):
                         values.append(value)
                     elif hasattr(value, 'value'):  # Enum
                         values.append(value.value)
-                    elif field == 'metadata' and value is not None:
-                        values.append(json.dumps(value))
                     else:
                         values.append(value)
         
@@ -336,14 +427,17 @@ class CollateralDB:
             UPDATE collaterals 
             SET {', '.join(update_fields)}
             WHERE id = %s
+            RETURNING id, user_id, status, loan_amount, loan_limit, interest, due_date,
+                      image_paths, metadata, created_at, updated_at
         """
         
         async with db_manager.get_connection() as conn:
-            await conn.execute(query, values)
+            cursor = await conn.execute(query, values)
+            row = await cursor.fetchone()
             await conn.commit()
         
-        # Fetch the updated collateral
-        return await CollateralDB.get_collateral_by_id(collateral_id)
+        # None means the collateral does not exist
+        return CollateralDB._collateral_from_row(row) if row else None
 
     @staticmethod
     async def update_loan_amount(collateral_id: str, new_loan_amount: float) -> Optional[Collateral]:
@@ -363,7 +457,7 @@ class CollateralDB:
 
     @staticmethod
     async def list_collaterals(search_params: CollateralSearchParams) -> Dict[str, Any]:
-        """List collaterals with filtering and pagination"""
+        """List collaterals with filtering and pagination; collaterals are returned as response-ready rows"""
         # Build WHERE clause
         where_conditions = []
         values = []
@@ -376,56 +470,41 @@ class CollateralDB:
             where_conditions.append("status = %s")
             values.append(search_params.status.value)
         
-        where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
-        
         async with db_manager.get_connection() as conn:
-            # Count query
-            count_query = f"SELECT COUNT(*) FROM collaterals {where_clause}"
-            cursor = await conn.execute(count_query, values)
-            total_row = await cursor.fetchone()
-            # Handle both dict and tuple results
-            if isinstance(total_row, dict):
-                total = total_row['count'] if total_row else 0
-            else:
-                total = total_row[0] if total_row else 0
+            # Exact counts cost a full scan, so only report the planner's
+            # estimate, and only when it is meaningful (no filters)
+            total = None if where_conditions else await estimate_row_count(conn, "collaterals")
+            
+            if search_params.cursor:
+                cursor_created_at, cursor_id = decode_cursor(search_params.cursor)
+                where_conditions.append("(created_at, id) < (%s, %s)")
+                values.extend([cursor_created_at, cursor_id])
+            
+            page_size = page_limit(search_params.page_size)
+            where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
             
-            # Data query with pagination
-            offset = (search_params.page - 1) * search_params.page_size
+            # Fetch one extra row to know whether another page exists. Columns
+            # are shaped in SQL so rows serialize like Collateral models
             data_query = f"""
                 SELECT id, user_id, status, loan_amount, loan_limit, interest, due_date,
-                       image_paths, metadata, created_at, updated_at
+                       COALESCE(image_paths, '[]'::json) AS images, metadata, created_at, updated_at
                 FROM collaterals 
                 {where_clause}
-                ORDER BY created_at DESC
-                LIMIT %s OFFSET %s
+                ORDER BY created_at DESC, id DESC
+                LIMIT %s
             """
             
-            cursor = await conn.execute(data_query, values + [search_params.page_size, offset])
+            cursor = await conn.execute(data_query, values + [page_size + 1])
             rows = await cursor.fetchall()
             
-            collaterals = []
-            for row in rows:
-                # Parse JSON fields and map image_paths to images
-                if row['image_paths']:
-                    if isinstance(row['image_paths'], str):
-                        row['images'] = json.loads(row['image_paths'])
-                    elif isinstance(row['image_paths'], list):
-                        row['images'] = row['image_paths']
-                    else:
-                        row['images'] = []
-                else:
-                    row['images'] = []
-                if row['metadata'] and isinstance(row['metadata'], str):
-                    row['metadata'] = json.loads(row['metadata'])
-                
-                # Remove the old field name
-                del row['image_paths']
-                
-                collaterals.append(Collateral(**row))
+            has_more = len(rows) > page_size
+            rows = rows[:page_size]
+            next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id']) if has_more else None
             
             return {
-                "collaterals": collaterals,
+                "collaterals": rows,
                 "total": total,
-                "page": search_params.page,
-                "page_size": search_params.page_size
+                "page_size": page_size,
+                "next_cursor": next_cursor,
+                "has_more": has_more
             }
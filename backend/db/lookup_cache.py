@@ -0,0 +1,94 @@
+"""
+Lookup cache
+
+Request validation reads the same account, user and organization rows over
+and over. This module provides a small in-process TTL cache for those reads.
+Concurrent misses on one key share a single database query, and writes
+through the db classes drop the affected entries.
+
+Only for validation reads: balance calculations always go to the database.
+SingleFlight, which only merges reads that are in flight at the same time, is
+also safe for those.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class SingleFlight:
+    """Merge concurrent calls for the same key into one"""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Run call, or wait for the run already in flight for key"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget_task(key, done))
+        # Shielded so one cancelled caller does not cancel the shared call
+        return await asyncio.shield(task)
+
+    def _forget_task(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def forget(self, key: Hashable) -> None:
+        """Make later callers start a new call, e.g. after a write made the running one stale"""
+        self._inflight.pop(key, None)
+
+    def forget_all(self) -> None:
+        """Forget every key"""
+        self._inflight.clear()
+
+
+class LookupCache:
+    """TTL + LRU cache of async lookups with one in-flight query per key"""
+
+    def __init__(self, ttl: float, maxsize: int = 10_000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        # key -> (expires_at, value), oldest use first
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._loads = SingleFlight()
+        # Bumped on every invalidation so a query that started before a write
+        # does not store its (possibly stale) result
+        self._generation = 0
+
+    async def get(self, key: Hashable, load: Callable[[], Awaitable[Optional[Any]]]) -> Optional[Any]:
+        """Return the cached value for key, calling load on a miss"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                return entry[1]
+            del self._entries[key]
+
+        return await self._loads.do(key, lambda: self._load(key, load))
+
+    async def _load(self, key: Hashable, load: Callable[[], Awaitable[Optional[Any]]]) -> Optional[Any]:
+        generation = self._generation
+        value = await load()
+        # Missing rows are not cached; they may be created at any moment
+        if value is not None and generation == self._generation:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def pop(self, key: Hashable) -> None:
+        """Drop the entry for key"""
+        self._generation += 1
+        self._entries.pop(key, None)
+        self._loads.forget(key)
+
+    def clear(self) -> None:
+        """Drop all entries"""
+        self._generation += 1
+        self._entries.clear()
+        self._loads.forget_all()
@@ -0,0 +1,52 @@
+"""
+Keyset pagination helpers
+
+List endpoints page through rows ordered by (created_at DESC, id DESC). The
+client receives an opaque cursor holding the sort key of the last row it saw,
+and the next page is read with an index seek past that key, so every page
+costs the same however deep the client goes. Cursors are not signed: the
+sort key is only ever passed as a bound parameter, so a forged one just seeks
+to a different position, and any worker can read a cursor another issued.
+"""
+
+from typing import Tuple
+from datetime import datetime
+import base64
+
+import orjson
+
+# Hard upper bound on rows read per page, whatever the caller asks for
+MAX_PAGE_SIZE = 200
+
+
+def page_limit(page_size: int) -> int:
+    """Clamp a requested page size to MAX_PAGE_SIZE"""
+    return min(page_size, MAX_PAGE_SIZE)
+
+
+def encode_cursor(created_at: datetime, row_id: str) -> str:
+    """Encode the sort key of the last row of a page into an opaque cursor"""
+    payload = orjson.dumps({"k": created_at.isoformat(), "v": row_id})
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Decode a cursor back into its (created_at, id) sort key"""
+    try:
+        payload = orjson.loads(base64.urlsafe_b64decode(cursor.encode()))
+        created_at, row_id = datetime.fromisoformat(payload["k"]), payload["v"]
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+    if not isinstance(row_id, str):
+        raise ValueError("Invalid pagination cursor")
+    return created_at, row_id
+
+
+async def estimate_row_count(conn, table_name: str) -> int:
+    """Planner estimate of a table's row count (avoids a full COUNT(*) scan)"""
+    cursor = await conn.execute(
+        "SELECT GREATEST(reltuples, 0)::bigint AS estimate FROM pg_class WHERE relname = %s",
+        (table_name,)
+    )
+    row = await cursor.fetchone()
+    return row['estimate'] if row else 0
@@ -4,42 +4,47 @@ Transaction database operations
 This module handles all database operations related to transactions.
 """
 
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable, Tuple
 from datetime import datetime
+from decimal import Decimal
 import uuid
 import json
 
+from psycopg.errors import CheckViolation
+
 from dataModels.transaction import (
     Transaction, TransactionCreate, TransactionUpdate, TransactionSearchParams,
     TransactionType, TransactionStatus
 )
 from database import db_manager
+from db.account import AccountDB
+from db.pagination import encode_cursor, decode_cursor, estimate_row_count, page_limit
+
+# Columns for rows returned straight to clients; amounts are cast to float so
+# rows serialize like Transaction models
+RESPONSE_COLUMNS = """
+    id, account_id, user_id, transaction_type, status, amount::float8 AS amount,
+    description, reference_number, collateral_id, metadata,
+    loan_balance_before::float8 AS loan_balance_before, loan_balance_after::float8 AS loan_balance_after,
+    invested_balance_before::float8 AS invested_balance_before,
+    invested_balance_after::float8 AS invested_balance_after,
+    created_at, updated_at, processed_at, failed_at, failure_reason
+"""
 
 
 class TransactionDB:
     """Database operations for transactions"""
 
     @staticmethod
-    async def create_transaction(transaction_data: TransactionCreate) -> Transaction:
-        """Create a new transaction"""
-        transaction_id = str(uuid.uuid4())
-        now = datetime.utcnow()
-        
-        query = """
-            INSERT INTO transactions (
-                id, account_id, user_id, transaction_type, status, amount, 
-                description, reference_number, collateral_id, metadata,
-                loan_balance_before, loan_balance_after, invested_balance_before, invested_balance_after,
-                created_at, updated_at
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        
-        params = (
+    def _insert_params(transaction_id: str, transaction_data: TransactionCreate, now: datetime,
+                       status: str = "pending") -> tuple:
+        """Parameters for the transaction INSERT column list"""
+        return (
             transaction_id,
             transaction_data.account_id,
             transaction_data.user_id,
             transaction_data.transaction_type.value,
-            "pending",  # Default status
+            status,
             transaction_data.amount,
             transaction_data.description,
             transaction_data.reference_number,
@@ -53,16 +58,97 @@ class TransactionDB:
             now
         )
 
+    @staticmethod
+    def _transaction_from_row(row: Dict[str, Any]) -> Transaction:
+        """Build a Transaction from a database row"""
+        # Parse JSON fields
+        if row['metadata'] and isinstance(row['metadata'], str):
+            row['metadata'] = json.loads(row['metadata'])
+        return Transaction(**row)
+
+    @staticmethod
+    async def create_transaction(transaction_data: TransactionCreate) -> Transaction:
+        """Create a new transaction"""
+        query = """
+            INSERT INTO transactions (
+                id, account_id, user_id, transaction_type, status, amount, 
+                description, reference_number, collateral_id, metadata,
+                loan_balance_before, loan_balance_after, invested_balance_before, invested_balance_after,
+                created_at, updated_at
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            RETURNING id, account_id, user_id, transaction_type, status, amount,
+                      description, reference_number, collateral_id, metadata,
+                      loan_balance_before, loan_balance_after, invested_balance_before,
+                      invested_balance_after, created_at, updated_at, processed_at,
+                      failed_at, failure_reason
+        """
+        params = TransactionDB._insert_params(str(uuid.uuid4()), transaction_data, datetime.utcnow())
+
         async with db_manager.get_connection() as conn:
-            await conn.execute(query, params)
+            cursor = await conn.execute(query, params)
+            row = await cursor.fetchone()
             await conn.commit()
         
-        # Fetch the created transaction
-        created_transaction = await TransactionDB.get_transaction_by_id(transaction_id)
-        if not created_transaction:
+        if not row:
             raise Exception("Failed to create transaction")
         
-        return created_transaction
+        return TransactionDB._transaction_from_row(row)
+
+    @staticmethod
+    async def create_transaction_validated(transaction_data: TransactionCreate) -> Dict[str, Any]:
+        """
+        Create a transaction only if its account and user exist, in one statement
+        
+        Returns a dict with account_found and user_found flags, the account's
+        wallet_id, and the created transaction (None unless both exist).
+        """
+        query = """
+            WITH account AS (
+                SELECT wallet_id FROM accounts WHERE id = %s
+            ), app_user AS (
+                SELECT 1 FROM app_users WHERE id = %s
+            ), created AS (
+                INSERT INTO transactions (
+                    id, account_id, user_id, transaction_type, status, amount, 
+                    description, reference_number, collateral_id, metadata,
+                    loan_balance_before, loan_balance_after, invested_balance_before, invested_balance_after,
+                    created_at, updated_at
+                )
+                SELECT %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+                WHERE EXISTS (SELECT 1 FROM account) AND EXISTS (SELECT 1 FROM app_user)
+                RETURNING id, account_id, user_id, transaction_type, status, amount,
+                          description, reference_number, collateral_id, metadata,
+                          loan_balance_before, loan_balance_after, invested_balance_before,
+                          invested_balance_after, created_at, updated_at, processed_at,
+                          failed_at, failure_reason
+            )
+            SELECT EXISTS (SELECT 1 FROM account) AS account_found,
+                   EXISTS (SELECT 1 FROM app_user) AS user_found,
+                   (SELECT wallet_id FROM account) AS wallet_id,
+                   created.*
+            FROM (SELECT 1) AS one
+            LEFT JOIN created ON TRUE
+        """
+        params = (
+            transaction_data.account_id,
+            transaction_data.user_id,
+            *TransactionDB._insert_params(str(uuid.uuid4()), transaction_data, datetime.utcnow())
+        )
+
+        async with db_manager.get_connection() as conn:
+            cursor = await conn.execute(query, params)
+            row = await cursor.fetchone()
+            await conn.commit()
+        
+        result = {
+            "account_found": row.pop('account_found'),
+            "user_found": row.pop('user_found'),
+            "wallet_id": row.pop('wallet_id'),
+            "transaction": None
+        }
+        if row['id'] is not None:
+            result["transaction"] = TransactionDB._transaction_from_row(row)
+        return result
 
     @staticmethod
     async def get_transaction_by_id(transaction_id: str) -> Optional[Transaction]:
@@ -90,14 +176,10 @@ class TransactionDB:
             return Transaction(**row)
 
     @staticmethod
-    async def get_transactions_by_account_id(account_id: str) -> List[Transaction]:
-        """Get all transactions for an account"""
-        query = """
-            SELECT id, account_id, user_id, transaction_type, status, amount,
-                   description, reference_number, collateral_id, metadata,
-                   loan_balance_before, loan_balance_after, invested_balance_before, 
-                   invested_balance_after, created_at, updated_at, processed_at, 
-                   failed_at, failure_reason
+    async def get_transactions_by_account_id(account_id: str) -> List[Dict[str, Any]]:
+        """Get all transactions for an account; transactions are returned as response-ready rows"""
+        query = f"""
+            SELECT {RESPONSE_COLUMNS}
             FROM transactions 
             WHERE account_id = %s
             ORDER BY created_at DESC
@@ -106,25 +188,19 @@ class TransactionDB:
         async with db_manager.get_connection() as conn:
             cursor = await conn.execute(query, (account_id,))
             rows = await cursor.fetchall()
-            
-            transactions = []
-            for row in rows:
-                # Parse JSON fields
-                if row['metadata'] and isinstance(row['metadata'], str):
-                    row['metadata'] = json.loads(row['metadata'])
-                transactions.append(Transaction(**row))
-            
-            return transactions
+        
+        for row in rows:
+            # Parse JSON fields
+            if row['metadata'] and isinstance(row['metadata'], str):
+                row['metadata'] = json.loads(row['metadata'])
+        
+        return rows
 
     @staticmethod
-    async def get_transactions_by_user_id(user_id: str) -> List[Transaction]:
-        """Get all transactions for a user"""
-        query = """
-            SELECT id, account_id, user_id, transaction_type, status, amount,
-                   description, reference_number, collateral_id, metadata,
-                   loan_balance_before, loan_balance_after, invested_balance_before, 
-                   invested_balance_after, created_at, updated_at, processed_at, 
-                   failed_at, failure_reason
+    async def get_transactions_by_user_id(user_id: str) -> List[Dict[str, Any]]:
+        """Get all transactions for a user; transactions are returned as response-ready rows"""
+        query = f"""
+            SELECT {RESPONSE_COLUMNS}
             FROM transactions 
             WHERE user_id = %s
             ORDER BY created_at DESC
@@ -133,25 +209,19 @@ class TransactionDB:
         async with db_manager.get_connection() as conn:
             cursor = await conn.execute(query, (user_id,))
             rows = await cursor.fetchall()
-            
-            transactions = []
-            for row in rows:
-                # Parse JSON fields
-                if row['metadata'] and isinstance(row['metadata'], str):
-                    row['metadata'] = json.loads(row['metadata'])
-                transactions.append(Transaction(**row))
-            
-            return transactions
+        
+        for row in rows:
+            # Parse JSON fields
+            if row['metadata'] and isinstance(row['metadata'], str):
+                row['metadata'] = json.loads(row['metadata'])
+        
+        return rows
 
     @staticmethod
-    async def get_transactions_by_type(transaction_type: TransactionType) -> List[Transaction]:
-        """Get all transactions by type"""
-        query = """
-            SELECT id, account_id, user_id, transaction_type, status, amount,
-                   description, reference_number, collateral_id, metadata,
-                   loan_balance_before, loan_balance_after, invested_balance_before, 
-                   invested_balance_after, created_at, updated_at, processed_at, 
-                   failed_at, failure_reason
+    async def get_transactions_by_type(transaction_type: TransactionType) -> List[Dict[str, Any]]:
+        """Get all transactions by type; transactions are returned as response-ready rows"""
+        query = f"""
+            SELECT {RESPONSE_COLUMNS}
             FROM transactions 
             WHERE transaction_type = %s
             ORDER BY created_at DESC
@@ -160,15 +230,13 @@ class TransactionDB:
         async with db_manager.get_connection() as conn:
             cursor = await conn.execute(query, (transaction_type.value,))
             rows = await cursor.fetchall()
-            
-            transactions = []
-            for row in rows:
-                # Parse JSON fields
-                if row['metadata'] and isinstance(row['metadata'], str):
-                    row['metadata'] = json.loads(row['metadata'])
-                transactions.append(Transaction(**row))
-            
-            return transactions
+        
+        for row in rows:
+            # Parse JSON fields
+            if row['metadata'] and isinstance(row['metadata'], str):
+                row['metadata'] = json.loads(row['metadata'])
+        
+        return rows
 
     @staticmethod
     async def update_transaction(transaction_id: str, transaction_data: TransactionUpdate) -> Optional[Transaction]:
@@ -223,7 +291,7 @@ class TransactionDB:
 
     @staticmethod
     async def list_transactions(search_params: TransactionSearchParams) -> Dict[str, Any]:
-        """List transactions with filtering and pagination"""
+        """List transactions with filtering and pagination; transactions are returned as response-ready rows"""
         # Build WHERE clause
         where_conditions = []
         values = []
@@ -245,51 +313,49 @@ class TransactionDB:
             values.append(search_params.status.value)
             
         if search_params.reference_number:
-            where_conditions.append("reference_number ILIKE %s")
-            values.append(f"%{search_params.reference_number}%")
-        
-        where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
+            # Exact match, so the reference number index can be used
+            where_conditions.append("reference_number = %s")
+            values.append(search_params.reference_number)
         
         async with db_manager.get_connection() as conn:
-            # Count query
-            count_query = f"SELECT COUNT(*) FROM transactions {where_clause}"
-            cursor = await conn.execute(count_query, values)
-            total_row = await cursor.fetchone()
-            # Handle both dict and tuple results
-            if isinstance(total_row, dict):
-                total = total_row['count'] if total_row else 0
-            else:
-                total = total_row[0] if total_row else 0
+            # Exact counts cost a full scan, so only report the planner's
+            # estimate, and only when it is meaningful (no filters)
+            total = None if where_conditions else await estimate_row_count(conn, "transactions")
             
-            # Data query with pagination
-            offset = (search_params.page - 1) * search_params.page_size
+            if search_params.cursor:
+                cursor_created_at, cursor_id = decode_cursor(search_params.cursor)
+                where_conditions.append("(created_at, id) < (%s, %s)")
+                values.extend([cursor_created_at, cursor_id])
+            
+            page_size = page_limit(search_params.page_size)
+            where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
+            
+            # Fetch one extra row to know whether another page exists
             data_query = f"""
-                SELECT id, account_id, user_id, transaction_type, status, amount,
-                       description, reference_number, collateral_id, metadata,
-                       loan_balance_before, loan_balance_after, invested_balance_before, 
-                       invested_balance_after, created_at, updated_at, processed_at, 
-                       failed_at, failure_reason
+                SELECT {RESPONSE_COLUMNS}
                 FROM transactions 
                 {where_clause}
-                ORDER BY created_at DESC
-                LIMIT %s OFFSET %s
+                ORDER BY created_at DESC, id DESC
+                LIMIT %s
             """
             
-            cursor = await conn.execute(data_query, values + [search_params.page_size, offset])
+            cursor = await conn.execute(data_query, values + [page_size + 1])
             rows = await cursor.fetchall()
             
-            transactions = []
+            has_more = len(rows) > page_size
+            rows = rows[:page_size]
+            
             for row in rows:
                 # Parse JSON fields
                 if row['metadata'] and isinstance(row['metadata'], str):
                     row['metadata'] = json.loads(row['metadata'])
-                transactions.append(Transaction(**row))
             
             return {
-                "transactions": transactions,
+                "transactions": rows,
                 "total": total,
-                "page": search_params.page,
-                "page_size": search_params.page_size
+                "page_size": page_size,
+                "next_cursor": encode_cursor(rows[-1]['created_at'], rows[-1]['id']) if has_more else None,
+                "has_more": has_more
             }
 
     @staticmethod
@@ -341,6 +407,93 @@ class TransactionDB:
         
         return await TransactionDB.get_transaction_by_id(transaction_id)
 
+    @staticmethod
+    async def fail_and_revert(transaction_id: str, failure_reason: str, revert: bool = True) -> Optional[Transaction]:
+        """
+        Mark a transaction as failed, undoing its balance changes first
+
+        If revert is set and the transaction was applied, the change it made
+        (after - before) is subtracted from its account's current balances, so
+        transactions committed on the account since then are kept. Its
+        organization counterpart is undone the same way and marked reversed.
+        The transaction rows are locked first, so a transaction is never
+        reverted twice, and everything commits together.
+
+        Raises ValueError if undoing the change would overdraw an account.
+        """
+        lock_query = """
+            SELECT id, account_id,
+                   loan_balance_after - loan_balance_before AS loan_delta,
+                   invested_balance_after - invested_balance_before AS invested_delta
+            FROM transactions
+            WHERE status = 'completed'
+              AND (id = %s OR (reference_number = %s AND metadata->>'opposite_to' = %s))
+              AND loan_balance_before IS NOT NULL AND loan_balance_after IS NOT NULL
+              AND invested_balance_before IS NOT NULL AND invested_balance_after IS NOT NULL
+            FOR UPDATE
+        """
+        revert_account_query = """
+            UPDATE accounts
+            SET loan_balance = loan_balance - %s,
+                investment_balance = investment_balance - %s,
+                updated_at = %s
+            WHERE id = %s
+        """
+        reverse_counterpart_query = """
+            UPDATE transactions
+            SET status = %s, failed_at = %s, failure_reason = %s, updated_at = %s
+            WHERE id = %s
+        """
+        fail_query = """
+            UPDATE transactions 
+            SET status = %s, failed_at = %s, failure_reason = %s, updated_at = %s
+            WHERE id = %s
+            RETURNING id, account_id, user_id, transaction_type, status, amount,
+                      description, reference_number, collateral_id, metadata,
+                      loan_balance_before, loan_balance_after, invested_balance_before,
+                      invested_balance_after, created_at, updated_at, processed_at,
+                      failed_at, failure_reason
+        """
+        
+        now = datetime.utcnow()
+        reverted = []
+        
+        async with db_manager.get_connection() as conn:
+            try:
+                if revert:
+                    cursor = await conn.execute(lock_query, (transaction_id, transaction_id, transaction_id))
+                    # Accounts are always locked user first, organization second
+                    reverted = sorted(await cursor.fetchall(), key=lambda applied: applied['id'] != transaction_id)
+                    for applied in reverted:
+                        await conn.execute(revert_account_query, (
+                            applied['loan_delta'], applied['invested_delta'], now, applied['account_id']
+                        ))
+                        if applied['id'] != transaction_id:
+                            await conn.execute(reverse_counterpart_query, (
+                                "reversed", now, failure_reason, now, applied['id']
+                            ))
+                
+                cursor = await conn.execute(fail_query, (
+                    "failed", now, failure_reason, now,
+                    transaction_id
+                ))
+                row = await cursor.fetchone()
+            except CheckViolation:
+                # The account has since spent what is being taken back
+                await conn.rollback()
+                raise ValueError("Insufficient balance to revert transaction")
+            except Exception:
+                # Release the row locks
+                await conn.rollback()
+                raise
+            await conn.commit()
+        
+        for applied in reverted:
+            AccountDB.invalidate_cached(applied['account_id'])
+        if not row:
+            return None
+        return TransactionDB._transaction_from_row(row)
+
     @staticmethod
     async def get_transaction_summary_by_user(user_id: str) -> Dict[str, Any]:
         """Get transaction summary for a user"""
@@ -436,3 +589,215 @@ class TransactionDB:
             await conn.commit()
         
         return await TransactionDB.get_transaction_by_id(transaction_id)
+
+    @staticmethod
+    async def complete_with_balances(
+        transaction_id: str,
+        apply: Callable[[TransactionType, Decimal, str, Decimal, Decimal], Tuple[Decimal, Decimal]],
+        counterpart: Optional[Callable[[Dict[str, Any]], Optional[TransactionCreate]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Apply a pending transaction to its account's balances and complete it
+
+        The account row is locked while apply(transaction_type, amount, user_id,
+        loan_balance, investment_balance) computes the new (loan, investment)
+        balances, so concurrent transactions on one account cannot overwrite
+        each other.
+
+        counterpart, if given, is called with the completed transaction and may
+        return a second transaction (the organization's side of the ledger).
+        That one is inserted already completed, with its own account locked
+        and updated the same way.
+
+        Everything is committed together; if apply raises for either side,
+        nothing is written.
+
+        Returns the transaction's type, user, description and collateral along
+        with the balances before and after, and the counterpart's ID (or None).
+        """
+        select_query = """
+            SELECT t.account_id, t.user_id, t.transaction_type, t.amount,
+                   t.description, t.collateral_id, a.loan_balance, a.investment_balance
+            FROM transactions t
+            LEFT JOIN LATERAL (
+                SELECT loan_balance, investment_balance
+                FROM accounts
+                WHERE id = t.account_id
+                FOR UPDATE
+            ) a ON TRUE
+            WHERE t.id = %s
+        """
+        update_query = """
+            WITH account AS (
+                UPDATE accounts
+                SET loan_balance = %s, investment_balance = %s, updated_at = %s
+                WHERE id = %s
+            )
+            UPDATE transactions
+            SET loan_balance_before = %s, loan_balance_after = %s,
+                invested_balance_before = %s, invested_balance_after = %s,
+                status = %s, processed_at = %s, updated_at = %s
+            WHERE id = %s
+        """
+        lock_account_query = """
+            SELECT loan_balance, investment_balance
+            FROM accounts
+            WHERE id = %s
+            FOR UPDATE
+        """
+        insert_query = """
+            WITH account AS (
+                UPDATE accounts
+                SET loan_balance = %s, investment_balance = %s, updated_at = %s
+                WHERE id = %s
+            )
+            INSERT INTO transactions (
+                id, account_id, user_id, transaction_type, status, amount,
+                description, reference_number, collateral_id, metadata,
+                loan_balance_before, loan_balance_after, invested_balance_before, invested_balance_after,
+                created_at, updated_at, processed_at
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """
+
+        async with db_manager.get_connection() as conn:
+            try:
+                cursor = await conn.execute(select_query, (transaction_id,))
+                row = await cursor.fetchone()
+                if not row:
+                    raise ValueError(f"Transaction {transaction_id} not found")
+                if row['loan_balance'] is None:
+                    raise ValueError(f"Account {row['account_id']} not found")
+
+                transaction_type = TransactionType(row['transaction_type'])
+                loan_balance_after, invested_balance_after = apply(
+                    transaction_type, row['amount'], row['user_id'],
+                    row['loan_balance'], row['investment_balance']
+                )
+
+                now = datetime.utcnow()
+                await conn.execute(update_query, (
+                    loan_balance_after, invested_balance_after, now, row['account_id'],
+                    row['loan_balance'], loan_balance_after,
+                    row['investment_balance'], invested_balance_after,
+                    "completed", now, now,
+                    transaction_id
+                ))
+
+                result = {
+                    "account_id": row['account_id'],
+                    "user_id": row['user_id'],
+                    "transaction_type": transaction_type,
+                    "amount": row['amount'],
+                    "description": row['description'],
+                    "collateral_id": row['collateral_id'],
+                    "loan_balance_before": row['loan_balance'],
+                    "loan_balance_after": loan_balance_after,
+                    "invested_balance_before": row['investment_balance'],
+                    "invested_balance_after": invested_balance_after,
+                    "counterpart_id": None
+                }
+
+                other = counterpart(result) if counterpart else None
+                if other is not None:
+                    # Accounts are always locked user first, organization second
+                    cursor = await conn.execute(lock_account_query, (other.account_id,))
+                    account = await cursor.fetchone()
+                    if not account:
+                        raise ValueError(f"Account {other.account_id} not found")
+
+                    # The model holds the amount as float; apply it as the
+                    # exact decimal it was written as
+                    other_loan_after, other_invested_after = apply(
+                        other.transaction_type, Decimal(str(other.amount)), other.user_id,
+                        account['loan_balance'], account['investment_balance']
+                    )
+                    other = other.model_copy(update={
+                        "loan_balance_before": account['loan_balance'],
+                        "loan_balance_after": other_loan_after,
+                        "invested_balance_before": account['investment_balance'],
+                        "invested_balance_after": other_invested_after
+                    })
+                    result["counterpart_id"] = str(uuid.uuid4())
+                    await conn.execute(insert_query, (
+                        other_loan_after, other_invested_after, now, other.account_id,
+                        *TransactionDB._insert_params(result["counterpart_id"], other, now, status="completed"),
+                        now
+                    ))
+            except CheckViolation:
+                # The balances_non_negative constraint rejected an overdraft
+                await conn.rollback()
+                raise ValueError("Insufficient balance")
+            except Exception:
+                # Release the account locks
+                await conn.rollback()
+                raise
+            await conn.commit()
+
+        AccountDB.invalidate_cached(row['account_id'])
+        if other is not None:
+            AccountDB.invalidate_cached(other.account_id)
+        return result
+
+    @staticmethod
+    async def complete_loan_extension(
+        transaction_id: str,
+        account_id: str,
+        collateral_id: str,
+        fee: float
+    ) -> Optional[Transaction]:
+        """
+        Apply a loan extension fee and complete its transaction in one statement
+
+        The fee is added to the account's loan balance and the collateral's
+        loan amount, and the transaction records the balances before and after.
+        Everything commits together; returns None if the account or collateral
+        no longer exists.
+        """
+        now = datetime.utcnow()
+        query = """
+            WITH account AS (
+                UPDATE accounts
+                SET loan_balance = loan_balance + %s::numeric, updated_at = %s
+                WHERE id = %s
+                RETURNING loan_balance, investment_balance
+            ), collateral AS (
+                UPDATE collaterals
+                SET loan_amount = loan_amount + %s::numeric, updated_at = %s
+                WHERE id = %s
+                RETURNING id
+            )
+            UPDATE transactions t
+            SET loan_balance_before = account.loan_balance - %s::numeric,
+                loan_balance_after = account.loan_balance,
+                invested_balance_before = account.investment_balance,
+                invested_balance_after = account.investment_balance,
+                status = %s, processed_at = %s, updated_at = %s
+            FROM account, collateral
+            WHERE t.id = %s
+            RETURNING t.id, t.account_id, t.user_id, t.transaction_type, t.status, t.amount,
+                      t.description, t.reference_number, t.collateral_id, t.metadata,
+                      t.loan_balance_before, t.loan_balance_after, t.invested_balance_before,
+                      t.invested_balance_after, t.created_at, t.updated_at, t.processed_at,
+                      t.failed_at, t.failure_reason
+        """
+
+        async with db_manager.get_connection() as conn:
+            cursor = await conn.execute(query, (
+                fee, now, account_id,
+                fee, now, collateral_id,
+                fee, "completed", now, now,
+                transaction_id
+            ))
+            row = await cursor.fetchone()
+            if not row:
+                # Nothing is applied unless all three rows were updated
+                await conn.rollback()
+                return None
+            await conn.commit()
+
+        AccountDB.invalidate_cached(account_id)
+        # Parse JSON fields
+        if row['metadata'] and isinstance(row['metadata'], str):
+            row['metadata'] = json.loads(row['metadata'])
+
+        return Transaction(**row)
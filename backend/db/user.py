@@ -8,16 +8,29 @@ from typing import Optional, List, Dict, Any
 from datetime import datetime
 import uuid
 
+from psycopg.errors import UniqueViolation
+
 from dataModels.user import User, UserCreate, UserUpdate, UserSearchParams
 from database import db_manager
+from db.lookup_cache import LookupCache
+from db.pagination import encode_cursor, decode_cursor, estimate_row_count, page_limit
+
+# Cached user reads for request validation
+_user_cache = LookupCache(ttl=5)
 
 
 class UserDB:
     """Database operations for users"""
 
+    @staticmethod
+    def _duplicate_message(error: UniqueViolation) -> str:
+        """Client-facing message for a violated email/username unique constraint"""
+        field = "username" if "username" in (error.diag.constraint_name or "") else "email"
+        return f"User with this {field} already exists"
+
     @staticmethod
     async def create_user(user_data: UserCreate) -> User:
-        """Create a new user"""
+        """Create a new user; raises ValueError if the email or username is taken"""
         user_id = str(uuid.uuid4())
         now = datetime.utcnow()
         
@@ -27,6 +40,9 @@ class UserDB:
                 address, city, state, country, postal_code, role, status, 
                 kyc_verified, created_at, updated_at
             ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            RETURNING id, email, username, first_name, last_name, phone, date_of_birth,
+                      address, city, state, country, postal_code, role, status,
+                      kyc_verified, created_at, updated_at
         """
         
         params = (
@@ -49,16 +65,20 @@ class UserDB:
             now
         )
 
+        # The unique constraints on email and username make the check atomic
         async with db_manager.get_connection() as conn:
-            await conn.execute(query, params)
-            await conn.commit()
+            try:
+                cursor = await conn.execute(query, params)
+                row = await cursor.fetchone()
+                await conn.commit()
+            except UniqueViolation as e:
+                await conn.rollback()
+                raise ValueError(UserDB._duplicate_message(e))
         
-        # Fetch the created user
-        created_user = await UserDB.get_user_by_id(user_id)
-        if not created_user:
+        if not row:
             raise Exception("Failed to create user")
         
-        return created_user
+        return User(**row)
 
     @staticmethod
     async def get_user_by_id(user_id: str) -> Optional[User]:
@@ -79,6 +99,27 @@ class UserDB:
             
             return User(**row)
 
+    @staticmethod
+    async def get_users_by_ids(user_ids: List[str]) -> List[User]:
+        """Get the users with the given IDs in one query; unknown IDs are skipped"""
+        query = """
+            SELECT id, email, username, first_name, last_name, phone, date_of_birth,
+                   address, city, state, country, postal_code, role, status,
+                   kyc_verified, created_at, updated_at
+            FROM app_users 
+            WHERE id = ANY(%s)
+        """
+        
+        async with db_manager.get_connection() as conn:
+            cursor = await conn.execute(query, (list(user_ids),))
+            rows = await cursor.fetchall()
+            return [User(**row) for row in rows]
+
+    @staticmethod
+    async def get_user_by_id_cached(user_id: str) -> Optional[User]:
+        """Get a user by ID for validation; may be up to a few seconds old"""
+        return await _user_cache.get(user_id, lambda: UserDB.get_user_by_id(user_id))
+
     @staticmethod
     async def get_user_by_email(email: str) -> Optional[User]:
         """Get a user by email"""
@@ -119,7 +160,7 @@ class UserDB:
 
     @staticmethod
     async def update_user(user_id: str, user_data: UserUpdate) -> Optional[User]:
-        """Update a user"""
+        """Update a user; returns None if it does not exist and raises ValueError if the email or username is taken"""
         # Build dynamic update query based on provided fields
         update_fields = []
         values = []
@@ -149,14 +190,22 @@ class UserDB:
             UPDATE app_users 
             SET {', '.join(update_fields)}
             WHERE id = %s
+            RETURNING id, email, username, first_name, last_name, phone, date_of_birth,
+                      address, city, state, country, postal_code, role, status,
+                      kyc_verified, created_at, updated_at
         """
         
         async with db_manager.get_connection() as conn:
-            await conn.execute(query, values)
-            await conn.commit()
+            try:
+                cursor = await conn.execute(query, values)
+                row = await cursor.fetchone()
+                await conn.commit()
+            except UniqueViolation as e:
+                await conn.rollback()
+                raise ValueError(UserDB._duplicate_message(e))
         
-        # Fetch the updated user
-        return await UserDB.get_user_by_id(user_id)
+        _user_cache.pop(user_id)
+        return User(**row) if row else None
 
     @staticmethod
     async def delete_user(user_id: str) -> bool:
@@ -166,11 +215,13 @@ class UserDB:
         async with db_manager.get_connection() as conn:
             cursor = await conn.execute(query, (user_id,))
             await conn.commit()
-            return cursor.rowcount > 0
+        
+        _user_cache.pop(user_id)
+        return cursor.rowcount > 0
 
     @staticmethod
     async def list_users(search_params: UserSearchParams) -> Dict[str, Any]:
-        """List users with filtering and pagination"""
+        """List users with filtering and pagination; users are returned as response-ready rows"""
         # Build WHERE clause
         where_conditions = []
         values = []
@@ -195,40 +246,54 @@ class UserDB:
             where_conditions.append("kyc_verified = %s")
             values.append(search_params.kyc_verified)
         
-        where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
-        
         async with db_manager.get_connection() as conn:
-            # Count query
-            count_query = f"SELECT COUNT(*) FROM app_users {where_clause}"
-            cursor = await conn.execute(count_query, values)
-            total_row = await cursor.fetchone()
-            # Handle both dict and tuple results
-            if isinstance(total_row, dict):
-                total = total_row['count'] if total_row else 0
+            if search_params.cursor:
+                # Keyset pagination: seek past the last row of the previous
+                # page. Exact counts cost a full scan, so only report the
+                # planner's estimate, and only when there are no filters
+                total = None if where_conditions else await estimate_row_count(conn, "app_users")
+                cursor_created_at, cursor_id = decode_cursor(search_params.cursor)
+                where_conditions.append("(created_at, id) < (%s, %s)")
+                values.extend([cursor_created_at, cursor_id])
+                page = None
+                offset = 0
             else:
-                total = total_row[0] if total_row else 0
+                # Page-number pagination, kept for existing clients
+                where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
+                count_query = f"SELECT COUNT(*) FROM app_users {where_clause}"
+                cursor = await conn.execute(count_query, values)
+                total_row = await cursor.fetchone()
+                total = total_row['count'] if total_row else 0
+                page = search_params.page
+                offset = (page - 1) * search_params.page_size
             
-            # Data query with pagination
-            offset = (search_params.page - 1) * search_params.page_size
+            page_size = page_limit(search_params.page_size)
+            where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
+            
+            # Fetch one extra row to know whether another page exists
             data_query = f"""
                 SELECT id, email, username, first_name, last_name, phone, date_of_birth,
                        address, city, state, country, postal_code, role, status,
                        kyc_verified, created_at, updated_at
                 FROM app_users 
                 {where_clause}
-                ORDER BY created_at DESC
+                ORDER BY created_at DESC, id DESC
                 LIMIT %s OFFSET %s
             """
             
-            cursor = await conn.execute(data_query, values + [search_params.page_size, offset])
+            cursor = await conn.execute(data_query, values + [page_size + 1, offset])
             rows = await cursor.fetchall()
-            users = [User(**row) for row in rows]
+            
+            has_more = len(rows) > page_size
+            rows = rows[:page_size]
             
             return {
-                "users": users,
+                "users": rows,
                 "total": total,
-                "page": search_params.page,
-                "page_size": search_params.page_size
+                "page": page,
+                "page_size": page_size,
+                "next_cursor": encode_cursor(rows[-1]['created_at'], rows[-1]['id']) if has_more else None,
+                "has_more": has_more
             }
 
     @staticmethod
@@ -248,50 +313,79 @@ class UserDB:
         if not conditions:
             return False
         
-        query = f"SELECT COUNT(*) FROM app_users WHERE ({' OR '.join(conditions)})"
+        where_clause = f"({' OR '.join(conditions)})"
         
         if exclude_user_id:
-            query += " AND id != %s"
+            where_clause += " AND id != %s"
             values.append(exclude_user_id)
         
+        # EXISTS stops at the first matching index entry instead of counting
+        query = f"SELECT EXISTS (SELECT 1 FROM app_users WHERE {where_clause}) AS exists"
+        
         async with db_manager.get_connection() as conn:
             cursor = await conn.execute(query, values)
             result = await cursor.fetchone()
-            # Handle both dict and tuple results
-            if isinstance(result, dict):
-                return result['count'] > 0
-            else:
-                return result[0] > 0 if result else False
+            return result['exists']
+
+    @staticmethod
+    async def exists(user_id: str) -> bool:
+        """Check if a user exists by ID without fetching the row"""
+        query = "SELECT EXISTS (SELECT 1 FROM app_users WHERE id = %s) AS exists"
+        
+        async with db_manager.get_connection() as conn:
+            cursor = await conn.execute(query, (user_id,))
+            result = await cursor.fetchone()
+            return result['exists']
+
+    @staticmethod
+    async def existing_ids(user_ids: List[str]) -> set:
+        """Return which of the given user IDs exist, in one query"""
+        query = "SELECT id FROM app_users WHERE id = ANY(%s)"
+        
+        async with db_manager.get_connection() as conn:
+            cursor = await conn.execute(query, (list(user_ids),))
+            rows = await cursor.fetchall()
+            return {row['id'] for row in rows}
 
     @staticmethod
     async def update_user_status(user_id: str, status: str) -> Optional[User]:
-        """Update user status"""
+        """Update user status; returns None if the user does not exist"""
         query = """
             UPDATE app_users 
             SET status = %s, updated_at = %s
             WHERE id = %s
+            RETURNING id, email, username, first_name, last_name, phone, date_of_birth,
+                      address, city, state, country, postal_code, role, status,
+                      kyc_verified, created_at, updated_at
         """
         
         async with db_manager.get_connection() as conn:
-            await conn.execute(query, (status, datetime.utcnow(), user_id))
+            cursor = await conn.execute(query, (status, datetime.utcnow(), user_id))
+            row = await cursor.fetchone()
             await conn.commit()
         
-        return await UserDB.get_user_by_id(user_id)
+        _user_cache.pop(user_id)
+        return User(**row) if row else None
 
     @staticmethod
     async def update_kyc_status(user_id: str, kyc_verified: bool) -> Optional[User]:
-        """Update user KYC verification status"""
+        """Update user KYC verification status; returns None if the user does not exist"""
         query = """
             UPDATE app_users 
             SET kyc_verified = %s, updated_at = %s
             WHERE id = %s
+            RETURNING id, email, username, first_name, last_name, phone, date_of_birth,
+                      address, city, state, country, postal_code, role, status,
+                      kyc_verified, created_at, updated_at
         """
         
         async with db_manager.get_connection() as conn:
-            await conn.execute(query, (kyc_verified, datetime.utcnow(), user_id))
+            cursor = await conn.execute(query, (kyc_verified, datetime.utcnow(), user_id))
+            row = await cursor.fetchone()
             await conn.commit()
         
-        return await UserDB.get_user_by_id(user_id)
+        _user_cache.pop(user_id)
+        return User(**row) if row else None
 
     @staticmethod
     async def get_users_by_role(role: str) -> List[User]:
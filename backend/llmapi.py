@@ -1,8 +1,10 @@
 import anthropic
+import atexit
+import httpx
 import os 
 import base64
+from dataclasses import dataclass
 from typing import Optional, List, Dict, Any
-from pydantic import BaseModel
 
 # Load environment variables from .env file
 try:
@@ -22,7 +24,8 @@ except ImportError:
     
     load_dotenv()
 
-class ProductPriceResult(BaseModel):
+@dataclass(slots=True)
+class ProductPriceResult:
     product_name: str
     initial_price: str  # Market price for the product
     collateral_price: str  # Conservative collateral value (typically 60-80% of market value)
@@ -33,8 +36,38 @@ class ProductPriceResult(BaseModel):
     # Keep price_range for backward compatibility
     price_range: str = ""
 
+_http_client: Optional[httpx.Client] = None
+
+
+def get_http_client() -> httpx.Client:
+    """
+    Process-wide keep-alive HTTP/2 connection pool shared by every
+    AnthropicClient, so repeated calls skip the TCP/TLS handshake
+    """
+    global _http_client
+    if _http_client is None:
+        _http_client = anthropic.DefaultHttpxClient(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=64,
+                max_keepalive_connections=32,
+                keepalive_expiry=300
+            )
+        )
+        atexit.register(close_http_client)
+    return _http_client
+
+
+def close_http_client():
+    """Close the shared HTTP connection pool"""
+    global _http_client
+    if _http_client is not None:
+        _http_client.close()
+        _http_client = None
+
+
 class AnthropicClient:
-    def __init__(self):
+    def __init__(self, http_client: Optional[httpx.Client] = None):
         try: 
             API_KEY = os.getenv("ANTHROPIC_API_KEY")
             if not API_KEY:
@@ -42,7 +75,10 @@ class AnthropicClient:
         except Exception as e:
             raise Exception(f"Error setting up API key: {e}")
         
-        self.client = anthropic.Anthropic(api_key=API_KEY)
+        self.client = anthropic.Anthropic(
+            api_key=API_KEY,
+            http_client=http_client or get_http_client()
+        )
         
         # Original pricing tool
         self.pricing_tool = {
@@ -68,21 +104,25 @@ class AnthropicClient:
         }
     }
             
-    def search_product_price_from_image(self, image_path: str, additional_context: str = "") -> ProductPriceResult:
+    def search_product_price_from_image(self, image_path: str, additional_context: str = "",
+                                        image_bytes: Optional[bytes] = None) -> ProductPriceResult:
         """
         Analyze an image and search for product price information using Claude's web search capability
         
         Args:
-            image_path: Path to the image file
+            image_path: Path to the image file (only its extension is used when image_bytes is given)
             additional_context: Additional context about the product or search requirements
+            image_bytes: Image content already in memory, e.g. from an upload
             
         Returns:
             ProductPriceResult with price information
         """
         try:
             # Read and encode the image
-            with open(image_path, "rb") as image_file:
-                image_data = base64.b64encode(image_file.read()).decode('utf-8')
+            if image_bytes is None:
+                with open(image_path, "rb") as image_file:
+                    image_bytes = image_file.read()
+            image_data = base64.b64encode(image_bytes).decode('utf-8')
             
             # Determine image format from file extension
             image_format = image_path.split('.')[-1].lower()
@@ -287,8 +327,9 @@ class AnthropicClient:
         except Exception as e:
             raise Exception(f"Error getting response from Claude: {e}")
 
-    def comprehensive_product_search(self, image_base64: str, image_format: str, 
-                                   product_description: str, search_context: str = "") -> ProductPriceResult:
+    def comprehensive_product_search(self, image_base64: Optional[str] = None, image_format: str = "jpeg", 
+                                   product_description: str = "", search_context: str = "",
+                                   image_bytes: Optional[bytes] = None) -> ProductPriceResult:
         """
         Comprehensive search combining base64 image analysis with product description for enhanced price search
         
@@ -297,11 +338,17 @@ class AnthropicClient:
             image_format: Image format (e.g., 'jpeg', 'png', 'webp')
             product_description: Detailed description of the product
             search_context: Additional context for the search (e.g., "new", "used", "refurbished", age, condition)
+            image_bytes: Raw image data, used instead of image_base64; encoded only for the API request
             
         Returns:
             ProductPriceResult with comprehensive price information
         """
         try:
+            if image_bytes is not None:
+                image_base64 = base64.b64encode(image_bytes).decode('utf-8')
+            elif image_base64 is None:
+                raise ValueError("Either image_base64 or image_bytes is required")
+            
             # Clean the base64 string if it has a data URL prefix
             if image_base64.startswith('data:image/'):
                 image_base64 = image_base64.split(',')[1]
@@ -0,0 +1,3 @@
+-- Indexes backing keyset pagination on (created_at DESC, id DESC)
+CREATE INDEX IF NOT EXISTS idx_accounts_created_at_id ON accounts (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_collaterals_created_at_id ON collaterals (created_at DESC, id DESC);
@@ -0,0 +1,6 @@
+-- One account per user, enforced by the database so concurrent creates cannot
+-- both succeed. Existing duplicate accounts must be resolved before applying.
+CREATE UNIQUE INDEX IF NOT EXISTS accounts_user_id_uniq ON accounts (user_id);
+
+-- The unique index also serves user_id lookups
+DROP INDEX IF EXISTS idx_accounts_user_id;
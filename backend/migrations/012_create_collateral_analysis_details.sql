@@ -0,0 +1,10 @@
+-- Full per-image analysis results (similar images with their descriptions and
+-- thumbnails), kept out of collaterals.metadata so listings and reads of a
+-- collateral do not carry them. Only the analysis endpoint reads this table.
+CREATE TABLE IF NOT EXISTS collateral_analysis_details (
+    collateral_id VARCHAR(255) PRIMARY KEY,
+    image_analyses JSON NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    
+    FOREIGN KEY (collateral_id) REFERENCES collaterals(id) ON DELETE CASCADE
+);
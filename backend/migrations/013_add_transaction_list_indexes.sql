@@ -0,0 +1,15 @@
+-- Keyset pagination for transaction listings: each index matches a listing
+-- filter followed by the (created_at DESC, id DESC) sort key
+CREATE INDEX IF NOT EXISTS idx_transactions_created_at_id ON transactions (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_transactions_account_created_at_id ON transactions (account_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_transactions_user_created_at_id ON transactions (user_id, created_at DESC, id DESC);
+
+-- Most transactions carry no reference number, so only index those that do
+CREATE INDEX IF NOT EXISTS idx_transactions_reference_number_present
+    ON transactions (reference_number) WHERE reference_number IS NOT NULL;
+
+-- Covered by the indexes above
+DROP INDEX IF EXISTS idx_transactions_account_id;
+DROP INDEX IF EXISTS idx_transactions_user_id;
+DROP INDEX IF EXISTS idx_transactions_created_at;
+DROP INDEX IF EXISTS idx_transactions_reference_number;
@@ -0,0 +1,2 @@
+-- Index backing keyset pagination of users on (created_at DESC, id DESC)
+CREATE INDEX IF NOT EXISTS idx_app_users_created_at_id ON app_users (created_at DESC, id DESC);
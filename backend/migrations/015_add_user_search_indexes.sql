@@ -0,0 +1,13 @@
+-- email and username are UNIQUE, so exact lookups already use the unique
+-- constraints' indexes; these plain copies only slow down writes
+DROP INDEX IF EXISTS idx_app_users_email;
+DROP INDEX IF EXISTS idx_app_users_username;
+
+-- Trigram indexes for the partial-match (ILIKE '%...%') user listing filters
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS idx_app_users_email_trgm ON app_users USING gin (email gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_app_users_username_trgm ON app_users USING gin (username gin_trgm_ops);
+
+-- Status and KYC filters are usually combined in the user listing
+CREATE INDEX IF NOT EXISTS idx_app_users_status_kyc_verified ON app_users (status, kyc_verified);
+DROP INDEX IF EXISTS idx_app_users_status;
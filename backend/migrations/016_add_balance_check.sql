@@ -0,0 +1,7 @@
+-- Balances can never go negative. Balance updates already lock the account
+-- row before checking funds; this guards every other writer as well.
+-- NOT VALID skips checking existing rows; run
+-- ALTER TABLE accounts VALIDATE CONSTRAINT balances_non_negative
+-- once they are known to be clean.
+ALTER TABLE accounts
+ADD CONSTRAINT balances_non_negative CHECK (loan_balance >= 0 AND investment_balance >= 0) NOT VALID;
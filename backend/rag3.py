@@ -1,45 +1,81 @@
 import os
 import uuid
 import numpy as np
-from PIL import Image
+from PIL import Image, ImageOps, ImageEnhance
 import torch
 import clip
 from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, Distance, PointStruct
+from qdrant_client.models import (
+    VectorParams, Distance, PointStruct,
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType,
+    SearchParams, QuantizationSearchParams, SearchRequest
+)
 import requests
 from io import BytesIO
 import base64
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union
 import anthropic
 import time
 
+from services.embedding_cache import EmbeddingCache
+
 class ImageRAGSystem:
     def __init__(self, 
                  qdrant_host: str = "localhost", 
                  qdrant_port: int = 6333,
                  collection_name: str = "image_embeddings",
-                 anthropic_api_key: str = None):
+                 anthropic_api_key: str = None,
+                 qdrant_grpc_port: int = 6334,
+                 prefer_grpc: bool = True,
+                 quantize_encoder: bool = False):
         """
         Initialize the Image RAG System
         
         Args:
             qdrant_host: Qdrant server host
             qdrant_port: Qdrant server port  
+            qdrant_grpc_port: Qdrant gRPC port
+            prefer_grpc: Talk to Qdrant over gRPC instead of REST
             collection_name: Name of the collection to store embeddings
             anthropic_api_key: Anthropic API key for Claude descriptions
+            quantize_encoder: On CPU, run the image encoder's linear layers in int8
         """
         self.collection_name = collection_name
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         
         # Initialize Qdrant client
-        self.qdrant_client = QdrantClient(host=qdrant_host, port=qdrant_port)
+        self.qdrant_client = QdrantClient(
+            host=qdrant_host,
+            port=qdrant_port,
+            grpc_port=qdrant_grpc_port,
+            prefer_grpc=prefer_grpc
+        )
         
-        # Load CLIP model
+        # Load CLIP model (clip.load already keeps fp16 weights on CUDA)
         self.clip_model, self.preprocess = clip.load("ViT-B/32", device=self.device)
+        self.clip_model.eval()
+        
+        # int8 dynamic quantization of the encoder's linear layers: a quarter of
+        # the weight bandwidth and faster matmuls on CPU. Query embeddings drift
+        # slightly from the fp32 ones stored in the index, so it is opt-in.
+        if quantize_encoder and self.device == "cpu":
+            self.clip_model.visual = torch.ao.quantization.quantize_dynamic(
+                self.clip_model.visual, {torch.nn.Linear}, dtype=torch.qint8
+            )
+        
+        # Compile the image encoder once on GPU so repeated forwards skip the
+        # per-call Python/CUDA launch overhead
+        if self.device == "cuda":
+            self._encode_image = torch.compile(self.clip_model.encode_image, mode="reduce-overhead")
+        else:
+            self._encode_image = self.clip_model.encode_image
         
         # Get embedding dimension
         self.embedding_dim = 512  # CLIP ViT-B/32 embedding dimension
         
+        # Descriptions are often resubmitted, so text embeddings are cached
+        self._text_embeddings = EmbeddingCache(self._embed_text, namespace="clip-vit-b32")
+        
         # Initialize Anthropic client for image descriptions
         if anthropic_api_key:
             self.anthropic_client = anthropic.Anthropic(api_key=anthropic_api_key)
@@ -64,30 +100,70 @@ class ImageRAGSystem:
             collection_names = [col.name for col in collections.collections]
             
             if self.collection_name not in collection_names:
+                # Full-precision vectors live on disk; only the int8 copy is kept
+                # in RAM and used for the HNSW traversal
                 self.qdrant_client.create_collection(
                     collection_name=self.collection_name,
                     vectors_config=VectorParams(
                         size=self.embedding_dim,
-                        distance=Distance.COSINE
-                    )
+                        distance=Distance.COSINE,
+                        on_disk=True
+                    ),
+                    quantization_config=self._quantization_config()
                 )
+            else:
+                # Collections created before quantization was enabled are still
+                # plain float32, so attach the int8 config to them in place
+                info = self.qdrant_client.get_collection(self.collection_name)
+                if info.config.quantization_config is None:
+                    self.qdrant_client.update_collection(
+                        collection_name=self.collection_name,
+                        quantization_config=self._quantization_config()
+                    )
                 
         except Exception as e:
             raise
     
-    def load_image(self, image_source: str) -> Image.Image:
+    @staticmethod
+    def _quantization_config() -> ScalarQuantization:
+        """int8 scalar quantization kept in RAM (4x smaller than float32)"""
+        return ScalarQuantization(
+            scalar=ScalarQuantizationConfig(
+                type=ScalarType.INT8,
+                always_ram=True
+            )
+        )
+    
+    @staticmethod
+    def _search_params() -> SearchParams:
+        """
+        Oversample on the int8 index, then rescore the candidates against the
+        original vectors so ranking stays exact
+        """
+        return SearchParams(
+            quantization=QuantizationSearchParams(
+                rescore=True,
+                oversampling=2.0
+            )
+        )
+    
+    def load_image(self, image_source: Union[str, bytes]) -> Image.Image:
         """
         Load image from various sources
         
         Args:
-            image_source: Can be local file path, URL, or base64 string
+            image_source: Can be local file path, URL, base64 string, or raw image bytes
             
         Returns:
             PIL Image object
         """
         try:
+            # Raw bytes are decoded straight from memory
+            if isinstance(image_source, bytes):
+                image = Image.open(BytesIO(image_source))
+            
             # Check if it's a URL
-            if image_source.startswith(('http://', 'https://')):
+            elif image_source.startswith(('http://', 'https://')):
                 response = requests.get(image_source)
                 response.raise_for_status()
                 image = Image.open(BytesIO(response.content))
@@ -376,8 +452,8 @@ Please follow this exact format with these exact labels. Make the USER_DESCRIPTI
             image_tensor = self.preprocess(image).unsqueeze(0).to(self.device)
             
             # Extract features
-            with torch.no_grad():
-                image_features = self.clip_model.encode_image(image_tensor)
+            with torch.inference_mode():
+                image_features = self._encode_image(image_tensor)
                 
             # Normalize embeddings
             image_features = image_features / image_features.norm(dim=1, keepdim=True)
@@ -390,6 +466,80 @@ Please follow this exact format with these exact labels. Make the USER_DESCRIPTI
         except Exception as e:
             raise
     
+    def extract_text_embeddings(self, text: str) -> np.ndarray:
+        """
+        Extract CLIP text embeddings for a description, reusing cached ones
+
+        Args:
+            text: Text to embed (truncated to CLIP's context length)
+
+        Returns:
+            Read-only numpy array of normalized embeddings
+        """
+        return self._text_embeddings.get(text)
+
+    def _embed_text(self, text: str) -> np.ndarray:
+        """Run the CLIP text encoder on one text"""
+        try:
+            tokens = clip.tokenize([text], truncate=True).to(self.device)
+
+            with torch.inference_mode():
+                text_features = self.clip_model.encode_text(tokens)
+
+            text_features = text_features / text_features.norm(dim=1, keepdim=True)
+
+            return text_features.float().cpu().numpy().flatten()
+
+        except Exception as e:
+            raise
+
+    def extract_embeddings_batch(self, images: List[Image.Image]) -> np.ndarray:
+        """
+        Extract CLIP embeddings for several images in a single forward pass
+        
+        Args:
+            images: List of PIL Image objects
+            
+        Returns:
+            Numpy array of shape (len(images), embedding_dim)
+        """
+        try:
+            image_tensor = torch.stack([self.preprocess(image) for image in images])
+            if self.device == "cuda":
+                image_tensor = image_tensor.pin_memory().to(self.device, non_blocking=True)
+            
+            with torch.inference_mode():
+                image_features = self._encode_image(image_tensor)
+            
+            image_features = image_features / image_features.norm(dim=1, keepdim=True)
+            
+            return image_features.cpu().numpy()
+            
+        except Exception as e:
+            raise
+    
+    def _augmented_views(self, image: Image.Image) -> List[Image.Image]:
+        """
+        Build the query views used for multi-view retrieval: the original image
+        plus a horizontal flip, a small rotation, a mild perspective warp and a
+        sharpened copy
+        """
+        width, height = image.size
+        dx, dy = int(width * 0.05), int(height * 0.05)
+        
+        return [
+            image,
+            ImageOps.mirror(image),
+            image.rotate(10, resample=Image.BICUBIC, fillcolor=(255, 255, 255)),
+            image.transform(
+                image.size,
+                Image.QUAD,
+                (dx, 0, 0, height, width, height, width - dx, 0),
+                resample=Image.BICUBIC
+            ),
+            ImageEnhance.Sharpness(image).enhance(2.0)
+        ]
+    
     def store_image(self, 
                    image_source: str, 
                    metadata: Dict = None, 
@@ -559,7 +709,7 @@ Please follow this exact format with these exact labels. Make the USER_DESCRIPTI
             raise
     
     def find_similar_images(self, 
-                          query_image_source: str, 
+                          query_image_source: Union[str, bytes], 
                           top_k: int = 3,
                           score_threshold: float = 0.0,
                           exclude_query_image: bool = True) -> List[Dict]:
@@ -573,70 +723,176 @@ Please follow this exact format with these exact labels. Make the USER_DESCRIPTI
             exclude_query_image: Whether to exclude the query image from results
             
         Returns:
-            List of similar images with scores, structured descriptions, and base64 images
+            List of similar images with scores, structured descriptions, and base64 images,
+            sorted by score (highest first)
         """
         try:
-            # Check if collection is empty
-            collection_info = self.get_collection_info()
-            if collection_info.get('vectors_count', 0) == 0:
-                raise ValueError("Vector database is empty. Please store some images before searching.")
+            self._require_vectors()
             
             # Load and process query image
             query_image = self.load_image(query_image_source)
             query_embeddings = self.extract_embeddings(query_image)
             
-            # Search in Qdrant with more results to account for filtering
+            return self._search_by_embedding(
+                query_embeddings, query_image_source, top_k, score_threshold, exclude_query_image
+            )
+            
+        except Exception as e:
+            raise
+    
+    def find_similar_by_embedding(self,
+                                  query_embeddings: np.ndarray,
+                                  query_image_source: Union[str, bytes] = None,
+                                  top_k: int = 3,
+                                  score_threshold: float = 0.0,
+                                  exclude_query_image: bool = True) -> List[Dict]:
+        """
+        Find similar images for an image already embedded with extract_embeddings
+        
+        Same results as find_similar_images, without running CLIP again.
+        query_image_source is only used to leave the query image itself out of
+        the results.
+        """
+        self._require_vectors()
+        return self._search_by_embedding(
+            query_embeddings, query_image_source, top_k, score_threshold, exclude_query_image
+        )
+    
+    def _require_vectors(self) -> None:
+        """Raise ValueError if there is nothing to search"""
+        collection_info = self.get_collection_info()
+        if collection_info.get('vectors_count', 0) == 0:
+            raise ValueError("Vector database is empty. Please store some images before searching.")
+    
+    def _search_by_embedding(self,
+                             query_embeddings: np.ndarray,
+                             query_image_source: Union[str, bytes],
+                             top_k: int,
+                             score_threshold: float,
+                             exclude_query_image: bool) -> List[Dict]:
+        # Search in Qdrant with more results to account for filtering
+        search_limit = top_k + 1 if exclude_query_image else top_k
+        search_results = self.qdrant_client.search(
+            collection_name=self.collection_name,
+            query_vector=query_embeddings.tolist(),
+            limit=search_limit,
+            score_threshold=score_threshold,
+            with_payload=True,
+            search_params=self._search_params()
+        )
+        
+        return self._format_search_results(
+            search_results, query_image_source, top_k, exclude_query_image
+        )
+    
+    def find_similar_images_multiview(self, 
+                                      query_image_source: Union[str, bytes], 
+                                      top_k: int = 3,
+                                      score_threshold: float = 0.0,
+                                      exclude_query_image: bool = True) -> List[Dict]:
+        """
+        Find similar images using several augmented views of the query image.
+        
+        All views are embedded in one CLIP forward pass and sent to Qdrant as a
+        single search_batch call; hits are merged by keeping the best score per
+        point.
+        
+        Args:
+            query_image_source: Source of query image
+            top_k: Number of similar images to return (default: 3)
+            score_threshold: Minimum similarity score threshold
+            exclude_query_image: Whether to exclude the query image from results
+            
+        Returns:
+            List of similar images in the same format as find_similar_images
+        """
+        try:
+            self._require_vectors()
+            
+            query_image = self.load_image(query_image_source)
+            view_embeddings = self.extract_embeddings_batch(self._augmented_views(query_image))
+            
             search_limit = top_k + 1 if exclude_query_image else top_k
-            search_results = self.qdrant_client.search(
+            search_params = self._search_params()
+            batch_results = self.qdrant_client.search_batch(
                 collection_name=self.collection_name,
-                query_vector=query_embeddings.tolist(),
-                limit=search_limit,
-                score_threshold=score_threshold,
-                with_payload=True
+                requests=[
+                    SearchRequest(
+                        vector=embedding.tolist(),
+                        limit=search_limit,
+                        score_threshold=score_threshold,
+                        with_payload=True,
+                        params=search_params
+                    )
+                    for embedding in view_embeddings
+                ]
             )
             
-            # Format results with structured descriptions and base64 images
-            results = []
-            seen_images = set()  # Track seen images to avoid duplicates
+            # Merge hits across views, keeping the best score per point
+            best_hits = {}
+            for view_results in batch_results:
+                for result in view_results:
+                    current = best_hits.get(result.id)
+                    if current is None or result.score > current.score:
+                        best_hits[result.id] = result
             
-            for result in search_results:
-                # Skip the query image if exclude_query_image is True
-                if exclude_query_image and result.payload.get('source') == query_image_source:
-                    continue
-                
-                # Get image path and check for duplicates
-                image_path = result.payload.get('source', '')
-                if image_path in seen_images:
-                    continue  # Skip duplicate images
-                
-                seen_images.add(image_path)
-                
-                # Get structured description from metadata
-                structured_desc = result.payload.get('structured_description', {})
-                
-                results.append({
-                    'id': result.id,
-                    'score': result.score,
-                    'image_path': image_path,
-                    'name': structured_desc.get('name', 'Unknown'),
-                    'type': structured_desc.get('type', 'Unknown'),
-                    'model_number': structured_desc.get('model_number', 'Not visible'),
-                    'user_description': structured_desc.get('user_description', 'Unknown product'),
-                    'categories': structured_desc.get('categories', []),
-                    'detailed_description': structured_desc.get('detailed_description', 'No description available'),
-                    'base64_image': structured_desc.get('base64_image', ''),
-                    'metadata': result.payload
-                })
-                
-                # Stop if we have enough results
-                if len(results) >= top_k:
-                    break
+            merged_results = sorted(best_hits.values(), key=lambda r: r.score, reverse=True)
             
-            return results
+            return self._format_search_results(
+                merged_results, query_image_source, top_k, exclude_query_image
+            )
             
         except Exception as e:
             raise
     
+    def _format_search_results(self, 
+                               search_results: List, 
+                               query_image_source: str, 
+                               top_k: int,
+                               exclude_query_image: bool) -> List[Dict]:
+        """
+        Convert Qdrant hits into result dicts, skipping the query image and
+        duplicate image paths
+        """
+        # Format results with structured descriptions and base64 images
+        results = []
+        seen_images = set()  # Track seen images to avoid duplicates
+        
+        for result in search_results:
+            # Skip the query image if exclude_query_image is True
+            if exclude_query_image and result.payload.get('source') == query_image_source:
+                continue
+            
+            # Get image path and check for duplicates
+            image_path = result.payload.get('source', '')
+            if image_path in seen_images:
+                continue  # Skip duplicate images
+            
+            seen_images.add(image_path)
+            
+            # Get structured description from metadata
+            structured_desc = result.payload.get('structured_description', {})
+            
+            results.append({
+                'id': result.id,
+                'score': result.score,
+                'image_path': image_path,
+                'name': structured_desc.get('name', 'Unknown'),
+                'type': structured_desc.get('type', 'Unknown'),
+                'model_number': structured_desc.get('model_number', 'Not visible'),
+                'user_description': structured_desc.get('user_description', 'Unknown product'),
+                'categories': structured_desc.get('categories', []),
+                'detailed_description': structured_desc.get('detailed_description', 'No description available'),
+                'base64_image': structured_desc.get('base64_image', ''),
+                'metadata': result.payload
+            })
+            
+            # Stop if we have enough results
+            if len(results) >= top_k:
+                break
+        
+        return results
+    
     def remove_duplicate_images(self) -> Dict:
         """
         Remove duplicate images from the database based on file paths
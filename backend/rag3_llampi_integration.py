@@ -15,34 +15,56 @@ Usage:
     from rag3_llampi_integration import integrate_rag3_with_llampi
 """
 
+import atexit
+import dataclasses
+import functools
+import io
+import logging
+import logging.handlers
+import mmap
 import os
+import queue
+import re
 import sys
-import json
 import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from typing import Dict, List, Optional, Tuple, Union
 from pathlib import Path
 from datetime import datetime
 
+import numpy as np
+import orjson
+
 # Add the current directory to Python path for imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # Load environment variables
+_ENV_LINE = re.compile(rb'^([A-Za-z_][A-Za-z0-9_]*)=(.*?)\r?$', re.M)
+
+
+@functools.lru_cache(maxsize=None)
+def _load_env_once():
+    """Fallback .env loader used when python-dotenv is not installed"""
+    env_path = os.path.join(os.path.dirname(__file__), '.env')
+    if not os.path.exists(env_path) or os.path.getsize(env_path) == 0:
+        return
+    
+    with open(env_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as env_file:
+        os.environ.update({
+            key.decode(): value.decode()
+            for key, value in _ENV_LINE.findall(env_file)
+        })
+
+
 try:
     from dotenv import load_dotenv
-    load_dotenv()
 except ImportError:
-    # Fallback: manually load .env file
-    def load_dotenv():
-        env_path = os.path.join(os.path.dirname(__file__), '.env')
-        if os.path.exists(env_path):
-            with open(env_path, 'r') as f:
-                for line in f:
-                    line = line.strip()
-                    if line and not line.startswith('#') and '=' in line:
-                        key, value = line.split('=', 1)
-                        os.environ[key] = value
-    
-    load_dotenv()
+    load_dotenv = _load_env_once
+
+load_dotenv()
+
+# Only ever shown in debug logs, so resolve it once
+_API_KEY_PREFIX = os.environ.get('ANTHROPIC_API_KEY', 'Not set')[:10]
 
 # Import required modules
 try:
@@ -54,108 +76,160 @@ except ImportError as e:
     sys.exit(1)
 
 
+logger = logging.getLogger(__name__)
+_log_listener = None
+
+
+def enable_console_logging(level: int = logging.INFO):
+    """
+    Send this module's log records to stdout, for running it as a script.
+    Records are handed to a QueueListener thread so the caller never blocks on
+    console I/O. They still propagate, so applications that configure logging
+    themselves should not call this.
+    """
+    global _log_listener
+    if _log_listener is not None:
+        return
+    
+    log_queue = queue.SimpleQueue()
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(logging.Formatter("%(message)s"))
+    
+    _log_listener = logging.handlers.QueueListener(log_queue, console_handler)
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
+    
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.setLevel(level)
+
+
+# Neighbours at or above this similarity are treated as the same product, so
+# their price is reused instead of running a separate vision pricing call
+PRICE_REUSE_THRESHOLD = 0.97
+
+# When the best match is a near-duplicate, similar images scoring below
+# top score * TAIL_SCORE_RATIO keep their RAG3 data but are not priced
+NEAR_DUPLICATE_SCORE = 0.95
+TAIL_SCORE_RATIO = 0.85
+
+# Fields of each similar image's combined_info exposed in JSON results
+SIMILAR_IMAGE_JSON_FIELDS = (
+    'name', 'type', 'user_description', 'similarity_score',
+    'initial_price', 'collateral_price', 'price_range',
+    'currency', 'marketplace', 'confidence', 'pricing_skipped'
+)
+
+
 class RAG3LLAMPIIntegrator:
     """Main integration class for RAG3 and LLAMPI systems"""
     
-    def __init__(self, verbose: bool = True):
+    def __init__(self, verbose: bool = True, quantize_encoder: bool = False):
         self.verbose = verbose
+        self.quantize_encoder = quantize_encoder
         self.rag_system = None
         self.llm_client = None
+        
+        # Progress is logged at INFO; where it goes is up to the application
+        if verbose and logger.level == logging.NOTSET:
+            logger.setLevel(logging.INFO)
     
     def initialize_systems(self) -> bool:
         """Initialize RAG3 and LLM systems"""
         try:
-            if self.verbose:
-                print("📊 Initializing RAG3 system...")
-                print("   Loading CLIP model and connecting to Qdrant...")
-            
-            self.rag_system = ImageRAGSystem()
-            
-            if self.verbose:
-                print("🤖 Initializing LLM API client...")
-                print("   Initializing Anthropic client...")
+            # Reuse systems from an earlier run; both are expensive to build
+            if self.rag_system is None:
+                logger.info("📊 Initializing RAG3 system (loading CLIP model and connecting to Qdrant)...")
+                self.rag_system = ImageRAGSystem(quantize_encoder=self.quantize_encoder)
             
-            self.llm_client = AnthropicClient()
-            
-            if self.verbose:
-                print("   ✅ RAG3 system initialized successfully")
-                print("   ✅ LLM API client initialized successfully")
+            if self.llm_client is None:
+                logger.info("🤖 Initializing LLM API client...")
+                self.llm_client = AnthropicClient()
             
+            logger.info("   ✅ RAG3 system and LLM API client ready")
             return True
             
         except Exception as e:
-            error_msg = f"Failed to initialize systems: {e}"
-            if self.verbose:
-                print(f"❌ {error_msg}")
+            logger.error("❌ Failed to initialize systems: %s", e)
             return False
     
     def find_similar_images(self, image_path: str, top_k: int = 3, 
-                           score_threshold: float = 0.0) -> List[Dict]:
-        """Find similar images using RAG3 system"""
+                           score_threshold: float = 0.0,
+                           image_bytes: Optional[bytes] = None,
+                           image_embedding: Optional[np.ndarray] = None,
+                           multiview: bool = False) -> List[Dict]:
+        """
+        Find similar images using RAG3 system; image_bytes, if given, is searched instead of image_path
+
+        Pass image_embedding (from rag_system.extract_embeddings) if the image
+        was already embedded, so CLIP is not run on it again. multiview
+        searches with several augmented views of the image in one batched
+        query instead (see ImageRAGSystem.find_similar_images_multiview).
+        """
         if not self.rag_system:
             raise RuntimeError("RAG3 system not initialized")
         
-        if self.verbose:
-            print(f"🔍 Finding {top_k} similar images...")
-            print(f"   Processing image: {image_path}")
-            print("   Extracting embeddings and searching database...")
-            print("   ⏳ This may take a few minutes on first run...")
+        logger.info("🔍 Finding %d similar images for %s...", top_k, image_path)
         
         try:
-            similar_images = self.rag_system.find_similar_images(
-                image_path, 
-                top_k=top_k, 
-                score_threshold=score_threshold
-            )
-            
-            if self.verbose:
-                print("   ✅ Database search completed")
-                print(f"   Found {len(similar_images)} similar images")
+            if multiview:
+                similar_images = self.rag_system.find_similar_images_multiview(
+                    image_bytes if image_bytes is not None else image_path,
+                    top_k=top_k,
+                    score_threshold=score_threshold
+                )
+            elif image_embedding is not None:
+                similar_images = self.rag_system.find_similar_by_embedding(
+                    image_embedding,
+                    query_image_source=image_path,
+                    top_k=top_k,
+                    score_threshold=score_threshold
+                )
+            else:
+                similar_images = self.rag_system.find_similar_images(
+                    image_bytes if image_bytes is not None else image_path, 
+                    top_k=top_k, 
+                    score_threshold=score_threshold
+                )
             
+            logger.info("   ✅ Database search completed, found %d similar images", len(similar_images))
             return similar_images
             
         except Exception as e:
             error_msg = f"Database search failed: {e}"
-            if self.verbose:
-                print(f"   ❌ {error_msg}")
+            logger.error("   ❌ %s", error_msg)
             raise RuntimeError(error_msg)
     
     def analyze_image_pricing(self, image_path: str, 
-                             user_description: str = "") -> Optional[ProductPriceResult]:
-        """Analyze image and get pricing using LLM API"""
+                             user_description: str = "",
+                             image_bytes: Optional[bytes] = None) -> Optional[ProductPriceResult]:
+        """Analyze image and get pricing using LLM API; image_bytes, if given, is priced instead of reading image_path"""
         if not self.llm_client:
             raise RuntimeError("LLM client not initialized")
         
-        if self.verbose:
-            print(f"💰 Analyzing image and calculating price...")
-            print(f"   Input image: {image_path}")
-            print(f"   User description: {user_description}")
-            print("   🔍 Analyzing image with Claude...")
-            print("   ⏳ This may take 1-2 minutes for API calls...")
+        logger.info("💰 Analyzing image and calculating price for %s...", image_path)
         
         try:
-            # Log the API call details
-            print(f"\n🤖 ANTHROPIC API CALL DETAILS:")
-            print(f"   Method: search_product_price_from_image")
-            print(f"   Image path: {image_path}")
-            print(f"   Additional context: {user_description}")
-            print(f"   API Key: {os.getenv('ANTHROPIC_API_KEY', 'Not set')[:10]}...")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "anthropic call method=search_product_price_from_image image_path=%s "
+                    "context=%r api_key=%s...",
+                    image_path, user_description, _API_KEY_PREFIX
+                )
             
             pricing_result = self.llm_client.search_product_price_from_image(
                 image_path, 
-                additional_context=user_description
+                additional_context=user_description,
+                image_bytes=image_bytes
             )
             
-            if self.verbose:
-                print(f"   ✅ Input image price calculated: {pricing_result.initial_price}")
-                print(f"   💰 Collateral value: {pricing_result.collateral_price}")
-            
+            logger.info(
+                "   ✅ Input image price calculated: %s (collateral value: %s)",
+                pricing_result.initial_price, pricing_result.collateral_price
+            )
             return pricing_result
             
         except Exception as e:
-            error_msg = f"Error calculating input image price: {e}"
-            if self.verbose:
-                print(f"   ❌ {error_msg}")
+            logger.error("   ❌ Error calculating input image price: %s", e)
             return None
     
     def analyze_similar_images_pricing(self, similar_images: List[Dict]) -> List[Dict]:
@@ -163,93 +237,146 @@ class RAG3LLAMPIIntegrator:
         if not self.llm_client:
             raise RuntimeError("LLM client not initialized")
         
-        if self.verbose:
-            print(f"🔍 Analyzing {len(similar_images)} similar images and calculating prices...")
+        logger.info("🔍 Analyzing %d similar images and calculating prices...", len(similar_images))
+        
+        similar_images_analysis = [None] * len(similar_images)
+        if not similar_images:
+            return similar_images_analysis
         
-        similar_images_analysis = []
+        # Once the best match is a near-duplicate, tail neighbours well below
+        # it add little to the estimate, so skip their pricing calls
+        top_score = similar_images[0]['score']
+        pricing_threshold = top_score * TAIL_SCORE_RATIO if top_score >= NEAR_DUPLICATE_SCORE else None
         
+        to_price = []
         for i, similar_img in enumerate(similar_images):
-            if self.verbose:
-                print(f"\n--- Processing Similar Image {i+1}/{len(similar_images)} ---")
-                print(f"Name: {similar_img['name']}")
-                print(f"Type: {similar_img['type']}")
-                print(f"User Description: {similar_img['user_description']}")
-                print(f"Similarity Score: {similar_img['score']:.3f}")
-            
-            try:
-                # Log the API call details for similar images
-                if self.verbose:
-                    print(f"\n🤖 ANTHROPIC API CALL for Similar Image {i+1}:")
-                    print(f"   Method: get_price_range_from_description")
-                    print(f"   Description: {similar_img['detailed_description'][:100]}...")
-                    print(f"   Search context: Similar to {similar_img['name']}, {similar_img['user_description']}")
-                    print(f"   API Key: {os.getenv('ANTHROPIC_API_KEY', 'Not set')[:10]}...")
-                
-                # Get price for similar image using its description
-                similar_img_price = self.llm_client.get_price_range_from_description(
-                    similar_img['detailed_description'],
-                    search_context=f"Similar to {similar_img['name']}, {similar_img['user_description']}"
+            if pricing_threshold is not None and similar_img['score'] < pricing_threshold:
+                logger.info(
+                    "⏭️  Skipping pricing for similar image %d (score %.3f < %.3f)",
+                    i + 1, similar_img['score'], pricing_threshold
                 )
+                similar_images_analysis[i] = self._create_combined_analysis(similar_img, None, skipped=True)
+            else:
+                to_price.append(i)
+        
+        if not to_price:
+            return similar_images_analysis
+        
+        # The pricing calls are network-bound, so run them side by side and
+        # format each result as soon as it lands
+        with ThreadPoolExecutor(max_workers=len(to_price)) as executor:
+            futures = {
+                executor.submit(self._price_similar_image, i, similar_images[i]): i
+                for i in to_price
+            }
+            
+            for future in as_completed(futures):
+                i = futures[future]
+                similar_img = similar_images[i]
                 
-                # Combine RAG3 data with price data
-                combined_analysis = self._create_combined_analysis(similar_img, similar_img_price)
-                similar_images_analysis.append(combined_analysis)
-                
-                if self.verbose:
-                    print(f"✅ Price calculated: {similar_img_price.price_range}")
-                
-            except Exception as e:
-                if self.verbose:
-                    print(f"❌ Error calculating price for similar image {i+1}: {e}")
-                
-                # Add image without price data
-                combined_analysis = self._create_combined_analysis(similar_img, None, error=str(e))
-                similar_images_analysis.append(combined_analysis)
+                try:
+                    similar_img_price = future.result()
+                    
+                    # Combine RAG3 data with price data
+                    similar_images_analysis[i] = self._create_combined_analysis(similar_img, similar_img_price)
+                    
+                    logger.info("✅ Price calculated for similar image %d: %s", i + 1, similar_img_price.price_range)
+                    
+                except Exception as e:
+                    logger.error("❌ Error calculating price for similar image %d: %s", i + 1, e)
+                    
+                    # Add image without price data
+                    similar_images_analysis[i] = self._create_combined_analysis(similar_img, None, error=str(e))
         
         return similar_images_analysis
     
+    def _price_similar_image(self, index: int, similar_img: Dict) -> ProductPriceResult:
+        """Get the price for one similar image from its stored description"""
+        logger.info(
+            "--- Processing Similar Image %d: %s (%s), score %.3f ---",
+            index + 1, similar_img['name'], similar_img['type'], similar_img['score']
+        )
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "anthropic call method=get_price_range_from_description image=%d "
+                "description=%r api_key=%s...",
+                index + 1, similar_img['detailed_description'][:100],
+                _API_KEY_PREFIX
+            )
+        
+        return self.llm_client.get_price_range_from_description(
+            similar_img['detailed_description'],
+            search_context=f"Similar to {similar_img['name']}, {similar_img['user_description']}"
+        )
+    
     def _create_combined_analysis(self, similar_img: Dict, 
                                  price_data: Optional[ProductPriceResult], 
-                                 error: str = None) -> Dict:
-        """Create combined analysis data structure"""
+                                 error: str = None,
+                                 skipped: bool = False) -> Dict:
+        """Create combined analysis data structure; skipped marks an image deliberately left unpriced"""
+        rag3_info = {
+            'name': similar_img['name'],
+            'type': similar_img['type'],
+            'user_description': similar_img['user_description'],
+            'detailed_description': similar_img['detailed_description'],
+            'similarity_score': similar_img['score'],
+            'pricing_skipped': skipped
+        }
+        
         if price_data:
-            return {
-                'rag3_data': similar_img,
-                'price_data': price_data,
-                'combined_info': {
-                    'name': similar_img['name'],
-                    'type': similar_img['type'],
-                    'user_description': similar_img['user_description'],
-                    'detailed_description': similar_img['detailed_description'],
-                    'similarity_score': similar_img['score'],
-                    'initial_price': price_data.initial_price,
-                    'collateral_price': price_data.collateral_price,
-                    'price_range': price_data.price_range,
-                    'currency': price_data.currency,
-                    'marketplace': price_data.marketplace,
-                    'confidence': price_data.confidence,
-                    'additional_info': getattr(price_data, 'additional_info', None)
-                }
+            price_info = {
+                'initial_price': price_data.initial_price,
+                'collateral_price': price_data.collateral_price,
+                'price_range': price_data.price_range,
+                'currency': price_data.currency,
+                'marketplace': price_data.marketplace,
+                'confidence': price_data.confidence,
+                'additional_info': price_data.additional_info
+            }
+        elif skipped:
+            price_info = {
+                'initial_price': 'Not priced',
+                'collateral_price': 'Not priced',
+                'price_range': 'Not priced',
+                'currency': 'Unknown',
+                'marketplace': 'Unknown',
+                'confidence': 'low',
+                'additional_info': 'Not priced: well below a near-duplicate match'
             }
         else:
-            return {
-                'rag3_data': similar_img,
-                'price_data': None,
-                'combined_info': {
-                    'name': similar_img['name'],
-                    'type': similar_img['type'],
-                    'user_description': similar_img['user_description'],
-                    'detailed_description': similar_img['detailed_description'],
-                    'similarity_score': similar_img['score'],
-                    'initial_price': 'Price calculation failed',
-                    'collateral_price': 'Price calculation failed',
-                    'price_range': 'Price calculation failed',
-                    'currency': 'Unknown',
-                    'marketplace': 'Unknown',
-                    'confidence': 'low',
-                    'additional_info': f'Error: {error}' if error else 'Price calculation failed'
-                }
+            price_info = {
+                'initial_price': 'Price calculation failed',
+                'collateral_price': 'Price calculation failed',
+                'price_range': 'Price calculation failed',
+                'currency': 'Unknown',
+                'marketplace': 'Unknown',
+                'confidence': 'low',
+                'additional_info': f'Error: {error}' if error else 'Price calculation failed'
             }
+        
+        return {
+            'rag3_data': similar_img,
+            'price_data': price_data,
+            'skipped': skipped,
+            'combined_info': rag3_info | price_info
+        }
+    
+    def _reuse_neighbor_price(self, neighbor_analysis: Dict) -> Optional[ProductPriceResult]:
+        """Derive the input image price from a near-duplicate neighbour's price"""
+        price_data = neighbor_analysis['price_data']
+        if price_data is None:
+            return None
+        
+        similar_img = neighbor_analysis['rag3_data']
+        reuse_note = f"Reused from neighbor {similar_img['name']} (score={similar_img['score']:.3f})"
+        logger.info("♻️  %s, skipping input image pricing call", reuse_note)
+        
+        return dataclasses.replace(
+            price_data,
+            confidence='high-rag-reuse',
+            additional_info=f"{reuse_note}. {price_data.additional_info}" if price_data.additional_info else reuse_note
+        )
     
     def create_input_image_analysis(self, image_path: str, user_description: str, 
                                    pricing_result: Optional[ProductPriceResult]) -> Dict:
@@ -271,8 +398,10 @@ class RAG3LLAMPIIntegrator:
     
     def create_summary(self, input_image_price: Optional[ProductPriceResult], 
                       similar_images_analysis: List[Dict]) -> Dict:
-        """Create summary statistics"""
+        """Create summary statistics; similar images skipped on purpose are not counted as failures"""
         total_images = len(similar_images_analysis) + 1  # +1 for input image
+        skipped_price_calculations = sum(1 for img in similar_images_analysis if img.get('skipped'))
+        attempted_price_calculations = total_images - skipped_price_calculations
         successful_price_calculations = sum(1 for img in similar_images_analysis if img['price_data'] is not None)
         
         if input_image_price:
@@ -281,8 +410,9 @@ class RAG3LLAMPIIntegrator:
         return {
             'total_images_processed': total_images,
             'successful_price_calculations': successful_price_calculations,
-            'failed_price_calculations': total_images - successful_price_calculations,
-            'success_rate': f"{(successful_price_calculations/total_images)*100:.1f}%",
+            'failed_price_calculations': attempted_price_calculations - successful_price_calculations,
+            'skipped_price_calculations': skipped_price_calculations,
+            'success_rate': f"{(successful_price_calculations/attempted_price_calculations)*100:.1f}%",
             'input_image_found': input_image_price is not None,
             'similar_images_found': len(similar_images_analysis)
         }
@@ -291,12 +421,21 @@ class RAG3LLAMPIIntegrator:
                  user_description: str = "",
                  top_k: int = 3,
                  score_threshold: float = 0.0,
-                 return_json: bool = False) -> Dict:
-        """Main integration method"""
-        if self.verbose:
-            print("=" * 80)
-            print("🔄 INTEGRATING RAG3 WITH LLAMPI")
-            print("=" * 80)
+                 return_json: bool = False,
+                 price_reuse_threshold: float = PRICE_REUSE_THRESHOLD,
+                 image_bytes: Optional[bytes] = None,
+                 image_embedding: Optional[np.ndarray] = None,
+                 multiview: bool = False) -> Dict:
+        """
+        Main integration method; pass image_bytes to analyze an in-memory image (input_image_path then only names it)
+
+        image_embedding, if the caller already has the image's CLIP embedding,
+        is searched with directly instead of embedding the image again.
+        multiview retrieves with augmented views of the image (more robust to
+        crops and angle, at the cost of one batched CLIP pass).
+        """
+        logger.info("🔄 INTEGRATING RAG3 WITH LLAMPI")
+        run_timestamp = int(time.time())
         
         try:
             # Step 1: Initialize systems
@@ -304,17 +443,24 @@ class RAG3LLAMPIIntegrator:
                 return {"error": "Failed to initialize systems"}
             
             # Step 2: Find similar images
-            similar_images = self.find_similar_images(input_image_path, top_k, score_threshold)
-            
-            # Step 3: Analyze input image pricing
-            input_image_price = self.analyze_image_pricing(input_image_path, user_description)
+            similar_images = self.find_similar_images(
+                input_image_path, top_k, score_threshold, image_bytes, image_embedding, multiview
+            )
             
-            # Step 4: Analyze similar images pricing
+            # Step 3: Analyze similar images pricing
             similar_images_analysis = self.analyze_similar_images_pricing(similar_images)
             
+            # Step 4: Analyze input image pricing, reusing the top neighbour's
+            # price when it is almost certainly the same product
+            input_image_price = None
+            if similar_images and similar_images[0]['score'] >= price_reuse_threshold:
+                input_image_price = self._reuse_neighbor_price(similar_images_analysis[0])
+            
+            if input_image_price is None:
+                input_image_price = self.analyze_image_pricing(input_image_path, user_description, image_bytes)
+            
             # Step 5: Prepare results
-            if self.verbose:
-                print(f"\n📋 Preparing final results...")
+            logger.info("📋 Preparing final results...")
             
             input_image_analysis = self.create_input_image_analysis(
                 input_image_path, user_description, input_image_price
@@ -325,7 +471,8 @@ class RAG3LLAMPIIntegrator:
             results = {
                 'input_image_analysis': input_image_analysis,
                 'similar_images_analysis': similar_images_analysis,
-                'summary': summary
+                'summary': summary,
+                'timestamp': run_timestamp
             }
             
             # Step 6: Print results if verbose
@@ -340,8 +487,7 @@ class RAG3LLAMPIIntegrator:
         
         except Exception as e:
             error_msg = f"Error in rag3-llampi integration: {str(e)}"
-            if self.verbose:
-                print(f"\n❌ {error_msg}")
+            logger.error("❌ %s", error_msg)
             return {"error": error_msg}
     
     def _print_comprehensive_results(self, results: Dict, input_image_path: str, user_description: str):
@@ -365,7 +511,7 @@ class RAG3LLAMPIIntegrator:
             print(f"   Marketplace: {price_data.marketplace}")
             print(f"   Confidence: {price_data.confidence}")
             
-            if hasattr(price_data, 'additional_info') and price_data.additional_info:
+            if price_data.additional_info:
                 print(f"\n   💰 COLLATERAL VALUE EXPLANATION:")
                 print(f"   {price_data.additional_info}")
         else:
@@ -393,6 +539,7 @@ class RAG3LLAMPIIntegrator:
         print(f"   Total Images Processed: {summary['total_images_processed']}")
         print(f"   Successful Price Calculations: {summary['successful_price_calculations']}")
         print(f"   Failed Price Calculations: {summary['failed_price_calculations']}")
+        print(f"   Skipped Price Calculations: {summary['skipped_price_calculations']}")
         print(f"   Success Rate: {summary['success_rate']}")
         print(f"   Input Image Analysis: {'✅ Success' if summary['input_image_found'] else '❌ Failed'}")
         print(f"   Similar Images Found: {summary['similar_images_found']}")
@@ -417,7 +564,6 @@ class RAG3LLAMPIIntegrator:
             # Add detailed price data if available
             if input_analysis['price_data']:
                 price_data = input_analysis['price_data']
-                collateral_explanation = getattr(price_data, 'additional_info', None)
                 
                 json_results['input_image_analysis']['price_data'] = {
                     'product_name': price_data.product_name,
@@ -427,7 +573,7 @@ class RAG3LLAMPIIntegrator:
                     'currency': price_data.currency,
                     'marketplace': price_data.marketplace,
                     'confidence': price_data.confidence,
-                    'collateral_explanation': collateral_explanation
+                    'collateral_explanation': price_data.additional_info
                 }
             
             # Convert similar images analysis
@@ -436,24 +582,14 @@ class RAG3LLAMPIIntegrator:
             
             for img_analysis in similar_images:
                 combined_info = img_analysis['combined_info']
-                json_img = {
-                    'name': combined_info['name'],
-                    'type': combined_info['type'],
-                    'user_description': combined_info['user_description'],
-                    'similarity_score': combined_info['similarity_score'],
-                    'initial_price': combined_info['initial_price'],
-                    'collateral_price': combined_info['collateral_price'],
-                    'price_range': combined_info['price_range'],
-                    'currency': combined_info['currency'],
-                    'marketplace': combined_info['marketplace'],
-                    'confidence': combined_info['confidence']
-                }
-                json_results['similar_images_analysis'].append(json_img)
+                json_results['similar_images_analysis'].append(
+                    {key: combined_info[key] for key in SIMILAR_IMAGE_JSON_FIELDS}
+                )
             
             # Add summary and metadata
             json_results['summary'] = results['summary']
             json_results['metadata'] = {
-                'timestamp': int(time.time()),
+                'timestamp': results.get('timestamp') or int(time.time()),
                 'version': '2.0',
                 'integration_type': 'RAG3-LLAMPI'
             }
@@ -470,7 +606,9 @@ def integrate_rag3_with_llampi(input_image_path: str,
                               top_k: int = 3,
                               score_threshold: float = 0.0,
                               verbose: bool = True,
-                              return_json: bool = False) -> Dict:
+                              return_json: bool = False,
+                              price_reuse_threshold: float = PRICE_REUSE_THRESHOLD,
+                              image_bytes: Optional[bytes] = None) -> Dict:
     """Backward compatibility function"""
     integrator = RAG3LLAMPIIntegrator(verbose=verbose)
     return integrator.integrate(
@@ -478,39 +616,38 @@ def integrate_rag3_with_llampi(input_image_path: str,
         user_description=user_description,
         top_k=top_k,
         score_threshold=score_threshold,
-        return_json=return_json
+        return_json=return_json,
+        price_reuse_threshold=price_reuse_threshold,
+        image_bytes=image_bytes
     )
 
 
 def quick_price_check(image_path: str, description: str = "") -> Optional[ProductPriceResult]:
     """Quick function to get price for a single image without RAG search"""
     try:
-        print(f"\n🤖 QUICK PRICE CHECK - ANTHROPIC API CALL:")
-        print(f"   Method: search_product_price_from_image")
-        print(f"   Image path: {image_path}")
-        print(f"   Description: {description}")
-        print(f"   API Key: {os.getenv('ANTHROPIC_API_KEY', 'Not set')[:10]}...")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "anthropic call method=search_product_price_from_image image_path=%s "
+                "context=%r api_key=%s...",
+                image_path, description, _API_KEY_PREFIX
+            )
         
         llm_client = AnthropicClient()
         return llm_client.search_product_price_from_image(image_path, description)
     except Exception as e:
-        print(f"Quick price check failed: {e}")
+        logger.error("Quick price check failed: %s", e)
         return None
 
 
 def find_similar_only(image_path: str, top_k: int = 3) -> List[Dict]:
     """Find similar images only, without price calculation"""
     try:
-        print(f"\n🔍 RAG3 API CALL - Finding Similar Images:")
-        print(f"   Method: find_similar_images")
-        print(f"   Image path: {image_path}")
-        print(f"   Top K: {top_k}")
-        print(f"   Qdrant Host: localhost:6333")
+        logger.debug("rag3 call method=find_similar_images image_path=%s top_k=%d", image_path, top_k)
         
         rag_system = ImageRAGSystem()
         return rag_system.find_similar_images(image_path, top_k=top_k)
     except Exception as e:
-        print(f"Similar image search failed: {e}")
+        logger.error("Similar image search failed: %s", e)
         return []
 
 
@@ -529,71 +666,81 @@ def get_json_results(input_image_path: str,
     )
 
 
+# Result files are written off the caller's thread
+_results_writer = ThreadPoolExecutor(max_workers=2, thread_name_prefix="results-writer")
+
+
 class ResultsManager:
     """Class for managing and saving results"""
     
+    @staticmethod
+    def _default_filename(results: Dict, image_path: str, extension: str) -> str:
+        """Build a results filename from the image name and the run timestamp"""
+        timestamp = results.get('timestamp') or int(time.time())
+        return f"rag3_llampi_results_{Path(image_path).stem}_{timestamp}.{extension}"
+    
     @staticmethod
     def save_to_text_file(results: Dict, image_path: str, filename: str = None) -> str:
         """Save results to a text file"""
         try:
             if not filename:
-                image_name = Path(image_path).stem
-                timestamp = str(int(time.time()))
-                filename = f"rag3_llampi_results_{image_name}_{timestamp}.txt"
-            
-            with open(filename, 'w') as f:
-                f.write("RAG3-LLAMPI Integration Results\n")
-                f.write("=" * 50 + "\n\n")
-                
-                # Input image analysis
-                f.write("INPUT IMAGE ANALYSIS:\n")
-                f.write(f"Image: {image_path}\n")
-                f.write(f"User Description: {results['input_image_analysis']['user_description']}\n")
-                
-                price_data = results['input_image_analysis']['price_data']
-                if price_data:
-                    f.write(f"Product Name: {price_data.product_name}\n")
-                    f.write(f"Initial Price: {price_data.initial_price}\n")
-                    f.write(f"Collateral Price: {price_data.collateral_price}\n")
-                    f.write(f"Currency: {price_data.currency}\n")
-                    f.write(f"Marketplace: {price_data.marketplace}\n")
-                    f.write(f"Confidence: {price_data.confidence}\n")
-                    
-                    if hasattr(price_data, 'additional_info') and price_data.additional_info:
-                        f.write(f"\nCollateral Value Explanation:\n{price_data.additional_info}\n")
-                else:
-                    f.write("Price calculation failed\n")
-                
-                f.write("\n" + "=" * 50 + "\n\n")
+                filename = ResultsManager._default_filename(results, image_path, "txt")
+            
+            buffer = io.StringIO()
+            buffer.write("RAG3-LLAMPI Integration Results\n")
+            buffer.write("=" * 50 + "\n\n")
+            
+            # Input image analysis
+            buffer.write("INPUT IMAGE ANALYSIS:\n")
+            buffer.write(f"Image: {image_path}\n")
+            buffer.write(f"User Description: {results['input_image_analysis']['user_description']}\n")
+            
+            price_data = results['input_image_analysis']['price_data']
+            if price_data:
+                buffer.write(f"Product Name: {price_data.product_name}\n")
+                buffer.write(f"Initial Price: {price_data.initial_price}\n")
+                buffer.write(f"Collateral Price: {price_data.collateral_price}\n")
+                buffer.write(f"Currency: {price_data.currency}\n")
+                buffer.write(f"Marketplace: {price_data.marketplace}\n")
+                buffer.write(f"Confidence: {price_data.confidence}\n")
                 
-                # Similar images
-                f.write(f"SIMILAR IMAGES ({len(results['similar_images_analysis'])}):\n\n")
-                for i, img in enumerate(results['similar_images_analysis']):
-                    combined_info = img['combined_info']
-                    f.write(f"Similar Image {i+1}:\n")
-                    f.write(f"  Name: {combined_info['name']}\n")
-                    f.write(f"  Type: {combined_info['type']}\n")
-                    f.write(f"  Description: {combined_info['user_description']}\n")
-                    f.write(f"  Similarity Score: {combined_info['similarity_score']:.3f}\n")
-                    f.write(f"  Initial Price: {combined_info['initial_price']}\n")
-                    f.write(f"  Collateral Price: {combined_info['collateral_price']}\n")
-                    f.write(f"  Currency: {combined_info['currency']}\n")
-                    f.write(f"  Marketplace: {combined_info['marketplace']}\n")
-                    f.write(f"  Confidence: {combined_info['confidence']}\n")
-                    f.write("\n")
-                
-                # Summary
-                summary = results['summary']
-                f.write("SUMMARY:\n")
-                f.write(f"Total Images: {summary['total_images_processed']}\n")
-                f.write(f"Successful Calculations: {summary['successful_price_calculations']}\n")
-                f.write(f"Success Rate: {summary['success_rate']}\n")
-            
-            print(f"✅ Results saved to: {filename}")
+                if price_data.additional_info:
+                    buffer.write(f"\nCollateral Value Explanation:\n{price_data.additional_info}\n")
+            else:
+                buffer.write("Price calculation failed\n")
+            
+            buffer.write("\n" + "=" * 50 + "\n\n")
+            
+            # Similar images
+            buffer.write(f"SIMILAR IMAGES ({len(results['similar_images_analysis'])}):\n\n")
+            for i, img in enumerate(results['similar_images_analysis']):
+                combined_info = img['combined_info']
+                buffer.write(f"Similar Image {i+1}:\n")
+                buffer.write(f"  Name: {combined_info['name']}\n")
+                buffer.write(f"  Type: {combined_info['type']}\n")
+                buffer.write(f"  Description: {combined_info['user_description']}\n")
+                buffer.write(f"  Similarity Score: {combined_info['similarity_score']:.3f}\n")
+                buffer.write(f"  Initial Price: {combined_info['initial_price']}\n")
+                buffer.write(f"  Collateral Price: {combined_info['collateral_price']}\n")
+                buffer.write(f"  Currency: {combined_info['currency']}\n")
+                buffer.write(f"  Marketplace: {combined_info['marketplace']}\n")
+                buffer.write(f"  Confidence: {combined_info['confidence']}\n")
+                buffer.write("\n")
+            
+            # Summary
+            summary = results['summary']
+            buffer.write("SUMMARY:\n")
+            buffer.write(f"Total Images: {summary['total_images_processed']}\n")
+            buffer.write(f"Successful Calculations: {summary['successful_price_calculations']}\n")
+            buffer.write(f"Success Rate: {summary['success_rate']}\n")
+            
+            Path(filename).write_text(buffer.getvalue(), encoding='utf-8')
+            
+            logger.info("✅ Results saved to: %s", filename)
             return filename
             
         except Exception as e:
-            print(f"❌ Error saving results: {e}")
+            logger.error("❌ Error saving results: %s", e)
             return ""
     
     @staticmethod
@@ -601,22 +748,31 @@ class ResultsManager:
         """Save results to a JSON file"""
         try:
             if not filename:
-                image_name = Path(image_path).stem
-                timestamp = str(int(time.time()))
-                filename = f"rag3_llampi_results_{image_name}_{timestamp}.json"
+                filename = ResultsManager._default_filename(results, image_path, "json")
             
             integrator = RAG3LLAMPIIntegrator(verbose=False)
             json_results = integrator._convert_results_to_json(results)
             
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(json_results, f, indent=2, ensure_ascii=False)
+            Path(filename).write_bytes(
+                orjson.dumps(json_results, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+            )
             
-            print(f"✅ JSON results saved to: {filename}")
+            logger.info("✅ JSON results saved to: %s", filename)
             return filename
             
         except Exception as e:
-            print(f"❌ Error saving JSON results: {e}")
+            logger.error("❌ Error saving JSON results: %s", e)
             return ""
+    
+    @staticmethod
+    def save_in_background(results: Dict, image_path: str, 
+                           formats: Tuple[str, ...] = ("text", "json")) -> List[Future]:
+        """Write result files on a background thread; returns one future per format"""
+        savers = {
+            "text": ResultsManager.save_to_text_file,
+            "json": ResultsManager.save_to_json_file
+        }
+        return [_results_writer.submit(savers[fmt], results, image_path) for fmt in formats]
 
 
 def interactive_mode():
@@ -667,15 +823,14 @@ def interactive_mode():
                 save_format = input("📁 Save as: (1) Text file, (2) JSON file, or (3) Both? Enter 1, 2, or 3: ").strip()
                 
                 if save_format == "1":
-                    ResultsManager.save_to_text_file(results, image_path)
+                    ResultsManager.save_in_background(results, image_path, ("text",))
                 elif save_format == "2":
-                    ResultsManager.save_to_json_file(results, image_path)
+                    ResultsManager.save_in_background(results, image_path, ("json",))
                 elif save_format == "3":
-                    ResultsManager.save_to_text_file(results, image_path)
-                    ResultsManager.save_to_json_file(results, image_path)
+                    ResultsManager.save_in_background(results, image_path)
                 else:
                     print("❌ Invalid choice. Saving as text file.")
-                    ResultsManager.save_to_text_file(results, image_path)
+                    ResultsManager.save_in_background(results, image_path, ("text",))
         else:
             print(f"\n❌ Analysis failed: {results['error']}")
             
@@ -716,6 +871,7 @@ def example_usage():
 
 
 if __name__ == "__main__":
+    enable_console_logging()
     print("RAG3-LLAMPI Integration Tool")
     print("=" * 40)
     
@@ -1,11 +1,13 @@
-from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi import APIRouter, HTTPException, Query, Depends, Response
 from typing import List, Optional
+from psycopg.errors import UniqueViolation
 
 from dataModels.account import (
     Account, AccountCreate, AccountUpdate, AccountResponse, 
     AccountListResponse, AccountSearchParams, AccountStatus
 )
 from db.account import AccountDB
+from responses import FastJSONResponse
 
 router = APIRouter(prefix="/accounts", tags=["accounts"])
 
@@ -14,12 +16,9 @@ router = APIRouter(prefix="/accounts", tags=["accounts"])
 async def create_account(account_data: AccountCreate):
     """Create a new account (one per user) - account number is auto-generated"""
     try:
-        # Check if user already has an account
-        existing_account = await AccountDB.get_account_by_user_id(account_data.user_id)
-        if existing_account:
-            raise HTTPException(status_code=400, detail="User already has an account")
-        
         account = await AccountDB.create_account(account_data)
+        if not account:
+            raise HTTPException(status_code=400, detail="User already has an account")
         return account
     except HTTPException:
         raise
@@ -32,8 +31,8 @@ async def list_accounts(
     user_id: Optional[str] = Query(None, description="Filter by user ID"),
     account_number: Optional[str] = Query(None, description="Filter by account number (partial match)"),
     status: Optional[AccountStatus] = Query(None, description="Filter by status"),
-    page: int = Query(1, ge=1, description="Page number"),
-    page_size: int = Query(20, ge=1, le=100, description="Number of accounts per page")
+    page_size: int = Query(20, ge=1, le=100, description="Number of accounts per page"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's next_cursor")
 ):
     """Get all accounts with filtering and pagination"""
     try:
@@ -41,12 +40,15 @@ async def list_accounts(
             user_id=user_id,
             account_number=account_number,
             status=status,
-            page=page,
-            page_size=page_size
+            page_size=page_size,
+            cursor=cursor
         )
         
+        # Rows are already response-shaped; skip per-row model validation
         result = await AccountDB.list_accounts(search_params)
-        return AccountListResponse(**result)
+        return FastJSONResponse(result)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
@@ -97,21 +99,14 @@ async def get_account_by_number(account_number: str):
 async def update_account(account_id: str, account_data: AccountUpdate):
     """Update an account"""
     try:
-        # Check if account exists
-        existing_account = await AccountDB.get_account_by_id(account_id)
-        if not existing_account:
-            raise HTTPException(status_code=404, detail="Account not found")
-        
-        # Check for unique constraints if account_number is being updated
-        if account_data.account_number and account_data.account_number != existing_account.account_number:
-            if await AccountDB.account_exists(account_number=account_data.account_number):
-                raise HTTPException(status_code=400, detail="Account number already exists")
-        
         updated_account = await AccountDB.update_account(account_id, account_data)
         if not updated_account:
-            raise HTTPException(status_code=500, detail="Failed to update account")
+            raise HTTPException(status_code=404, detail="Account not found")
         
         return updated_account
+    except UniqueViolation:
+        # account_number is UNIQUE, so the database rejects duplicates for us
+        raise HTTPException(status_code=400, detail="Account number already exists")
     except HTTPException:
         raise
     except Exception as e:
@@ -122,14 +117,9 @@ async def update_account(account_id: str, account_data: AccountUpdate):
 async def delete_account(account_id: str):
     """Delete an account"""
     try:
-        # Check if account exists
-        existing_account = await AccountDB.get_account_by_id(account_id)
-        if not existing_account:
-            raise HTTPException(status_code=404, detail="Account not found")
-        
         success = await AccountDB.delete_account(account_id)
         if not success:
-            raise HTTPException(status_code=500, detail="Failed to delete account")
+            raise HTTPException(status_code=404, detail="Account not found")
         
         return {"message": "Account deleted successfully"}
     except HTTPException:
@@ -142,14 +132,9 @@ async def delete_account(account_id: str):
 async def update_account_status(account_id: str, status: AccountStatus):
     """Update account status"""
     try:
-        # Check if account exists
-        existing_account = await AccountDB.get_account_by_id(account_id)
-        if not existing_account:
-            raise HTTPException(status_code=404, detail="Account not found")
-        
         updated_account = await AccountDB.update_account_status(account_id, status.value)
         if not updated_account:
-            raise HTTPException(status_code=500, detail="Failed to update account status")
+            raise HTTPException(status_code=404, detail="Account not found")
         
         return updated_account
     except HTTPException:
@@ -162,14 +147,9 @@ async def update_account_status(account_id: str, status: AccountStatus):
 async def close_account(account_id: str):
     """Close an account"""
     try:
-        # Check if account exists
-        existing_account = await AccountDB.get_account_by_id(account_id)
-        if not existing_account:
-            raise HTTPException(status_code=404, detail="Account not found")
-        
         closed_account = await AccountDB.close_account(account_id)
         if not closed_account:
-            raise HTTPException(status_code=500, detail="Failed to close account")
+            raise HTTPException(status_code=404, detail="Account not found")
         
         return closed_account
     except HTTPException:
@@ -182,7 +162,16 @@ async def close_account(account_id: str):
 async def check_account_exists(account_id: str):
     """Check if an account exists"""
     try:
-        account = await AccountDB.get_account_by_id(account_id)
-        return {"exists": account is not None}
+        return {"exists": await AccountDB.exists(account_id)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+@router.head("/{account_id}")
+async def probe_account(account_id: str):
+    """Check if an account exists; answers 200 or 404 with no body"""
+    try:
+        exists = await AccountDB.exists(account_id)
+    except Exception:
+        return Response(status_code=500)
+    return Response(status_code=200 if exists else 404)
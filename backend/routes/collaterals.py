@@ -1,15 +1,22 @@
-from fastapi import APIRouter, HTTPException, Query, UploadFile, File
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query, UploadFile, File, Form
+from typing import Any, List, Optional
 from datetime import datetime, timedelta
-import base64
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+import asyncio
+import hashlib
 import re
 import os
 import uuid
 
+import aiofiles
+
 from dataModels.collateral import (
     Collateral, CollateralCreateRequest, CollateralCreateSimple, CollateralUpdate, CollateralResponse, 
     CollateralListResponse, CollateralSearchParams, CollateralStatus, CollateralApproveRequest,
-    ImageAnalysisRequest, ImageAnalysisResponse
+    CollateralAnalysisDetails, ImageAnalysisRequest, ImageAnalysisJobResponse, BatchImageAnalysisRequest,
+    BatchImageAnalysisJobResponse
 )
 from dataModels.transaction import (
     TransactionCreate, TransactionType, ExtendLoanRequest, TransactionResponse
@@ -19,36 +26,270 @@ from db.user import UserDB
 from db.account import AccountDB
 from db.transaction import TransactionDB
 from services.balance_service import BalanceService
-from rag3_llampi_integration import integrate_rag3_with_llampi
+from services.analysis_service import AnalysisJobService
+from services.proximity_cache import ProximityCache, DEFAULT_MAX_DISTANCE
+from services.pricing_cache import PricingCache
+from responses import FastJSONResponse
 
 router = APIRouter(prefix="/collaterals", tags=["collaterals"])
 
+# First number in an LLM price range, e.g. "$1,200 - $1,800" -> "1,200"
+_PRICE_RE = re.compile(r"\d[\d,]*")
+_NO_COMMA = str.maketrans("", "", ",")
+
+# Similar-image and pricing results for recently priced images, matched by CLIP
+# image embedding and collateral description embedding
+_pricing_cache = ProximityCache(dims=(512, 512), max_distances=(0.03, DEFAULT_MAX_DISTANCE))
+
+# Exact tier in front of it: pricing results on disk, keyed by image content
+_exact_pricing_cache = PricingCache()
+
+# At most this many images are priced at once across requests, to protect the LLM API
+IMAGE_ANALYSIS_CONCURRENCY = 8
+_image_analysis_slots = asyncio.Semaphore(IMAGE_ANALYSIS_CONCURRENCY)
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Largest image accepted, whether stored or analyzed from memory
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+
+# Uploaded images are stored here; requests may only name images inside it
+UPLOAD_DIR = os.path.realpath(os.path.join(os.path.dirname(__file__), '..', 'data'))
+
+# File extensions for the image formats _sniff recognizes
+_IMAGE_EXTENSIONS = {"jpeg": ".jpg", "png": ".png", "gif": ".gif", "webp": ".webp"}
+
+
+def _sniff(buf: bytes) -> Optional[str]:
+    """Image format from its leading magic bytes, or None if unrecognized"""
+    if buf.startswith(b"\x89PNG"):
+        return "png"
+    if buf[:4] == b"RIFF" and buf[8:12] == b"WEBP":
+        return "webp"
+    if buf.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if buf.startswith((b"GIF87a", b"GIF89a")):
+        return "gif"
+    return None
 
-@router.post("/analyze-image", response_model=ImageAnalysisResponse, status_code=200)
+def _resolve_upload(image_path: str) -> Optional[str]:
+    """
+    Absolute path of an uploaded image, or None if image_path does not name a
+    file inside UPLOAD_DIR
+
+    Relative paths are taken from the backend root, as /upload-image returns
+    them. Symlinks and '..' are resolved before the check, so a client cannot
+    name any other file on the server.
+    """
+    path = os.path.realpath(os.path.join(os.path.dirname(UPLOAD_DIR), image_path))
+    if os.path.commonpath([path, UPLOAD_DIR]) != UPLOAD_DIR or not os.path.isfile(path):
+        return None
+    return path
+
+
+async def _read_capped(file: UploadFile) -> bytes:
+    """Read an upload into memory, refusing anything over MAX_UPLOAD_BYTES"""
+    image_bytes = await file.read(MAX_UPLOAD_BYTES + 1)
+    if len(image_bytes) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Image larger than {MAX_UPLOAD_BYTES} bytes")
+    return image_bytes
+
+
+def _embed_images(rag_system, images: List[bytes]) -> list:
+    """
+    CLIP-embed several images in one forward pass
+
+    Returns one embedding per image, in order; an image that cannot be
+    decoded gets its exception instead, so it fails alone.
+    """
+    decoded = []
+    for image_bytes in images:
+        try:
+            decoded.append(rag_system.load_image(image_bytes))
+        except Exception as e:
+            decoded.append(e)
+    loaded = [image for image in decoded if not isinstance(image, Exception)]
+    embeddings = iter(rag_system.extract_embeddings_batch(loaded) if loaded else ())
+    return [image if isinstance(image, Exception) else next(embeddings) for image in decoded]
+
+
+# Blocking CLIP, Qdrant and LLM calls run here rather than in the loop's
+# default executor, so slow pricing calls cannot starve file I/O and other
+# to_thread users
+BLOCKING_WORKERS = 16
+_blocking_pool = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="collateral-blocking")
+
+
+async def _run_blocking(fn, *args, **kwargs):
+    """Run a blocking call on the collateral thread pool"""
+    return await asyncio.get_running_loop().run_in_executor(_blocking_pool, partial(fn, *args, **kwargs))
+
+
+@dataclass(slots=True)
+class ImageResult:
+    """Outcome of pricing one collateral image; the defaults are the fallback valuation"""
+    image_path: str
+    estimated_value: float = 1000.0
+    loan_limit: float = 700.0
+    priced: bool = False  # True when estimated_value was read from the LLM price
+    similar_images: Optional[List[dict]] = None
+    pricing_result: Any = None
+    error: Optional[str] = None
+
+    def to_analysis(self) -> dict:
+        """The image's entry in the collateral's image analyses"""
+        if self.error is not None:
+            return {
+                "image_path": self.image_path,
+                "error": self.error,
+                "pricing_analysis": {
+                    "estimated_value": self.estimated_value,
+                    "loan_limit": self.loan_limit
+                }
+            }
+        
+        pricing_result = self.pricing_result
+        return {
+            "image_path": self.image_path,
+            "similar_images": self.similar_images,
+            "pricing_analysis": {
+                "product_name": pricing_result.product_name,
+                "price_range": pricing_result.price_range,
+                "currency": pricing_result.currency,
+                "marketplace": pricing_result.marketplace,
+                "confidence": pricing_result.confidence,
+                "estimated_value": self.estimated_value,
+                "loan_limit": self.loan_limit
+            },
+            "rag3_metadata": {
+                "similar_images_found": len(self.similar_images),
+                # Results come back sorted by score, best first
+                "top_similarity_score": self.similar_images[0]['score'] if self.similar_images else 0.0
+            }
+        }
+
+
+def _compact_analysis(image_analysis: dict) -> dict:
+    """
+    The per-image summary kept in collateral metadata: similar images are
+    referenced by ID, their descriptions and thumbnails stay in the
+    analysis details
+    """
+    compact = {key: value for key, value in image_analysis.items() if key != "similar_images"}
+    if "rag3_metadata" in compact:
+        compact["rag3_metadata"] = {
+            **compact["rag3_metadata"],
+            "similar_image_ids": [str(img['id']) for img in image_analysis["similar_images"]]
+        }
+    return compact
+
+
+# Pricing systems shared by all create_collateral requests
+_rag_system = None
+_llm_client = None
+_systems_lock = asyncio.Lock()
+
+
+async def _get_rag_system():
+    """Return the shared RAG3 system, loading CLIP and connecting to Qdrant on first use"""
+    global _rag_system
+    async with _systems_lock:
+        if _rag_system is None:
+            from rag3 import ImageRAGSystem
+            _rag_system = await _run_blocking(ImageRAGSystem)
+            print(f"✅ RAG3 system initialized")
+    return _rag_system
+
+
+async def _get_llm_client():
+    """Return the shared LLM client, creating it on first use"""
+    global _llm_client
+    async with _systems_lock:
+        if _llm_client is None:
+            from llmapi import AnthropicClient
+            _llm_client = AnthropicClient()
+            print(f"✅ LLM client initialized for pricing analysis")
+    return _llm_client
+
+
+@router.post("/analyze-image", response_model=ImageAnalysisJobResponse, status_code=202)
 async def analyze_image_for_collateral(request: ImageAnalysisRequest):
-    """Analyze an image for collateral assessment using RAG3-LLAMPI integration"""
+    """Queue an image for collateral assessment using RAG3-LLAMPI integration"""
+    try:
+        # Validate user exists
+        user = await UserDB.get_user_by_id_cached(request.user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        image_file = _resolve_upload(request.image_path)
+        if image_file is None:
+            raise HTTPException(status_code=404, detail="Image not found")
+        
+        # The pipeline runs in a worker process; the client polls for the result
+        return await AnalysisJobService.submit(request.model_copy(update={"image_path": image_file}))
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Analysis error: {str(e)}")
+
+
+@router.post("/analyze-image/upload", response_model=ImageAnalysisJobResponse, status_code=202)
+async def analyze_uploaded_image_for_collateral(
+    user_id: str = Form(..., description="ID of the user requesting the analysis"),
+    file: UploadFile = File(..., description="Image to analyze"),
+    user_description: str = Form("", description="User's description of the item"),
+    top_k: int = Form(3, ge=1, le=10, description="Number of similar images to find"),
+    score_threshold: float = Form(0.0, description="Minimum similarity score threshold"),
+    multiview: bool = Form(False, description="Search with several augmented views of the image")
+):
+    """Queue an uploaded image for collateral assessment; the image is analyzed from memory"""
     try:
+        # Validate file type
+        if not file.content_type or not file.content_type.startswith('image/'):
+            raise HTTPException(status_code=400, detail="File must be an image")
+        
         # Validate user exists
-        user = await UserDB.get_user_by_id(request.user_id)
+        user = await UserDB.get_user_by_id_cached(user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
-        # Run the RAG3-LLAMPI integration
-        results = integrate_rag3_with_llampi(
-            input_image_path=request.image_path,
-            user_description=request.user_description,
-            top_k=request.top_k,
-            score_threshold=request.score_threshold,
-            verbose=False,  # No console output for API
-            return_json=True  # Return JSON format
+        analysis_request = ImageAnalysisRequest(
+            user_id=user_id,
+            image_path=file.filename or "upload.jpg",
+            user_description=user_description,
+            top_k=top_k,
+            score_threshold=score_threshold,
+            multiview=multiview
         )
         
-        if "error" in results:
-            raise HTTPException(status_code=500, detail=f"Analysis failed: {results['error']}")
+        return await AnalysisJobService.submit(analysis_request, image_bytes=await _read_capped(file))
         
-        # Convert the results to match our response model
-        # The results are already in JSON format from the integration
-        return ImageAnalysisResponse(**results)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Analysis error: {str(e)}")
+
+
+@router.post("/analyze-image/batch", response_model=BatchImageAnalysisJobResponse, status_code=202)
+async def analyze_images_for_collateral(request: BatchImageAnalysisRequest):
+    """Queue several images for collateral assessment in one call"""
+    try:
+        # One query validates every distinct user in the batch
+        user_ids = {item.user_id for item in request.items}
+        missing_users = user_ids - await UserDB.existing_ids(list(user_ids))
+        if missing_users:
+            raise HTTPException(status_code=404, detail=f"User not found: {', '.join(sorted(missing_users))}")
+        
+        image_files = [_resolve_upload(item.image_path) for item in request.items]
+        missing_images = [item.image_path for item, image_file in zip(request.items, image_files) if image_file is None]
+        if missing_images:
+            raise HTTPException(status_code=404, detail=f"Image not found: {', '.join(missing_images)}")
+        
+        jobs = await AnalysisJobService.submit_batch([
+            item.model_copy(update={"image_path": image_file})
+            for item, image_file in zip(request.items, image_files)
+        ])
+        return FastJSONResponse({"items": jobs}, status_code=202)
         
     except HTTPException:
         raise
@@ -56,112 +297,161 @@ async def analyze_image_for_collateral(request: ImageAnalysisRequest):
         raise HTTPException(status_code=500, detail=f"Analysis error: {str(e)}")
 
 
+@router.get("/analyze-image/{job_id}", response_model=ImageAnalysisJobResponse)
+async def get_image_analysis(job_id: str):
+    """Get the status and, once finished, the result of an image analysis job"""
+    job = await AnalysisJobService.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Analysis job not found")
+    # The job record was produced by the pipeline, so skip re-validating the
+    # large nested result on the event loop
+    return FastJSONResponse(job)
+
+
 @router.post("/", response_model=CollateralResponse, status_code=201)
 async def create_collateral(collateral_data: CollateralCreateRequest):
     """Create a new collateral with RAG3 image analysis and LLM pricing"""
     try:
-        # Validate user exists
-        user = await UserDB.get_user_by_id(collateral_data.user_id)
+        # Validate user exists before any image analysis; the insert below
+        # checks again in case the user was deleted meanwhile
+        user = await UserDB.get_user_by_id_cached(collateral_data.user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
         if not collateral_data.images:
             raise HTTPException(status_code=400, detail="No images provided")
         
-        # Initialize RAG3 system for image analysis
+        image_files = [_resolve_upload(image_path) for image_path in collateral_data.images]
+        missing_images = [path for path, image_file in zip(collateral_data.images, image_files) if image_file is None]
+        if missing_images:
+            raise HTTPException(status_code=404, detail=f"Image not found: {', '.join(missing_images)}")
+        
+        # RAG3 system for image analysis (loaded once, on first use)
         try:
-            from rag3 import ImageRAGSystem
-            rag_system = ImageRAGSystem()
-            print(f"✅ RAG3 system initialized for user {collateral_data.user_id}")
+            rag_system = await _get_rag_system()
         except Exception as e:
             print(f"❌ Failed to initialize RAG3 system: {e}")
             raise HTTPException(status_code=500, detail=f"Failed to initialize image analysis system: {str(e)}")
         
-        # Initialize LLM client for pricing
+        # LLM client for pricing (shared so its connection pool stays warm)
         try:
-            from llmapi import AnthropicClient
-            llm_client = AnthropicClient()
-            print(f"✅ LLM client initialized for pricing analysis")
+            llm_client = await _get_llm_client()
         except Exception as e:
             print(f"❌ Failed to initialize LLM client: {e}")
             raise HTTPException(status_code=500, detail=f"Failed to initialize pricing system: {str(e)}")
         
-        # Process each image through RAG3 and get pricing
-        image_analyses = []
-        total_estimated_value = 0.0
+        search_context = f"Collateral item: {collateral_data.name}"
         
-        for i, image_path in enumerate(collateral_data.images):
+        async def _prepare(image_file: str):
+            """Read one image and look it up in the exact pricing cache"""
+            async with aiofiles.open(image_file, "rb") as f:
+                image_bytes = await f.read()
+            
+            # This exact image was priced before with the same description.
+            # A forced fresh analysis skips both lookups but still stores
+            # its results.
+            exact_key = PricingCache.key(image_bytes, collateral_data.description, search_context)
+            cached = await _run_blocking(_exact_pricing_cache.get, exact_key) \
+                if collateral_data.reuse_analysis else None
+            return image_bytes, exact_key, cached
+        
+        prepared = await asyncio.gather(*[_prepare(image_file) for image_file in image_files], return_exceptions=True)
+        
+        # Images not priced before are CLIP-embedded together in one forward
+        # pass, and the description once for all of them
+        to_embed = [i for i, item in enumerate(prepared) if not isinstance(item, BaseException) and item[2] is None]
+        cache_keys: dict = {}
+        if to_embed:
             try:
-                print(f"🔍 Processing image {i+1}/{len(collateral_data.images)}: {image_path}")
-                
-                # Step 1: Find similar images using RAG3
-                similar_images = rag_system.find_similar_images(
-                    query_image_source=image_path,
-                    top_k=3,
-                    score_threshold=0.7,
-                    exclude_query_image=True
+                image_embeddings, text_embedding = await _run_blocking(
+                    lambda: (
+                        _embed_images(rag_system, [prepared[i][0] for i in to_embed]),
+                        rag_system.extract_text_embeddings(collateral_data.description)
+                    )
                 )
-                print(f"   Found {len(similar_images)} similar images")
+                for i, image_embedding in zip(to_embed, image_embeddings):
+                    cache_keys[i] = image_embedding if isinstance(image_embedding, Exception) \
+                        else (image_embedding, text_embedding)
+            except Exception as e:
+                cache_keys = dict.fromkeys(to_embed, e)
+        
+        async def _analyze_one(i: int, image_path: str) -> ImageResult:
+            """Price one image; blocking RAG3 and LLM calls run in worker threads"""
+            async with _image_analysis_slots:
+                print(f"🔍 Processing image {i+1}/{len(collateral_data.images)}: {image_path}")
                 
-                # Step 2: Get pricing for the current image using LLM
-                # Convert image to base64 for LLM API
-                with open(image_path, "rb") as image_file:
-                    image_base64 = base64.b64encode(image_file.read()).decode('utf-8')
+                if isinstance(prepared[i], BaseException):
+                    raise prepared[i]
+                image_bytes, exact_key, cached = prepared[i]
                 
-                # Get pricing using comprehensive search
-                pricing_result = llm_client.comprehensive_product_search(
-                    image_base64=image_base64,
-                    image_format="jpeg",  # You might want to detect this dynamically
-                    product_description=collateral_data.description,
-                    search_context=f"Collateral item: {collateral_data.name}"
-                )
+                if cached is not None:
+                    similar_images, pricing_result = cached
+                    print(f"   ♻️ Reusing analysis of an identical image")
+                else:
+                    cache_key = cache_keys[i]
+                    if isinstance(cache_key, Exception):
+                        raise cache_key
+                    
+                    # A near-identical image with the same description was priced recently
+                    cached = _pricing_cache.lookup(cache_key, scope=collateral_data.name) \
+                        if collateral_data.reuse_analysis else None
+                    if cached is not None:
+                        similar_images, pricing_result = cached
+                        print(f"   ♻️ Reusing analysis of a near-identical image")
+                    else:
+                        # Step 1: Find similar images using RAG3, reusing the
+                        # image embedding computed for the cache key
+                        similar_images = await _run_blocking(
+                            rag_system.find_similar_by_embedding,
+                            cache_key[0],
+                            query_image_source=image_path,
+                            top_k=3,
+                            score_threshold=0.7,
+                            exclude_query_image=True
+                        )
+                        print(f"   Found {len(similar_images)} similar images")
+                        
+                        # Step 2: Get pricing for the current image using LLM; the
+                        # client base64-encodes the bytes on the worker thread
+                        pricing_result = await _run_blocking(
+                            llm_client.comprehensive_product_search,
+                            image_bytes=image_bytes,
+                            image_format=_sniff(image_bytes[:16]) or "jpeg",
+                            product_description=collateral_data.description,
+                            search_context=search_context
+                        )
+                        _pricing_cache.store(cache_key, (similar_images, pricing_result), scope=collateral_data.name)
+                        await _run_blocking(_exact_pricing_cache.set, exact_key, similar_images, pricing_result)
                 
                 print(f"   💰 Price analysis: {pricing_result.price_range} {pricing_result.currency}")
                 
                 # Step 3: Calculate loan limit (typically 60-80% of estimated value)
                 # Extract numeric value from price range
-                price_match = re.search(r'[\d,]+', pricing_result.price_range)
+                result = ImageResult(image_path, similar_images=similar_images, pricing_result=pricing_result)
+                price_match = _PRICE_RE.search(pricing_result.price_range)
                 if price_match:
-                    estimated_value = float(price_match.group().replace(',', ''))
-                    loan_limit = estimated_value * 0.7  # 70% of estimated value
-                    total_estimated_value += estimated_value
-                else:
-                    estimated_value = 1000.0  # Default fallback
-                    loan_limit = 700.0
-                
-                # Step 4: Compile image analysis results
-                image_analysis = {
-                    "image_path": image_path,
-                    "similar_images": similar_images,
-                    "pricing_analysis": {
-                        "product_name": pricing_result.product_name,
-                        "price_range": pricing_result.price_range,
-                        "currency": pricing_result.currency,
-                        "marketplace": pricing_result.marketplace,
-                        "confidence": pricing_result.confidence,
-                        "estimated_value": estimated_value,
-                        "loan_limit": loan_limit
-                    },
-                    "rag3_metadata": {
-                        "similar_images_found": len(similar_images),
-                        "top_similarity_score": max([img['score'] for img in similar_images]) if similar_images else 0.0
-                    }
-                }
-                
-                image_analyses.append(image_analysis)
-                
-            except Exception as e:
-                print(f"❌ Error processing image {image_path}: {e}")
+                    result.estimated_value = float(price_match.group().translate(_NO_COMMA))
+                    result.loan_limit = result.estimated_value * 0.7  # 70% of estimated value
+                    result.priced = True
+                return result
+        
+        # Process every image through RAG3 and get pricing concurrently
+        outcomes = await asyncio.gather(
+            *[_analyze_one(i, image_path) for i, image_path in enumerate(collateral_data.images)],
+            return_exceptions=True
+        )
+        
+        results = []
+        for image_path, outcome in zip(collateral_data.images, outcomes):
+            if isinstance(outcome, Exception):
+                print(f"❌ Error processing image {image_path}: {outcome}")
                 # Continue with other images instead of failing completely
-                image_analysis = {
-                    "image_path": image_path,
-                    "error": str(e),
-                    "pricing_analysis": {
-                        "estimated_value": 1000.0,
-                        "loan_limit": 700.0
-                    }
-                }
-                image_analyses.append(image_analysis)
+                outcome = ImageResult(image_path, error=str(outcome))
+            results.append(outcome)
+        
+        # Step 4: Compile image analysis results
+        image_analyses = [result.to_analysis() for result in results]
+        total_estimated_value = sum((result.estimated_value for result in results if result.priced), 0.0)
         
         # Calculate overall loan parameters
         if total_estimated_value > 0:
@@ -173,13 +463,10 @@ async def create_collateral(collateral_data: CollateralCreateRequest):
             interest_rate = 0.15  # Higher interest for uncertain valuation
             due_date = datetime.now() + timedelta(days=180)  # 6 month loan
         
-        # Create the collateral with calculated values
-        collateral = await CollateralDB.create_collateral_simple(CollateralCreateSimple(
-            user_id=collateral_data.user_id
-        ))
-        
-        # Update with comprehensive analysis results
-        update_data = CollateralUpdate(
+        # Create the collateral with the analysis results; the user is
+        # checked again in the same statement
+        collateral = await CollateralDB.create_with_metadata(
+            user_id=collateral_data.user_id,
             images=collateral_data.images,
             loan_limit=overall_loan_limit,
             interest=interest_rate,
@@ -189,24 +476,25 @@ async def create_collateral(collateral_data: CollateralCreateRequest):
                 "description": collateral_data.description,
                 "original_images": collateral_data.images,
                 "status": "pending",
-                "image_analyses": image_analyses,
+                "image_analyses": [_compact_analysis(analysis) for analysis in image_analyses],
                 "total_estimated_value": total_estimated_value,
                 "overall_loan_limit": overall_loan_limit,
                 "interest_rate": interest_rate,
                 "due_date": due_date.isoformat(),
                 "analysis_timestamp": datetime.now().isoformat(),
                 "rag3_integration": True
-            }
+            },
+            image_analyses=image_analyses
         )
-        
-        updated_collateral = await CollateralDB.update_collateral(collateral.id, update_data)
+        if not collateral:
+            raise HTTPException(status_code=404, detail="User not found")
         
         print(f"Collateral created successfully for user {collateral_data.user_id}")
         print(f"   Total estimated value: ${total_estimated_value:,.2f}")
         print(f"   Loan limit: ${overall_loan_limit:,.2f}")
         print(f"   Interest rate: {interest_rate*100}%")
         
-        return updated_collateral
+        return collateral
         
     except HTTPException:
         raise
@@ -219,12 +507,9 @@ async def create_collateral(collateral_data: CollateralCreateRequest):
 async def approve_collateral(collateral_id: str, approve_request: CollateralApproveRequest):
     """Approve a collateral and create a loan transaction"""
     try:
-        # Check if collateral exists
-        existing_collateral = await CollateralDB.get_collateral_by_id(collateral_id)
-        if not existing_collateral:
-            raise HTTPException(status_code=404, detail="Collateral not found")
-        
         approved_collateral = await CollateralDB.approve_collateral(collateral_id, approve_request)
+        if not approved_collateral:
+            raise HTTPException(status_code=404, detail="Collateral not found")
         return approved_collateral
     except HTTPException:
         raise
@@ -236,20 +521,23 @@ async def approve_collateral(collateral_id: str, approve_request: CollateralAppr
 async def list_collaterals(
     user_id: Optional[str] = Query(None, description="Filter by user ID"),
     status: Optional[CollateralStatus] = Query(None, description="Filter by status"),
-    page: int = Query(1, ge=1, description="Page number"),
-    page_size: int = Query(20, ge=1, le=100, description="Number of collaterals per page")
+    page_size: int = Query(20, ge=1, le=100, description="Number of collaterals per page"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's next_cursor")
 ):
     """Get all collaterals with filtering and pagination"""
     try:
         search_params = CollateralSearchParams(
             user_id=user_id,
             status=status,
-            page=page,
-            page_size=page_size
+            page_size=page_size,
+            cursor=cursor
         )
         
+        # Rows are already response-shaped; skip per-row model validation
         result = await CollateralDB.list_collaterals(search_params)
-        return CollateralListResponse(**result)
+        return FastJSONResponse(result)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
@@ -268,18 +556,28 @@ async def get_collateral(collateral_id: str):
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
+@router.get("/{collateral_id}/analysis", response_model=CollateralAnalysisDetails)
+async def get_collateral_analysis(collateral_id: str):
+    """Get the full image analyses (including similar images) behind a collateral's valuation"""
+    try:
+        details = await CollateralDB.get_analysis_details(collateral_id)
+        if not details:
+            raise HTTPException(status_code=404, detail="Collateral analysis not found")
+        # Stored by create_collateral, so skip re-validating the nested results
+        return FastJSONResponse(details)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
 @router.put("/{collateral_id}", response_model=CollateralResponse)
 async def update_collateral(collateral_id: str, collateral_data: CollateralUpdate):
     """Update a collateral"""
     try:
-        # Check if collateral exists
-        existing_collateral = await CollateralDB.get_collateral_by_id(collateral_id)
-        if not existing_collateral:
-            raise HTTPException(status_code=404, detail="Collateral not found")
-        
         updated_collateral = await CollateralDB.update_collateral(collateral_id, collateral_data)
         if not updated_collateral:
-            raise HTTPException(status_code=500, detail="Failed to update collateral")
+            raise HTTPException(status_code=404, detail="Collateral not found")
         
         return updated_collateral
     except HTTPException:
@@ -292,8 +590,14 @@ async def update_collateral(collateral_id: str, collateral_data: CollateralUpdat
 async def extend_loan(collateral_id: str, extend_loan_request: ExtendLoanRequest):
     """Extend a loan - creates a fee transaction and updates collateral loan amount"""
     try:
+        # The three validation reads are independent, so run them together
+        collateral, account, user = await asyncio.gather(
+            CollateralDB.get_collateral_by_id(collateral_id),
+            AccountDB.get_account_by_id_cached(extend_loan_request.account_id),
+            UserDB.get_user_by_id_cached(extend_loan_request.user_id)
+        )
+        
         # Validate collateral exists and is approved
-        collateral = await CollateralDB.get_collateral_by_id(collateral_id)
         if not collateral:
             raise HTTPException(status_code=404, detail="Collateral not found")
         
@@ -301,17 +605,16 @@ async def extend_loan(collateral_id: str, extend_loan_request: ExtendLoanRequest
             raise HTTPException(status_code=400, detail=f"Collateral is not approved. Current status: {collateral.status.value}")
         
         # Validate account exists
-        account = await AccountDB.get_account_by_id(extend_loan_request.account_id)
         if not account:
             raise HTTPException(status_code=404, detail="Account not found")
         
         # Validate user exists
-        user = await UserDB.get_user_by_id(extend_loan_request.user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
-        # Create fee transaction data
-        transaction_data = TransactionCreate(
+        # Create fee transaction data from the validated request, without
+        # validating again
+        transaction_data = TransactionCreate.model_construct(
             account_id=extend_loan_request.account_id,
             user_id=extend_loan_request.user_id,
             transaction_type=TransactionType.FEE,
@@ -330,44 +633,23 @@ async def extend_loan(collateral_id: str, extend_loan_request: ExtendLoanRequest
         # Create transaction
         transaction = await TransactionDB.create_transaction(transaction_data)
         
-        # Process loan extension (fee increases loan balance, not investment balance)
+        # Process loan extension (fee increases loan balance, not investment balance).
+        # The balance updates and completion happen in one DB transaction.
         try:
-            # Get current account balances
-            account = await AccountDB.get_account_by_id(extend_loan_request.account_id)
-            current_loan_balance = account.loan_balance
-            current_investment_balance = account.investment_balance
-            
-            # For loan extension, fee increases loan balance
-            new_loan_balance = float(current_loan_balance) + float(extend_loan_request.fee)
-            
-            # Update account balances directly
-            await AccountDB.update_account_balances(
-                account_id=extend_loan_request.account_id,
-                loan_balance=new_loan_balance,
-                investment_balance=current_investment_balance
-            )
-            
-            # Update transaction with balance information
-            await TransactionDB.update_transaction_balances(
+            completed = await TransactionDB.complete_loan_extension(
                 transaction_id=transaction.id,
-                loan_balance_before=float(current_loan_balance),
-                loan_balance_after=float(new_loan_balance),
-                invested_balance_before=float(current_investment_balance),
-                invested_balance_after=float(current_investment_balance)
+                account_id=extend_loan_request.account_id,
+                collateral_id=collateral_id,
+                fee=float(extend_loan_request.fee)
             )
-            
-            # Mark transaction as completed
-            await TransactionDB.mark_transaction_completed(transaction.id)
-            
-            # Update collateral loan amount by adding the fee
-            new_loan_amount = float(collateral.loan_amount) + float(extend_loan_request.fee)
-            await CollateralDB.update_loan_amount(collateral_id, new_loan_amount)
+            if not completed:
+                raise Exception("Account or collateral no longer exists")
+            transaction = completed
             
             print(f"✅ Loan extended successfully:")
             print(f"   - Fee: ${extend_loan_request.fee}")
             print(f"   - Extension days: {extend_loan_request.extension_days}")
-            print(f"   - New loan amount: ${new_loan_amount}")
-            print(f"   - New loan balance: ${new_loan_balance}")
+            print(f"   - New loan balance: ${transaction.loan_balance_after}")
             
         except Exception as e:
             # If processing fails, mark transaction as failed
@@ -390,18 +672,43 @@ async def upload_image(file: UploadFile = File(...)):
             raise HTTPException(status_code=400, detail="File must be an image")
         
         # Create data directory if it doesn't exist
-        data_dir = os.path.join(os.path.dirname(__file__), '..', 'data')
+        data_dir = UPLOAD_DIR
         os.makedirs(data_dir, exist_ok=True)
         
-        # Generate unique filename
-        file_extension = os.path.splitext(file.filename)[1] if file.filename else '.jpg'
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        file_path = os.path.join(data_dir, unique_filename)
+        # Name the file after its actual format, falling back to the uploaded extension
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        image_format = _sniff(chunk[:16])
+        if image_format:
+            file_extension = _IMAGE_EXTENSIONS[image_format]
+        else:
+            file_extension = os.path.splitext(file.filename)[1] if file.filename else '.jpg'
         
-        # Save the file
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # Stream the upload to a temporary file in 64 KB chunks instead of
+        # holding it in memory, hashing it on the way
+        temp_path = os.path.join(data_dir, f"{uuid.uuid4()}.part")
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            async with aiofiles.open(temp_path, "wb") as out:
+                while chunk:
+                    size += len(chunk)
+                    if size > MAX_UPLOAD_BYTES:
+                        raise HTTPException(status_code=413, detail=f"Image larger than {MAX_UPLOAD_BYTES} bytes")
+                    await out.write(chunk)
+                    digest.update(chunk)
+                    chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            
+            # Files are stored by content hash, so a re-upload reuses the stored copy
+            unique_filename = f"{digest.hexdigest()}{file_extension}"
+            file_path = os.path.join(data_dir, unique_filename)
+            if os.path.exists(file_path):
+                os.remove(temp_path)
+            else:
+                os.replace(temp_path, file_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
         
         # Return the relative path from backend root
         relative_path = os.path.join('data', unique_filename)
@@ -411,7 +718,8 @@ async def upload_image(file: UploadFile = File(...)):
             "message": "Image uploaded successfully",
             "file_path": relative_path,
             "original_filename": file.filename,
-            "size": len(content)
+            "size": size,
+            "sha256": digest.hexdigest()
         }
         
     except HTTPException:
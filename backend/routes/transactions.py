@@ -1,10 +1,19 @@
-from fastapi import APIRouter, HTTPException, Query, Depends
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query, Depends, Request, BackgroundTasks
+from fastapi.responses import Response
+from typing import Awaitable, Callable, List, Optional
+import asyncio
+import functools
+import logging
+
+import orjson
+import psycopg
+from pydantic import ValidationError
 
 from dataModels.transaction import (
     Transaction, TransactionCreate, TransactionUpdate, TransactionResponse, 
     TransactionListResponse, TransactionSearchParams, TransactionType, TransactionStatus,
-    DepositRequest, WithdrawalRequest, PaymentRequest, ExtendLoanRequest, CreateLoanRequest
+    DepositRequest, WithdrawalRequest, PaymentRequest, ExtendLoanRequest, CreateLoanRequest,
+    TransactionBatchItem, TransactionBatchRequest, TransactionBatchResponse
 )
 from db.transaction import TransactionDB
 from db.account import AccountDB
@@ -12,27 +21,145 @@ from db.user import UserDB
 from db.collateral import CollateralDB
 from services.balance_service import BalanceService
 from crossmint.crossmint import Crossmint
+from responses import FastJSONResponse
+from cache import cache_manager, IN_FLIGHT, IN_FLIGHT_TTL
 
 router = APIRouter(prefix="/transactions", tags=["transactions"])
 
-crossmint = Crossmint()
+logger = logging.getLogger(__name__)
+
+# How long a created transaction is returned again for a retry carrying the
+# same reference number
+REFERENCE_REPLAY_TTL = 600
+
+
+def get_crossmint(request: Request) -> Crossmint:
+    """Crossmint client shared by all requests, created in the app lifespan"""
+    return request.app.state.crossmint
+
+
+async def _run_together(*lookups) -> list:
+    """
+    Run lookups concurrently and return their results in order
+    
+    If one fails, the others are cancelled at once rather than left holding
+    pool connections, and its exception is raised as is (not wrapped in an
+    ExceptionGroup) so the route's handlers still match it.
+    """
+    try:
+        async with asyncio.TaskGroup() as group:
+            tasks = [group.create_task(lookup) for lookup in lookups]
+    except ExceptionGroup as failed:
+        raise failed.exceptions[0]
+    return [task.result() for task in tasks]
+
+
+async def _cleanup_failed_transaction(transaction_id: str, reason: str, revert: bool) -> None:
+    """Revert a failed transaction's balances if requested and mark it failed"""
+    try:
+        await TransactionDB.fail_and_revert(transaction_id, reason, revert=revert)
+    except Exception as e:
+        logger.error("Failed to clean up transaction %s: %s", transaction_id, e)
+
+
+def _failure_response(transaction_id: str, reason: str, background_tasks: BackgroundTasks,
+                      revert: bool = False) -> FastJSONResponse:
+    """
+    400 response for a failed transaction
+    
+    The cleanup writes run after the response is sent. The response is
+    returned rather than raised, because FastAPI drops background tasks when
+    the endpoint raises.
+    """
+    background_tasks.add_task(_cleanup_failed_transaction, transaction_id, reason, revert)
+    return FastJSONResponse(status_code=400, content={"detail": reason}, background=background_tasks)
+
+
+async def _settle(transaction_id: str, send_transfer: Callable[[], Awaitable[dict]],
+                  background_tasks: BackgroundTasks) -> Optional[FastJSONResponse]:
+    """
+    Apply a transaction's balances, then send its Crossmint transfer
+    
+    The balance update is committed under lock before the transfer is sent, so
+    a refused update (insufficient funds, the balances_non_negative check)
+    never leaves funds moved without a ledger entry. Returns the failure
+    response if either step failed, otherwise None; balances are reverted when
+    the transfer failed.
+    """
+    try:
+        await BalanceService.process_transaction_balances(transaction_id)
+    except ValueError as e:
+        # If balance processing fails, mark transaction as failed
+        return _failure_response(transaction_id, str(e), background_tasks)
+    
+    try:
+        crossmint_result = await send_transfer()
+    except Exception as e:
+        crossmint_result = {"error": True, "message": str(e)}
+    logger.info("Crossmint transfer result: %s", crossmint_result)
+    
+    # Check if Crossmint transfer failed
+    if crossmint_result.get("error", False):
+        # Revert the balance changes since Crossmint failed
+        message = crossmint_result.get('message', 'Unknown error')
+        return _failure_response(transaction_id, f"Crossmint transfer failed: {message}", background_tasks, revert=True)
+    return None
+
+
+def once_per_reference(request_param: str):
+    """
+    Process each reference_number once per endpoint and account
+    
+    A retry with the reference number of a created transaction gets that
+    transaction back, and one arriving while the first is still being processed
+    gets a 409. Failed attempts release the reference number so they can be
+    retried.
+    """
+    def decorator(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            request = kwargs[request_param]
+            reference_number = request.reference_number
+            if not reference_number:
+                return await endpoint(*args, **kwargs)
+            
+            # Scoped to the account so one client's reference numbers cannot
+            # collide with, or replay, another's
+            key = f"idem:ref:{endpoint.__name__}:{request.account_id}:{reference_number}"
+            stored = await cache_manager.get_value(key)
+            if stored is None and not await cache_manager.set_value_if_absent(key, IN_FLIGHT, IN_FLIGHT_TTL):
+                stored = IN_FLIGHT
+            if stored == IN_FLIGHT:
+                raise HTTPException(status_code=409, detail="A transaction with this reference number is still in progress")
+            if stored is not None:
+                return Response(content=stored, status_code=201, media_type="application/json",
+                                headers={"idempotent-replayed": "true"})
+            
+            try:
+                result = await endpoint(*args, **kwargs)
+            except BaseException:
+                await cache_manager.delete(key)
+                raise
+            if isinstance(result, Response):
+                # A failure response
+                await cache_manager.delete(key)
+            else:
+                await cache_manager.set_value(key, result.model_dump_json().encode(), REFERENCE_REPLAY_TTL)
+            return result
+        return wrapper
+    return decorator
+
+
 @router.post("/deposit", response_model=TransactionResponse, status_code=201)
-async def deposit_money(deposit_request: DepositRequest):
+@once_per_reference("deposit_request")
+async def deposit_money(deposit_request: DepositRequest,
+                        background_tasks: BackgroundTasks, crossmint: Crossmint = Depends(get_crossmint)):
     #receipeint is org 
     """Deposit money in the platform"""
     try:
-        # Validate account exists
-        account = await AccountDB.get_account_by_id(deposit_request.account_id)
-        if not account:
-            raise HTTPException(status_code=404, detail="Account not found")
-        
-        # Validate user exists
-        user = await UserDB.get_user_by_id(deposit_request.user_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        # Create transaction data
-        transaction_data = TransactionCreate(
+        # Create transaction data; every field comes from the validated request,
+        # so it is not validated again
+        transaction_data = TransactionCreate.model_construct(
             account_id=deposit_request.account_id,
             user_id=deposit_request.user_id,
             transaction_type=TransactionType.DEPOSIT,
@@ -42,51 +169,44 @@ async def deposit_money(deposit_request: DepositRequest):
             metadata=deposit_request.metadata
         )
         
-        # Create transaction
-        transaction = await TransactionDB.create_transaction(transaction_data)
+        # Validate the account and user and create the transaction in one statement
+        created = await TransactionDB.create_transaction_validated(transaction_data)
         
-        # Process balances and Crossmint transfer
-        try:
-            await BalanceService.process_transaction_balances(transaction.id)
-            print(f"Processing Crossmint transfer for user {deposit_request.user_id}, amount: {deposit_request.amount}")
-            crossmint_result = await crossmint.transfer("0xcecfC798C3A37B754628150fDCAE52a84B092eC2",deposit_request.user_id,deposit_request.amount * 0.01)
-            print(f"Crossmint transfer result: {crossmint_result}")
-            
-            # Check if Crossmint transfer failed
-            if crossmint_result.get("error", False):
-                # Revert the balance changes since Crossmint failed
-                await BalanceService.revert_transaction_balances(transaction.id)
-                await TransactionDB.mark_transaction_failed(transaction.id, f"Crossmint transfer failed: {crossmint_result.get('message', 'Unknown error')}")
-                raise HTTPException(status_code=400, detail=f"Crossmint transfer failed: {crossmint_result.get('message', 'Unknown error')}")
-                
-        except ValueError as e:
-            # If balance processing fails, mark transaction as failed
-            await TransactionDB.mark_transaction_failed(transaction.id, str(e))
-            raise HTTPException(status_code=400, detail=str(e))
+        # Validate account exists
+        if not created["account_found"]:
+            raise HTTPException(status_code=404, detail="Account not found")
+        
+        # Validate user exists
+        if not created["user_found"]:
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        transaction = created["transaction"]
+        
+        # Process balances, then the Crossmint transfer
+        logger.debug("Processing Crossmint transfer for user %s, amount: %s", deposit_request.user_id, deposit_request.amount)
+        failure = await _settle(
+            transaction.id,
+            lambda: crossmint.transfer("0xcecfC798C3A37B754628150fDCAE52a84B092eC2",deposit_request.user_id,deposit_request.amount * 0.01),
+            background_tasks
+        )
+        if failure:
+            return failure
         
         return transaction
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    except psycopg.Error:
+        logger.exception("Database error")
+        raise HTTPException(status_code=500, detail="Database error")
 
 
 @router.post("/withdrawal", response_model=TransactionResponse, status_code=201)
-async def withdraw_money(withdrawal_request: WithdrawalRequest):
+@once_per_reference("withdrawal_request")
+async def withdraw_money(withdrawal_request: WithdrawalRequest,
+                         background_tasks: BackgroundTasks, crossmint: Crossmint = Depends(get_crossmint)):
     """Withdraw money from the platform"""
     try:
-        # Validate account exists
-        account = await AccountDB.get_account_by_id(withdrawal_request.account_id)
-        if not account:
-            raise HTTPException(status_code=404, detail="Account not found")
-        
-        # Validate user exists
-        user = await UserDB.get_user_by_id(withdrawal_request.user_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        # Create transaction data
-        transaction_data = TransactionCreate(
+        # Create transaction data; every field comes from the validated request,
+        # so it is not validated again
+        transaction_data = TransactionCreate.model_construct(
             account_id=withdrawal_request.account_id,
             user_id=withdrawal_request.user_id,
             transaction_type=TransactionType.WITHDRAWAL,
@@ -96,44 +216,45 @@ async def withdraw_money(withdrawal_request: WithdrawalRequest):
             metadata=withdrawal_request.metadata
         )
         
-        # Create transaction
-        transaction = await TransactionDB.create_transaction(transaction_data)
+        # Validate the account and user and create the transaction in one statement
+        created = await TransactionDB.create_transaction_validated(transaction_data)
+        
+        # Validate account exists
+        if not created["account_found"]:
+            raise HTTPException(status_code=404, detail="Account not found")
+        
+        # Validate user exists
+        if not created["user_found"]:
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        transaction = created["transaction"]
         
         # Process balances and Crossmint transfer
         try:
             await BalanceService.process_transaction_balances(transaction.id)
-            print(f"Processing Crossmint transfer for user {withdrawal_request.user_id}, amount: {withdrawal_request.amount}")
-            crossmint_result = await crossmint.transfer(account.wallet_id,"lordfourth",withdrawal_request.amount * 0.01)
-            print(f"Crossmint transfer result: {crossmint_result}")
+            logger.debug("Processing Crossmint transfer for user %s, amount: %s", withdrawal_request.user_id, withdrawal_request.amount)
+            crossmint_result = await crossmint.transfer(created["wallet_id"],"lordfourth",withdrawal_request.amount * 0.01)
+            logger.info("Crossmint transfer result: %s", crossmint_result)
                 
         except ValueError as e:
             # If balance processing fails, mark transaction as failed
-            await TransactionDB.mark_transaction_failed(transaction.id, str(e))
-            raise HTTPException(status_code=400, detail=str(e))
+            return _failure_response(transaction.id, str(e), background_tasks)
         
         return transaction
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    except psycopg.Error:
+        logger.exception("Database error")
+        raise HTTPException(status_code=500, detail="Database error")
 
 
 @router.post("/payment", response_model=TransactionResponse, status_code=201)
-async def pay_loan(payment_request: PaymentRequest):
+@once_per_reference("payment_request")
+async def pay_loan(payment_request: PaymentRequest,
+                   background_tasks: BackgroundTasks, crossmint: Crossmint = Depends(get_crossmint)):
     """Pay back a loan"""
     try:
-        # Validate account exists
-        account = await AccountDB.get_account_by_id(payment_request.account_id)
-        if not account:
-            raise HTTPException(status_code=404, detail="Account not found")
-        
-        # Validate user exists
-        user = await UserDB.get_user_by_id(payment_request.user_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        # Create transaction data
-        transaction_data = TransactionCreate(
+        # Create transaction data; every field comes from the validated request,
+        # so it is not validated again
+        transaction_data = TransactionCreate.model_construct(
             account_id=payment_request.account_id,
             user_id=payment_request.user_id,
             transaction_type=TransactionType.PAYMENT,
@@ -144,45 +265,60 @@ async def pay_loan(payment_request: PaymentRequest):
             metadata=payment_request.metadata
         )
         
-        # Create transaction
-        transaction = await TransactionDB.create_transaction(transaction_data)
+        # Validate the account and user and create the transaction in one statement
+        created = await TransactionDB.create_transaction_validated(transaction_data)
+        
+        # Validate account exists
+        if not created["account_found"]:
+            raise HTTPException(status_code=404, detail="Account not found")
+        
+        # Validate user exists
+        if not created["user_found"]:
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        transaction = created["transaction"]
         
         # Process balances and Crossmint transfer
         try:
             await BalanceService.process_transaction_balances(transaction.id)
-            print(f"Processing Crossmint transfer for payment from user {payment_request.user_id}, amount: {payment_request.amount}")
-            crossmint_result = await crossmint.transfer(account.wallet_id, "0xcecfC798C3A37B754628150fDCAE52a84B092eC2", payment_request.amount * 0.01)
-            print(f"Crossmint transfer result: {crossmint_result}")
+            logger.debug("Processing Crossmint transfer for payment from user %s, amount: %s", payment_request.user_id, payment_request.amount)
+            crossmint_result = await crossmint.transfer(created["wallet_id"], "0xcecfC798C3A37B754628150fDCAE52a84B092eC2", payment_request.amount * 0.01)
+            logger.info("Crossmint transfer result: %s", crossmint_result)
                 
         except ValueError as e:
             # If balance processing fails, mark transaction as failed
-            await TransactionDB.mark_transaction_failed(transaction.id, str(e))
-            raise HTTPException(status_code=400, detail=str(e))
+            return _failure_response(transaction.id, str(e), background_tasks)
         
         return transaction
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    except psycopg.Error:
+        logger.exception("Database error")
+        raise HTTPException(status_code=500, detail="Database error")
 
 
 
 @router.post("/create-loan", response_model=TransactionResponse, status_code=201)
-async def create_loan(create_loan_request: CreateLoanRequest):
+@once_per_reference("create_loan_request")
+async def create_loan(create_loan_request: CreateLoanRequest,
+                      background_tasks: BackgroundTasks, crossmint: Crossmint = Depends(get_crossmint)):
     """Create a loan against a collateral"""
     try:
+        # The four lookups are independent, so run them together
+        account, user, collateral, org_account = await _run_together(
+            AccountDB.get_account_by_id_cached(create_loan_request.account_id),
+            UserDB.get_user_by_id_cached(create_loan_request.user_id),
+            CollateralDB.get_collateral_by_id(create_loan_request.collateral_id),
+            AccountDB.get_organization_account_cached()
+        )
+        
         # Validate account exists
-        account = await AccountDB.get_account_by_id(create_loan_request.account_id)
         if not account:
             raise HTTPException(status_code=404, detail="Account not found")
         
         # Validate user exists
-        user = await UserDB.get_user_by_id(create_loan_request.user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
         # Validate collateral exists and is approved
-        collateral = await CollateralDB.get_collateral_by_id(create_loan_request.collateral_id)
         if not collateral:
             raise HTTPException(status_code=404, detail="Collateral not found")
         
@@ -198,7 +334,6 @@ async def create_loan(create_loan_request: CreateLoanRequest):
             )
         
         # Check if organization has sufficient balance to disburse the loan
-        org_account = await AccountDB.get_organization_account()
         if not org_account:
             raise HTTPException(status_code=500, detail="Organization account not found")
         
@@ -208,8 +343,9 @@ async def create_loan(create_loan_request: CreateLoanRequest):
                 detail=f"Insufficient organization balance. Available: ${org_account.investment_balance}, Required: ${create_loan_request.loan_amount}"
             )
         
-        # Create loan disbursement transaction
-        transaction_data = TransactionCreate(
+        # Create loan disbursement transaction from the validated request and
+        # collateral, without validating again
+        transaction_data = TransactionCreate.model_construct(
             account_id=create_loan_request.account_id,
             user_id=create_loan_request.user_id,
             transaction_type=TransactionType.LOAN_DISBURSEMENT,
@@ -230,23 +366,82 @@ async def create_loan(create_loan_request: CreateLoanRequest):
         # Create transaction
         transaction = await TransactionDB.create_transaction(transaction_data)
         
-        # Process balances and Crossmint transfer
-        try:
-            await BalanceService.process_transaction_balances(transaction.id)
-            print(f"Processing Crossmint transfer for loan disbursement to user {create_loan_request.user_id}, amount: {create_loan_request.loan_amount}")
-            crossmint_result = await crossmint.transfer(account.wallet_id, "lordfourth", create_loan_request.loan_amount * 0.01 )
-            print(f"Crossmint transfer result: {crossmint_result}")
-
-        except ValueError as e:
-            # If balance processing fails, mark transaction as failed
-            await TransactionDB.mark_transaction_failed(transaction.id, str(e))
-            raise HTTPException(status_code=400, detail=str(e))
+        # Process balances, then the Crossmint transfer. The organization
+        # balance checked above may be stale, so the locked balance update
+        # has the final say before any funds are sent.
+        logger.debug("Processing Crossmint transfer for loan disbursement to user %s, amount: %s", create_loan_request.user_id, create_loan_request.loan_amount)
+        failure = await _settle(
+            transaction.id,
+            lambda: crossmint.transfer(account.wallet_id, "lordfourth", create_loan_request.loan_amount * 0.01 ),
+            background_tasks
+        )
+        if failure:
+            return failure
         
         return transaction
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    except psycopg.Error:
+        logger.exception("Database error")
+        raise HTTPException(status_code=500, detail="Database error")
+
+
+# Batch transaction types -> (endpoint, request model, request parameter name)
+_BATCH_ENDPOINTS = {
+    TransactionType.DEPOSIT: (deposit_money, DepositRequest, "deposit_request"),
+    TransactionType.WITHDRAWAL: (withdraw_money, WithdrawalRequest, "withdrawal_request"),
+    TransactionType.PAYMENT: (pay_loan, PaymentRequest, "payment_request"),
+}
+
+
+async def _process_batch_item(item: TransactionBatchItem, background_tasks: BackgroundTasks,
+                              crossmint: Crossmint) -> dict:
+    """Run one batch item through its single-transaction endpoint and capture the outcome"""
+    if item.transaction_type not in _BATCH_ENDPOINTS:
+        return {"id": item.id, "status": 400,
+                "body": {"detail": f"Unsupported transaction type: {item.transaction_type.value}"}}
+    endpoint, request_model, request_param = _BATCH_ENDPOINTS[item.transaction_type]
+    
+    try:
+        request = request_model.model_validate(item.body)
+    except ValidationError as e:
+        return {"id": item.id, "status": 422, "body": {"detail": orjson.loads(e.json(include_url=False))}}
+    
+    try:
+        result = await endpoint(**{request_param: request, "background_tasks": background_tasks, "crossmint": crossmint})
+    except HTTPException as e:
+        return {"id": item.id, "status": e.status_code, "body": {"detail": e.detail}}
+    except Exception:
+        # Keep one failed item from failing the whole batch
+        logger.exception("Batch item %s failed", item.id)
+        return {"id": item.id, "status": 500, "body": {"detail": "Internal Server Error"}}
+    
+    if isinstance(result, Response):
+        # A failure response or a replay of an earlier transaction
+        return {"id": item.id, "status": result.status_code, "body": orjson.loads(result.body)}
+    return {"id": item.id, "status": 201, "body": result.model_dump(mode="json")}
+
+
+@router.post("/batch", response_model=TransactionBatchResponse)
+async def process_transaction_batch(batch: TransactionBatchRequest, background_tasks: BackgroundTasks,
+                                    crossmint: Crossmint = Depends(get_crossmint)):
+    """
+    Process several deposits, withdrawals and payments in one call
+    
+    Each item gets the status and body its single-transaction endpoint would
+    have returned. Items for different accounts run concurrently; items for the
+    same account run in request order, since each one reads the balance the
+    previous one wrote.
+    """
+    results: List[Optional[dict]] = [None] * len(batch.requests)
+    by_account = {}
+    for index, item in enumerate(batch.requests):
+        by_account.setdefault(str(item.body.get("account_id")), []).append(index)
+    
+    async def process_account(indices: List[int]) -> None:
+        for index in indices:
+            results[index] = await _process_batch_item(batch.requests[index], background_tasks, crossmint)
+    
+    await asyncio.gather(*(process_account(indices) for indices in by_account.values()))
+    return FastJSONResponse({"responses": results}, background=background_tasks)
 
 
 @router.get("/", response_model=TransactionListResponse)
@@ -255,9 +450,9 @@ async def list_transactions(
     user_id: Optional[str] = Query(None, description="Filter by user ID"),
     transaction_type: Optional[TransactionType] = Query(None, description="Filter by transaction type"),
     status: Optional[TransactionStatus] = Query(None, description="Filter by status"),
-    reference_number: Optional[str] = Query(None, description="Filter by reference number"),
-    page: int = Query(1, ge=1, description="Page number"),
-    page_size: int = Query(20, ge=1, le=100, description="Number of transactions per page")
+    reference_number: Optional[str] = Query(None, description="Filter by reference number (exact match)"),
+    page_size: int = Query(20, ge=1, le=100, description="Number of transactions per page"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's next_cursor")
 ):
     """Get all transactions with filtering and pagination"""
     try:
@@ -267,14 +462,18 @@ async def list_transactions(
             transaction_type=transaction_type,
             status=status,
             reference_number=reference_number,
-            page=page,
-            page_size=page_size
+            page_size=page_size,
+            cursor=cursor
         )
         
+        # Rows are already response-shaped; skip per-row model validation
         result = await TransactionDB.list_transactions(search_params)
-        return TransactionListResponse(**result)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        return FastJSONResponse(result)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except psycopg.Error:
+        logger.exception("Database error")
+        raise HTTPException(status_code=500, detail="Database error")
 
 
 @router.get("/{transaction_id}", response_model=TransactionResponse)
@@ -285,10 +484,9 @@ async def get_transaction(transaction_id: str):
         if not transaction:
             raise HTTPException(status_code=404, detail="Transaction not found")
         return transaction
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    except psycopg.Error:
+        logger.exception("Database error")
+        raise HTTPException(status_code=500, detail="Database error")
 
 
 @router.get("/account/{account_id}", response_model=List[TransactionResponse])
@@ -296,16 +494,16 @@ async def get_transactions_by_account(account_id: str):
     """Get all transactions for an account"""
     try:
         # Validate account exists
-        account = await AccountDB.get_account_by_id(account_id)
+        account = await AccountDB.get_account_by_id_cached(account_id)
         if not account:
             raise HTTPException(status_code=404, detail="Account not found")
         
+        # Rows are already response-shaped; skip per-row model validation
         transactions = await TransactionDB.get_transactions_by_account_id(account_id)
-        return transactions
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        return FastJSONResponse(transactions)
+    except psycopg.Error:
+        logger.exception("Database error")
+        raise HTTPException(status_code=500, detail="Database error")
 
 
 @router.get("/user/{user_id}", response_model=List[TransactionResponse])
@@ -313,26 +511,28 @@ async def get_transactions_by_user(user_id: str):
     """Get all transactions for a user"""
     try:
         # Validate user exists
-        user = await UserDB.get_user_by_id(user_id)
+        user = await UserDB.get_user_by_id_cached(user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
+        # Rows are already response-shaped; skip per-row model validation
         transactions = await TransactionDB.get_transactions_by_user_id(user_id)
-        return transactions
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        return FastJSONResponse(transactions)
+    except psycopg.Error:
+        logger.exception("Database error")
+        raise HTTPException(status_code=500, detail="Database error")
 
 
 @router.get("/type/{transaction_type}", response_model=List[TransactionResponse])
 async def get_transactions_by_type(transaction_type: TransactionType):
     """Get all transactions by type"""
     try:
+        # Rows are already response-shaped; skip per-row model validation
         transactions = await TransactionDB.get_transactions_by_type(transaction_type)
-        return transactions
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        return FastJSONResponse(transactions)
+    except psycopg.Error:
+        logger.exception("Database error")
+        raise HTTPException(status_code=500, detail="Database error")
 
 
 @router.get("/user/{user_id}/summary")
@@ -340,13 +540,12 @@ async def get_user_transaction_summary(user_id: str):
     """Get transaction summary for a user"""
     try:
         # Validate user exists
-        user = await UserDB.get_user_by_id(user_id)
+        user = await UserDB.get_user_by_id_cached(user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
         summary = await TransactionDB.get_transaction_summary_by_user(user_id)
         return summary
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    except psycopg.Error:
+        logger.exception("Database error")
+        raise HTTPException(status_code=500, detail="Database error")
@@ -3,9 +3,11 @@ from typing import List, Optional
 
 from dataModels.user import (
     User, UserCreate, UserUpdate, UserResponse, 
-    UserListResponse, UserSearchParams, UserStatus
+    UserListResponse, UserSearchParams, UserStatus,
+    UserBatchRequest, UserBatchResponse
 )
 from db.user import UserDB
+from responses import FastJSONResponse
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -14,17 +16,11 @@ router = APIRouter(prefix="/users", tags=["users"])
 async def create_user(user_data: UserCreate):
     """Create a new user"""
     try:
-        # Check if user already exists
-        if await UserDB.user_exists(email=user_data.email):
-            raise HTTPException(status_code=400, detail="User with this email already exists")
-        
-        if await UserDB.user_exists(username=user_data.username):
-            raise HTTPException(status_code=400, detail="User with this username already exists")
-        
+        # Duplicate emails and usernames are rejected by the insert itself
         user = await UserDB.create_user(user_data)
         return user
-    except HTTPException:
-        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
@@ -35,8 +31,9 @@ async def list_users(
     username: Optional[str] = Query(None, description="Filter by username (partial match)"),
     status: Optional[UserStatus] = Query(None, description="Filter by status"),
     kyc_verified: Optional[bool] = Query(None, description="Filter by KYC verification status"),
-    page: int = Query(1, ge=1, description="Page number"),
-    page_size: int = Query(20, ge=1, le=100, description="Number of users per page")
+    page: int = Query(1, ge=1, description="Page number (ignored when a cursor is given)"),
+    page_size: int = Query(20, ge=1, le=100, description="Number of users per page"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's next_cursor")
 ):
     """Get all users with filtering and pagination"""
     try:
@@ -46,11 +43,29 @@ async def list_users(
             status=status,
             kyc_verified=kyc_verified,
             page=page,
-            page_size=page_size
+            page_size=page_size,
+            cursor=cursor
         )
         
+        # Rows are already response-shaped; skip per-row model validation
         result = await UserDB.list_users(search_params)
-        return UserListResponse(**result)
+        return FastJSONResponse(result)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+@router.post("/batch", response_model=UserBatchResponse)
+async def get_users_batch(batch_request: UserBatchRequest):
+    """Get up to 100 users by ID in one request"""
+    try:
+        users = {user.id: user for user in await UserDB.get_users_by_ids(batch_request.ids)}
+        ids = list(dict.fromkeys(batch_request.ids))
+        return UserBatchResponse(
+            users=[users[user_id] for user_id in ids if user_id in users],
+            missing=[user_id for user_id in ids if user_id not in users]
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
@@ -73,27 +88,16 @@ async def get_user(user_id: str):
 async def update_user(user_id: str, user_data: UserUpdate):
     """Update a user"""
     try:
-        # Check if user exists
-        existing_user = await UserDB.get_user_by_id(user_id)
-        if not existing_user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        # Check for unique constraints if email or username is being updated
-        if user_data.email and user_data.email != existing_user.email:
-            if await UserDB.user_exists(email=user_data.email, exclude_user_id=user_id):
-                raise HTTPException(status_code=400, detail="User with this email already exists")
-        
-        if user_data.username and user_data.username != existing_user.username:
-            if await UserDB.user_exists(username=user_data.username, exclude_user_id=user_id):
-                raise HTTPException(status_code=400, detail="User with this username already exists")
-        
+        # Duplicate emails and usernames are rejected by the update itself
         updated_user = await UserDB.update_user(user_id, user_data)
         if not updated_user:
-            raise HTTPException(status_code=500, detail="Failed to update user")
+            raise HTTPException(status_code=404, detail="User not found")
         
         return updated_user
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
@@ -150,14 +154,9 @@ async def get_user_by_username(username: str):
 async def update_user_status(user_id: str, status: UserStatus):
     """Update user status"""
     try:
-        # Check if user exists
-        existing_user = await UserDB.get_user_by_id(user_id)
-        if not existing_user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         updated_user = await UserDB.update_user_status(user_id, status.value)
         if not updated_user:
-            raise HTTPException(status_code=500, detail="Failed to update user status")
+            raise HTTPException(status_code=404, detail="User not found")
         
         return updated_user
     except HTTPException:
@@ -170,14 +169,9 @@ async def update_user_status(user_id: str, status: UserStatus):
 async def update_kyc_status(user_id: str, kyc_verified: bool):
     """Update user KYC verification status"""
     try:
-        # Check if user exists
-        existing_user = await UserDB.get_user_by_id(user_id)
-        if not existing_user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         updated_user = await UserDB.update_kyc_status(user_id, kyc_verified)
         if not updated_user:
-            raise HTTPException(status_code=500, detail="Failed to update KYC status")
+            raise HTTPException(status_code=404, detail="User not found")
         
         return updated_user
     except HTTPException:
@@ -190,7 +184,6 @@ async def update_kyc_status(user_id: str, kyc_verified: bool):
 async def check_user_exists(user_id: str):
     """Check if a user exists"""
     try:
-        user = await UserDB.get_user_by_id(user_id)
-        return {"exists": user is not None}
+        return {"exists": await UserDB.exists(user_id)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
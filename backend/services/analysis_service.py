@@ -0,0 +1,255 @@
+"""
+Image analysis job service
+
+The RAG3-LLAMPI pipeline takes several seconds of CLIP and LLM work, so it is
+run as a background job in a separate worker process. The worker builds one
+integrator when it starts and keeps the CLIP model resident for every job.
+Job state and finished results are kept in the response cache and polled by
+the client. A poll can land on any API worker, so this needs Redis; without
+it the app refuses to start unless ANALYSIS_JOBS_IN_PROCESS is set, which is
+only safe for a single worker without --reload.
+
+Results are cached in two tiers. The exact tier is keyed by a hash of the
+image bytes and parameters. The semantic tier lives in the worker and matches
+near-identical images (re-encoded uploads, resized copies) with a near-identical
+description by CLIP image and text embedding.
+"""
+
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Optional, Dict, Any, List
+
+import orjson
+
+from cache import cache_manager
+from dataModels.collateral import ImageAnalysisRequest, AnalysisJobStatus
+from rag3_llampi_integration import RAG3LLAMPIIntegrator
+from services.proximity_cache import ProximityCache, DEFAULT_MAX_DISTANCE
+
+# Job records are kept for an hour; finished analyses are reused for a day
+JOB_TTL = 3600
+RESULT_TTL = 86400
+
+# One worker: the pipeline loads CLIP and is GPU-bound
+ANALYSIS_WORKERS = 1
+
+# Keep job records in process when Redis is not configured (single worker only)
+ALLOW_IN_PROCESS_JOBS = os.getenv("ANALYSIS_JOBS_IN_PROCESS", "false").lower() == "true"
+
+# Run the CPU image encoder in int8 (see ImageRAGSystem)
+QUANTIZE_ENCODER = os.getenv("ANALYSIS_INT8_ENCODER", "false").lower() == "true"
+
+# Cosine distances within which an earlier result is reused: the image must be
+# a near-duplicate, the description only needs to say the same thing
+IMAGE_MATCH_DISTANCE = 0.03
+DESCRIPTION_MATCH_DISTANCE = DEFAULT_MAX_DISTANCE
+
+
+# Integrator and semantic cache owned by the worker process
+_worker_integrator: Optional[RAG3LLAMPIIntegrator] = None
+_semantic_cache = ProximityCache(
+    dims=(512, 512),  # CLIP ViT-B/32 image and text embeddings
+    max_distances=(IMAGE_MATCH_DISTANCE, DESCRIPTION_MATCH_DISTANCE),
+    ttl=RESULT_TTL
+)
+
+
+def _init_worker() -> None:
+    """Load CLIP and connect to Qdrant once when the worker process starts"""
+    global _worker_integrator
+    _worker_integrator = RAG3LLAMPIIntegrator(verbose=False, quantize_encoder=QUANTIZE_ENCODER)
+    _worker_integrator.initialize_systems()
+
+
+def _analyze(input_image_path: str, user_description: str, top_k: int, score_threshold: float,
+             image_bytes: Optional[bytes] = None, multiview: bool = False) -> Dict[str, Any]:
+    """Run one analysis on the worker's resident integrator, reusing near-identical earlier results"""
+    scope = (top_k, score_threshold, multiview)
+    embeddings = None
+
+    if _worker_integrator.initialize_systems():
+        rag_system = _worker_integrator.rag_system
+        image = rag_system.load_image(image_bytes if image_bytes is not None else input_image_path)
+        embeddings = (rag_system.extract_embeddings(image), rag_system.extract_text_embeddings(user_description))
+        cached = _semantic_cache.lookup(embeddings, scope)
+        if cached is not None:
+            return cached
+
+    results = _worker_integrator.integrate(
+        input_image_path=input_image_path,
+        user_description=user_description,
+        top_k=top_k,
+        score_threshold=score_threshold,
+        return_json=True,  # Return JSON format
+        image_bytes=image_bytes,
+        # Search with the embedding computed for the cache key
+        image_embedding=embeddings[0] if embeddings is not None else None,
+        multiview=multiview
+    )
+
+    if embeddings is not None and "error" not in results:
+        _semantic_cache.store(embeddings, results, scope)
+    return results
+
+
+class AnalysisJobService:
+    """Service for queueing image analyses and reporting their status"""
+
+    _executor: Optional[ProcessPoolExecutor] = None
+    _tasks = set()
+
+    @classmethod
+    def _get_executor(cls) -> ProcessPoolExecutor:
+        """Start the worker process on first use"""
+        if cls._executor is None:
+            # Spawn rather than fork so the worker does not inherit the
+            # event loop, pool threads or open sockets
+            cls._executor = ProcessPoolExecutor(
+                max_workers=ANALYSIS_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker
+            )
+        return cls._executor
+
+    @staticmethod
+    def require_shared_store() -> None:
+        """Refuse to start if job records would only be visible to this process"""
+        if cache_manager.backend != "redis" and not ALLOW_IN_PROCESS_JOBS:
+            raise RuntimeError(
+                "Analysis jobs need Redis: set REDIS_URL, or ANALYSIS_JOBS_IN_PROCESS=true "
+                "to run a single worker without --reload"
+            )
+
+    @classmethod
+    def _reset_executor(cls, broken: ProcessPoolExecutor) -> None:
+        """Drop a pool whose worker died so the next job starts a fresh one"""
+        if cls._executor is broken:
+            cls._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def result_key(request: ImageAnalysisRequest, image_bytes: Optional[bytes] = None) -> str:
+        """
+        Cache key for an analysis: SHA-256 of the image bytes and analysis parameters
+
+        Reads and hashes the whole image; call it off the event loop.
+        """
+        digest = hashlib.sha256()
+        if image_bytes is not None:
+            digest.update(image_bytes)
+        else:
+            with open(request.image_path, "rb") as image_file:
+                for chunk in iter(lambda: image_file.read(1 << 20), b""):
+                    digest.update(chunk)
+        digest.update(orjson.dumps([request.user_description, request.top_k, request.score_threshold, request.multiview]))
+        return f"analysis:result:{digest.hexdigest()}"
+
+    @staticmethod
+    async def _save_job(job_id: str, job: Dict[str, Any]) -> None:
+        await cache_manager.set_value(f"analysis:job:{job_id}", orjson.dumps(job), JOB_TTL)
+
+    @staticmethod
+    async def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a job record, or None if it does not exist or has expired"""
+        job = await cache_manager.get_value(f"analysis:job:{job_id}")
+        return orjson.loads(job) if job else None
+
+    @classmethod
+    async def submit(cls, request: ImageAnalysisRequest, image_bytes: Optional[bytes] = None) -> Dict[str, Any]:
+        """
+        Queue an analysis; an identical earlier analysis completes immediately
+        
+        If image_bytes is given the image is analyzed from memory and
+        request.image_path only names it.
+        """
+        result_key = await asyncio.to_thread(cls.result_key, request, image_bytes)
+        return await cls._submit(request, result_key, image_bytes)
+
+    @classmethod
+    async def submit_batch(cls, requests: List[ImageAnalysisRequest]) -> List[Dict[str, Any]]:
+        """
+        Queue several analyses, returning their jobs in request order
+
+        Identical requests in the batch share one job.
+        """
+        jobs_by_key: Dict[str, Dict[str, Any]] = {}
+        jobs = []
+        for request in requests:
+            result_key = await asyncio.to_thread(cls.result_key, request)
+            if result_key not in jobs_by_key:
+                jobs_by_key[result_key] = await cls._submit(request, result_key)
+            jobs.append(jobs_by_key[result_key])
+        return jobs
+
+    @classmethod
+    async def _submit(cls, request: ImageAnalysisRequest, result_key: str,
+                      image_bytes: Optional[bytes] = None) -> Dict[str, Any]:
+        job_id = str(uuid.uuid4())
+
+        cached = await cache_manager.get_value(result_key)
+        if cached:
+            job = {"job_id": job_id, "status": AnalysisJobStatus.COMPLETED, "result": orjson.loads(cached)}
+            await cls._save_job(job_id, job)
+            return job
+
+        job = {"job_id": job_id, "status": AnalysisJobStatus.QUEUED}
+        await cls._save_job(job_id, job)
+
+        # Keep a reference so the task is not garbage collected mid-run
+        task = asyncio.create_task(cls._run(job_id, result_key, request, image_bytes))
+        cls._tasks.add(task)
+        task.add_done_callback(cls._tasks.discard)
+        return job
+
+    @classmethod
+    async def _run(cls, job_id: str, result_key: str, request: ImageAnalysisRequest,
+                   image_bytes: Optional[bytes] = None) -> None:
+        """Run the pipeline in the worker process and record the outcome"""
+        await cls._save_job(job_id, {"job_id": job_id, "status": AnalysisJobStatus.RUNNING})
+
+        analysis = partial(
+            _analyze,
+            input_image_path=request.image_path,
+            user_description=request.user_description,
+            top_k=request.top_k,
+            score_threshold=request.score_threshold,
+            image_bytes=image_bytes,
+            multiview=request.multiview
+        )
+
+        # A pool whose worker crashed stays broken; replace it and try once more
+        for attempt in range(2):
+            executor = cls._get_executor()
+            try:
+                results = await asyncio.get_running_loop().run_in_executor(executor, analysis)
+            except BrokenProcessPool as e:
+                cls._reset_executor(executor)
+                results = {"error": str(e) or "Analysis worker process died"}
+                continue
+            except Exception as e:
+                results = {"error": str(e)}
+            break
+
+        if "error" in results:
+            await cls._save_job(job_id, {
+                "job_id": job_id,
+                "status": AnalysisJobStatus.FAILED,
+                "error": f"Analysis failed: {results['error']}"
+            })
+            return
+
+        await cache_manager.set_value(result_key, orjson.dumps(results), RESULT_TTL)
+        await cls._save_job(job_id, {"job_id": job_id, "status": AnalysisJobStatus.COMPLETED, "result": results})
+
+    @classmethod
+    def shutdown(cls) -> None:
+        """Stop the worker process"""
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=False, cancel_futures=True)
+            cls._executor = None
@@ -4,13 +4,105 @@ Balance calculation service
 This module handles balance calculations and updates for transactions.
 """
 
-from typing import Tuple
+from decimal import Decimal
+from typing import Callable, Dict, Optional, Tuple
 
 from dataModels.transaction import TransactionType, TransactionCreate
 from db.account import AccountDB
 from db.transaction import TransactionDB
 
 
+# Balance rules. Each takes (loan_balance, invested_balance, amount) and
+# returns the (loan_balance, invested_balance) after the transaction, all as
+# Decimal so NUMERIC balances are never rounded through float. The
+# organization never has a loan balance.
+
+_ZERO = Decimal(0)
+
+
+def _require_investment(invested_balance: Decimal, amount: Decimal, purpose: str = "") -> None:
+    if invested_balance < amount:
+        raise ValueError(f"Insufficient investment balance{purpose}. Available: {invested_balance}, Required: {amount}")
+
+
+def _unchanged(loan_balance: Decimal, invested_balance: Decimal, amount: Decimal) -> Tuple[Decimal, Decimal]:
+    return loan_balance, invested_balance
+
+
+def _invest(loan_balance: Decimal, invested_balance: Decimal, amount: Decimal) -> Tuple[Decimal, Decimal]:
+    # Deposit or interest increases investment balance
+    return loan_balance, invested_balance + amount
+
+
+def _org_invest(loan_balance: Decimal, invested_balance: Decimal, amount: Decimal) -> Tuple[Decimal, Decimal]:
+    return _ZERO, invested_balance + amount
+
+
+def _divest(loan_balance: Decimal, invested_balance: Decimal, amount: Decimal) -> Tuple[Decimal, Decimal]:
+    # Withdrawal decreases investment balance
+    _require_investment(invested_balance, amount)
+    return loan_balance, invested_balance - amount
+
+
+def _org_divest(loan_balance: Decimal, invested_balance: Decimal, amount: Decimal) -> Tuple[Decimal, Decimal]:
+    # Withdrawals and payments by the organization come out of investment funds
+    _require_investment(invested_balance, amount)
+    return _ZERO, invested_balance - amount
+
+
+def _charge_fee(loan_balance: Decimal, invested_balance: Decimal, amount: Decimal) -> Tuple[Decimal, Decimal]:
+    # Fees are deducted from investment balance
+    _require_investment(invested_balance, amount, " for fee")
+    return loan_balance, invested_balance - amount
+
+
+def _org_charge_fee(loan_balance: Decimal, invested_balance: Decimal, amount: Decimal) -> Tuple[Decimal, Decimal]:
+    _require_investment(invested_balance, amount, " for fee")
+    return _ZERO, invested_balance - amount
+
+
+def _disburse_loan(loan_balance: Decimal, invested_balance: Decimal, amount: Decimal) -> Tuple[Decimal, Decimal]:
+    return loan_balance + amount, invested_balance
+
+
+def _org_disburse_loan(loan_balance: Decimal, invested_balance: Decimal, amount: Decimal) -> Tuple[Decimal, Decimal]:
+    raise ValueError("Organization cannot receive loan disbursements")
+
+
+def _repay_loan(loan_balance: Decimal, invested_balance: Decimal, amount: Decimal) -> Tuple[Decimal, Decimal]:
+    if loan_balance < amount:
+        raise ValueError(f"Insufficient loan balance. Available: {loan_balance}, Required: {amount}")
+    return loan_balance - amount, invested_balance
+
+
+# (transaction type, is organization) -> rule
+_BALANCE_RULES: Dict[Tuple[TransactionType, bool], Callable[[Decimal, Decimal, Decimal], Tuple[Decimal, Decimal]]] = {
+    (TransactionType.DEPOSIT, False): _invest,
+    (TransactionType.DEPOSIT, True): _org_invest,
+    (TransactionType.WITHDRAWAL, False): _divest,
+    (TransactionType.WITHDRAWAL, True): _org_divest,
+    (TransactionType.LOAN_DISBURSEMENT, False): _disburse_loan,
+    (TransactionType.LOAN_DISBURSEMENT, True): _org_disburse_loan,
+    (TransactionType.PAYMENT, False): _repay_loan,
+    (TransactionType.PAYMENT, True): _org_divest,
+    (TransactionType.FEE, False): _charge_fee,
+    (TransactionType.FEE, True): _org_charge_fee,
+    (TransactionType.INTEREST, False): _invest,
+    (TransactionType.INTEREST, True): _org_invest,
+}
+
+
+# Transaction type recorded on the organization's side of a user transaction
+_OPPOSITE_TRANSACTION_TYPES: Dict[TransactionType, TransactionType] = {
+    TransactionType.DEPOSIT: TransactionType.DEPOSIT,  # User deposits, org also deposits (same)
+    TransactionType.WITHDRAWAL: TransactionType.WITHDRAWAL,  # User withdraws, org also withdraws (same)
+    TransactionType.LOAN_DISBURSEMENT: TransactionType.WITHDRAWAL,  # User gets loan, org withdraws (opposite)
+    TransactionType.PAYMENT: TransactionType.DEPOSIT,  # User pays, org deposits (opposite)
+    TransactionType.FEE: TransactionType.INTEREST,  # User pays fee, org gets interest
+    TransactionType.INTEREST: TransactionType.FEE,  # User gets interest, org pays fee
+}
+
+
 class BalanceService:
     """Service for handling balance calculations and updates"""
 
@@ -18,83 +110,48 @@ class BalanceService:
     async def calculate_balances_for_transaction(
         account_id: str, 
         transaction_type: TransactionType, 
-        amount: float,
+        amount: Decimal,
         user_id: str = None
-    ) -> Tuple[float, float, float, float]:
+    ) -> Tuple[Decimal, Decimal, Decimal, Decimal]:
         """
         Calculate balance before and after for a transaction
         
         Returns:
             Tuple of (loan_balance_before, loan_balance_after, invested_balance_before, invested_balance_after)
         """
-        # Get current account balances
-        account = await AccountDB.get_account_by_id(account_id)
-        if not account:
+        # Get current account balances, read as NUMERIC
+        balances = await AccountDB.get_account_balances(account_id)
+        if not balances:
             raise ValueError(f"Account {account_id} not found")
         
-        loan_balance_before = account.loan_balance
-        invested_balance_before = account.investment_balance
+        loan_balance_before, invested_balance_before = balances
+        loan_balance_after, invested_balance_after = BalanceService.apply_transaction(
+            transaction_type, Decimal(str(amount)), user_id, loan_balance_before, invested_balance_before
+        )
+        return loan_balance_before, loan_balance_after, invested_balance_before, invested_balance_after
+
+    @staticmethod
+    def apply_transaction(
+        transaction_type: TransactionType,
+        amount: Decimal,
+        user_id: str,
+        loan_balance_before: Decimal,
+        invested_balance_before: Decimal
+    ) -> Tuple[Decimal, Decimal]:
+        """
+        Compute an account's balances after a transaction
         
-        # Calculate new balances based on transaction type
-        loan_balance_after = loan_balance_before
-        invested_balance_after = invested_balance_before
+        Returns:
+            Tuple of (loan_balance_after, invested_balance_after)
         
-        if transaction_type == TransactionType.DEPOSIT:
-            # Deposit increases investment balance
-            invested_balance_after = invested_balance_before + amount
-            if user_id == "organization":
-                loan_balance_after = 0.0  # Organization never has loan balance
-            
-        elif transaction_type == TransactionType.WITHDRAWAL:
-            # Withdrawal decreases investment balance
-            if invested_balance_before < amount:
-                raise ValueError(f"Insufficient investment balance. Available: {invested_balance_before}, Required: {amount}")
-            invested_balance_after = invested_balance_before - amount
-            if user_id == "organization":
-                loan_balance_after = 0.0  # Organization never has loan balance
-            
-        elif transaction_type == TransactionType.LOAN_DISBURSEMENT:
-            # Loan disbursement increases loan balance for users, but organization never gets loan balance
-            if user_id == "organization":
-                # Organization disbursement should not happen (they don't take loans)
-                raise ValueError("Organization cannot receive loan disbursements")
-            else:
-                loan_balance_after = loan_balance_before + amount
-            
-        elif transaction_type == TransactionType.PAYMENT:
-            # Payment decreases loan balance for users, but investment balance for organization
-            if user_id == "organization":
-                # Organization payment decreases investment balance (paying from investment funds)
-                if invested_balance_before < amount:
-                    raise ValueError(f"Insufficient investment balance. Available: {invested_balance_before}, Required: {amount}")
-                invested_balance_after = invested_balance_before - amount
-                loan_balance_after = 0.0  # Organization never has loan balance
-            else:
-                # User payment decreases loan balance
-                if loan_balance_before < amount:
-                    raise ValueError(f"Insufficient loan balance. Available: {loan_balance_before}, Required: {amount}")
-                loan_balance_after = loan_balance_before - amount
-                invested_balance_after = invested_balance_before
-            
-        elif transaction_type == TransactionType.FEE:
-            # Fee decreases investment balance (or loan balance depending on context)
-            # For now, we'll deduct from investment balance
-            if invested_balance_before < amount:
-                raise ValueError(f"Insufficient investment balance for fee. Available: {invested_balance_before}, Required: {amount}")
-            invested_balance_after = invested_balance_before - amount
-            if user_id == "organization":
-                loan_balance_after = 0.0  # Organization never has loan balance
-            
-        elif transaction_type == TransactionType.INTEREST:
-            # Interest increases investment balance
-            invested_balance_after = invested_balance_before + amount
-            if user_id == "organization":
-                loan_balance_after = 0.0  # Organization never has loan balance
-            
-        return loan_balance_before, loan_balance_after, invested_balance_before, invested_balance_after
+        Raises:
+            ValueError: If the account cannot cover the transaction
+        """
+        handler = _BALANCE_RULES.get((transaction_type, user_id == "organization"), _unchanged)
+        return handler(loan_balance_before, invested_balance_before, amount)
 
     @staticmethod
-    async def update_account_balances(account_id: str, loan_balance: float, investment_balance: float):
+    async def update_account_balances(account_id: str, loan_balance: Decimal, investment_balance: Decimal):
         """Update account balances"""
         await AccountDB.update_account_balances(
             account_id=account_id,
@@ -105,71 +162,49 @@ class BalanceService:
     @staticmethod
     async def process_transaction_balances(transaction_id: str):
         """Process and update balances for a transaction"""
-        # Get the transaction
-        transaction = await TransactionDB.get_transaction_by_id(transaction_id)
-        if not transaction:
-            raise ValueError(f"Transaction {transaction_id} not found")
-        
-        # Calculate balances
-        loan_balance_before, loan_balance_after, invested_balance_before, invested_balance_after = \
-            await BalanceService.calculate_balances_for_transaction(
-                transaction.account_id,
-                transaction.transaction_type,
-                transaction.amount,
-                transaction.user_id
+        org_account_id = await AccountDB.get_organization_account_id()
+
+        def opposite(transaction: dict) -> Optional[TransactionCreate]:
+            # Create opposite transaction for organization account for specific transaction types
+            # Only create opposite transactions for user transactions, not organization transactions
+            if (transaction["transaction_type"] not in [
+                TransactionType.DEPOSIT, 
+                TransactionType.WITHDRAWAL, 
+                TransactionType.LOAN_DISBURSEMENT, 
+                TransactionType.PAYMENT,
+                TransactionType.FEE
+            ] or transaction["user_id"] == "organization"):
+                return None
+            if not org_account_id:
+                raise ValueError("Organization account not found")
+            return BalanceService.opposite_organization_transaction(
+                org_account_id=org_account_id,
+                user_transaction_id=transaction_id,
+                user_account_id=transaction["account_id"],
+                user_id=transaction["user_id"],
+                transaction_type=transaction["transaction_type"],
+                amount=transaction["amount"],
+                description=f"Opposite transaction for {transaction['description']}",
+                collateral_id=transaction["collateral_id"]
             )
-        
-        # Update transaction with balance information
-        await TransactionDB.update_transaction_balances(
-            transaction_id=transaction_id,
-            loan_balance_before=loan_balance_before,
-            loan_balance_after=loan_balance_after,
-            invested_balance_before=invested_balance_before,
-            invested_balance_after=invested_balance_after
-        )
-        
-        # Update account balances
-        await BalanceService.update_account_balances(
-            account_id=transaction.account_id,
-            loan_balance=loan_balance_after,
-            investment_balance=invested_balance_after
+
+        # Lock the accounts, calculate balances, update the accounts, complete
+        # the transaction and record the organization's side of it, all in one
+        # database transaction
+        transaction = await TransactionDB.complete_with_balances(
+            transaction_id, BalanceService.apply_transaction, opposite
         )
         
-        # Mark transaction as completed
-        await TransactionDB.mark_transaction_completed(transaction_id)
-        
-        # Create opposite transaction for organization account for specific transaction types
-        # Only create opposite transactions for user transactions, not organization transactions
-        if (transaction.transaction_type in [
-            TransactionType.DEPOSIT, 
-            TransactionType.WITHDRAWAL, 
-            TransactionType.LOAN_DISBURSEMENT, 
-            TransactionType.PAYMENT,
-            TransactionType.FEE
-        ] and transaction.user_id != "organization"):
-            try:
-                await BalanceService.create_opposite_organization_transaction(
-                    user_transaction_id=transaction_id,
-                    user_account_id=transaction.account_id,
-                    user_id=transaction.user_id,
-                    transaction_type=transaction.transaction_type,
-                    amount=transaction.amount,
-                    description=f"Opposite transaction for {transaction.description}",
-                    collateral_id=transaction.collateral_id
-                )
-            except Exception as e:
-                # Log the error but don't fail the user transaction
-                print(f"Failed to create opposite organization transaction: {e}")
-        
         return {
-            "loan_balance_before": loan_balance_before,
-            "loan_balance_after": loan_balance_after,
-            "invested_balance_before": invested_balance_before,
-            "invested_balance_after": invested_balance_after
+            "loan_balance_before": transaction["loan_balance_before"],
+            "loan_balance_after": transaction["loan_balance_after"],
+            "invested_balance_before": transaction["invested_balance_before"],
+            "invested_balance_after": transaction["invested_balance_after"]
         }
 
     @staticmethod
-    async def create_opposite_organization_transaction(
+    def opposite_organization_transaction(
+        org_account_id: str,
         user_transaction_id: str,
         user_account_id: str,
         user_id: str,
@@ -177,19 +212,14 @@ class BalanceService:
         amount: float,
         description: str = None,
         collateral_id: str = None
-    ):
-        """Create an opposite transaction for the organization account"""
-        # Get organization account
-        org_account = await AccountDB.get_organization_account()
-        if not org_account:
-            raise ValueError("Organization account not found")
-        
+    ) -> TransactionCreate:
+        """Build the opposite transaction for the organization account"""
         # Determine opposite transaction type
         opposite_type = BalanceService._get_opposite_transaction_type(transaction_type)
         
         # Create opposite transaction data
-        opposite_transaction_data = TransactionCreate(
-            account_id=org_account.id,
+        return TransactionCreate(
+            account_id=org_account_id,
             user_id="organization",  # Organization user ID
             transaction_type=opposite_type,
             amount=amount,
@@ -203,57 +233,30 @@ class BalanceService:
                 "original_transaction_type": transaction_type.value
             }
         )
-        
-        # Create the opposite transaction
-        opposite_transaction = await TransactionDB.create_transaction(opposite_transaction_data)
-        
-        # Process balances for the opposite transaction
-        try:
-            await BalanceService.process_transaction_balances(opposite_transaction.id)
-        except ValueError as e:
-            # If balance processing fails, mark transaction as failed
-            await TransactionDB.mark_transaction_failed(opposite_transaction.id, str(e))
-            raise e
-        
-        return opposite_transaction
 
     @staticmethod
     def _get_opposite_transaction_type(transaction_type: TransactionType) -> TransactionType:
         """Get the opposite transaction type for organization account"""
-        opposite_map = {
-            TransactionType.DEPOSIT: TransactionType.DEPOSIT,  # User deposits, org also deposits (same)
-            TransactionType.WITHDRAWAL: TransactionType.WITHDRAWAL,  # User withdraws, org also withdraws (same)
-            TransactionType.LOAN_DISBURSEMENT: TransactionType.WITHDRAWAL,  # User gets loan, org withdraws (opposite)
-            TransactionType.PAYMENT: TransactionType.DEPOSIT,  # User pays, org deposits (opposite)
-            TransactionType.FEE: TransactionType.INTEREST,  # User pays fee, org gets interest
-            TransactionType.INTEREST: TransactionType.FEE,  # User gets interest, org pays fee
-        }
-        
-        return opposite_map.get(transaction_type, transaction_type)
+        return _OPPOSITE_TRANSACTION_TYPES.get(transaction_type, transaction_type)
 
     @staticmethod
     async def revert_transaction_balances(transaction_id: str):
-        """Revert balance changes for a transaction (used when Crossmint fails)"""
-        # Get the transaction
-        transaction = await TransactionDB.get_transaction_by_id(transaction_id)
+        """
+        Revert balance changes for a transaction (used when Crossmint fails)
+
+        The transaction's balance change, and its organization counterpart's,
+        is undone and the transaction is marked failed, in one database
+        transaction. A transaction that was never applied has no balances to
+        restore; it is still marked failed, and ValueError is raised.
+        """
+        transaction = await TransactionDB.fail_and_revert(transaction_id, "Reverted due to Crossmint failure")
         if not transaction:
             raise ValueError(f"Transaction {transaction_id} not found")
         
-        # Get the balance information from the transaction
         if (transaction.loan_balance_before is None or 
             transaction.invested_balance_before is None):
             raise ValueError(f"Transaction {transaction_id} does not have balance information to revert")
         
-        # Revert account balances to the before state
-        await BalanceService.update_account_balances(
-            account_id=transaction.account_id,
-            loan_balance=transaction.loan_balance_before,
-            investment_balance=transaction.invested_balance_before
-        )
-        
-        # Mark transaction as failed
-        await TransactionDB.mark_transaction_failed(transaction_id, "Reverted due to Crossmint failure")
-        
         return {
             "reverted_loan_balance": transaction.loan_balance_before,
             "reverted_invested_balance": transaction.invested_balance_before
@@ -0,0 +1,75 @@
+"""
+Text embedding cache
+
+Users often resubmit the same item description (retries, several images of
+one collateral), and each submission would otherwise run the CLIP text
+encoder again. Embeddings are cached by the SHA-256 of the text: an in-process
+LRU first, then an on-disk cache (when diskcache is installed) that survives
+restarts.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+# Load environment variables
+load_dotenv()
+
+EMBEDDING_CACHE_SIZE = 4096
+EMBEDDING_CACHE_TTL = 7 * 86400
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", os.path.join("data", "emb_cache"))
+
+
+class EmbeddingCache:
+    """SHA-256 keyed cache in front of a text embedding function"""
+
+    def __init__(self, embed: Callable[[str], np.ndarray], namespace: str,
+                 max_entries: int = EMBEDDING_CACHE_SIZE, directory: Optional[str] = EMBEDDING_CACHE_DIR):
+        """
+        Args:
+            embed: Function computing the embedding of a text
+            namespace: Model name; keeps embeddings from different models apart on disk
+            max_entries: Size of the in-process LRU
+            directory: On-disk cache location, or None for memory only
+        """
+        self._embed = embed
+        self._namespace = namespace
+        self._max_entries = max_entries
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        # Embeddings are requested from several worker threads at once
+        self._lock = threading.Lock()
+        self._disk = diskcache.Cache(directory) if diskcache is not None and directory else None
+
+    def get(self, text: str) -> np.ndarray:
+        """Return the embedding of text, computing it only on a miss"""
+        key = f"{self._namespace}:{hashlib.sha256(text.encode()).hexdigest()}"
+
+        with self._lock:
+            embedding = self._memory.get(key)
+            if embedding is not None:
+                self._memory.move_to_end(key)
+                return embedding
+
+        embedding = self._disk.get(key) if self._disk is not None else None
+        if embedding is None:
+            embedding = self._embed(text)
+            if self._disk is not None:
+                self._disk.set(key, embedding, expire=EMBEDDING_CACHE_TTL)
+
+        # Callers share the cached array, so it must not be modified in place
+        embedding.setflags(write=False)
+        with self._lock:
+            self._memory[key] = embedding
+            if len(self._memory) > self._max_entries:
+                self._memory.popitem(last=False)
+        return embedding
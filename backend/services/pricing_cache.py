@@ -0,0 +1,69 @@
+"""
+Exact pricing cache
+
+The LLM pricing call (with web search) is the most expensive step of creating
+a collateral. Its results are stored on disk, keyed by the SHA-256 of the
+image content together with the description and search context, so pricing
+the same photo again costs nothing, across restarts too. This tier is checked
+before the approximate (embedding) cache.
+
+Disabled when diskcache is not installed.
+"""
+
+import hashlib
+import os
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from llmapi import ProductPriceResult
+
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+# Load environment variables
+load_dotenv()
+
+PRICING_CACHE_DIR = os.getenv("PRICING_CACHE_DIR", os.path.join("data", "pricing_cache"))
+PRICING_CACHE_SIZE_LIMIT = 2 << 30  # 2 GiB
+# Market prices drift, so a stored valuation is only reused for a week
+PRICING_CACHE_TTL = 7 * 86400
+
+
+class PricingCache:
+    """On-disk cache of similar-image and pricing results, keyed by image content"""
+
+    def __init__(self, directory: Optional[str] = PRICING_CACHE_DIR):
+        self._disk = diskcache.Cache(directory, size_limit=PRICING_CACHE_SIZE_LIMIT) \
+            if diskcache is not None and directory else None
+
+    @staticmethod
+    def key(image_bytes: bytes, description: str, search_context: str) -> str:
+        """Cache key for pricing an image with a given description and context"""
+        digest = hashlib.sha256(hashlib.sha256(image_bytes).digest())
+        # Hash the full text: descriptions differing only past some prefix
+        # must not share a valuation
+        digest.update("\0".join((description, search_context)).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[List[Dict[str, Any]], ProductPriceResult]]:
+        """Return (similar_images, pricing_result) if this image was priced before"""
+        if self._disk is None:
+            return None
+        cached = self._disk.get(key)
+        if cached is None:
+            return None
+        return cached["similar_images"], ProductPriceResult(**cached["pricing"])
+
+    def set(self, key: str, similar_images: List[Dict[str, Any]], pricing_result: ProductPriceResult) -> None:
+        """Store the results of pricing an image"""
+        if self._disk is None:
+            return
+        self._disk.set(
+            key,
+            {"similar_images": similar_images, "pricing": asdict(pricing_result)},
+            expire=PRICING_CACHE_TTL
+        )
@@ -0,0 +1,103 @@
+"""
+Approximate result cache
+
+Analyses of near-identical inputs (a re-encoded or resized upload with the same
+description) produce the same answer, so their results can be reused instead of
+re-running CLIP search and the LLM. Entries are keyed by one or more normalized
+embeddings (typically the CLIP image embedding and the description embedding);
+a lookup is a hit only if every embedding is within the cosine distance limit
+of the same stored entry.
+
+Each key kind is kept in one contiguous (capacity, dim) float32 matrix, so a
+lookup is a single matrix-vector product per key kind. Entries are evicted
+least recently used first.
+"""
+
+import pickle
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional, Sequence
+
+import numpy as np
+
+# Default limits: 1024 entries, reused for a day
+PROXIMITY_CACHE_SIZE = 1024
+PROXIMITY_CACHE_TTL = 86400
+
+# Maximum cosine distance (1 - similarity) for a key to count as a match
+DEFAULT_MAX_DISTANCE = 0.05
+
+
+class ProximityCache:
+    """LRU cache whose keys are embeddings matched by cosine distance"""
+
+    def __init__(self, dims: Sequence[int], max_distances: Sequence[float],
+                 capacity: int = PROXIMITY_CACHE_SIZE, ttl: int = PROXIMITY_CACHE_TTL):
+        """
+        Args:
+            dims: Dimension of each key embedding
+            max_distances: Maximum cosine distance for each key embedding
+            capacity: Maximum number of entries
+            ttl: Seconds an entry stays valid
+        """
+        self.capacity = capacity
+        self.ttl = ttl
+        self._min_scores = np.array([1.0 - d for d in max_distances], dtype=np.float32)
+        self._keys = [np.zeros((capacity, dim), dtype=np.float32) for dim in dims]
+        self._live = np.zeros(capacity, dtype=bool)
+        # slot -> (scope, pickled value, expires_at), oldest use first
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._free: List[int] = list(range(capacity - 1, -1, -1))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _release(self, slot: int) -> None:
+        del self._entries[slot]
+        self._live[slot] = False
+        self._free.append(slot)
+
+    def lookup(self, embeddings: Sequence[np.ndarray], scope: Hashable = None) -> Optional[Any]:
+        """
+        Return the value of the closest live entry whose embeddings all match
+
+        Args:
+            embeddings: One normalized embedding per key kind
+            scope: Entries only match lookups with an equal scope (e.g. top_k)
+        """
+        if not self._entries:
+            return None
+
+        # Per-kind cosine similarities; an entry's score is its worst match
+        scores = np.stack([
+            matrix @ np.asarray(embedding, dtype=np.float32)
+            for matrix, embedding in zip(self._keys, embeddings)
+        ])
+        matches = self._live & np.all(scores >= self._min_scores[:, None], axis=0)
+        if not matches.any():
+            return None
+
+        worst = scores.min(axis=0)
+        now = time.time()
+        for slot in np.flatnonzero(matches)[np.argsort(worst[matches])[::-1]]:
+            slot = int(slot)
+            entry_scope, value, expires_at = self._entries[slot]
+            if expires_at <= now:
+                self._release(slot)
+                continue
+            if entry_scope == scope:
+                self._entries.move_to_end(slot)
+                return pickle.loads(value)
+        return None
+
+    def store(self, embeddings: Sequence[np.ndarray], value: Any, scope: Hashable = None) -> None:
+        """Add an entry, evicting the least recently used one if the cache is full"""
+        if not self._free:
+            self._release(next(iter(self._entries)))
+
+        slot = self._free.pop()
+        for matrix, embedding in zip(self._keys, embeddings):
+            matrix[slot] = embedding
+        self._live[slot] = True
+        # Values are pickled so callers never share (and mutate) a cached object
+        self._entries[slot] = (scope, pickle.dumps(value), time.time() + self.ttl)
@@ -1,278 +0,0 @@
-#!/usr/bin/env python3
-"""
-Simple test for collateral API logic without external dependencies
-Tests the business logic by mocking all external calls
-"""
-
-import asyncio
-from unittest.mock import Mock, patch, MagicMock
-import sys
-import os
-
-# Mock all external modules
-sys.modules['db.collateral'] = MagicMock()
-sys.modules['db.user'] = MagicMock()
-sys.modules['rag3'] = MagicMock()
-sys.modules['llmapi'] = MagicMock()
-
-# Mock the specific classes we need
-from unittest.mock import Mock
-ImageRAGSystem = Mock()
-AnthropicClient = Mock()
-
-# Now we can import our routes
-from routes.collaterals import create_collateral
-from dataModels.collateral import CollateralCreateRequest
-
-
-async def test_collateral_creation_logic():
-    """Test the collateral creation logic without database calls"""
-    
-    print("🧪 Testing Collateral Creation Logic...")
-    
-    # Create test data
-    test_request = CollateralCreateRequest(
-        user_id="yashvika",
-        name="Luxury Watch",
-        description="A high-end timepiece for collateral",
-        images=["rolex.jpeg"]
-    )
-    
-    # Mock the database responses
-    mock_user = Mock()
-    mock_user.id = "yashvika"
-    mock_user.email = "yashvika@example.com"
-    
-    mock_collateral = Mock()
-    mock_collateral.id = "collateral_001"
-    
-    # Mock the database calls
-    with patch('routes.collaterals.UserDB') as mock_user_db, \
-         patch('routes.collaterals.CollateralDB') as mock_collateral_db, \
-         patch('routes.collaterals.ImageRAGSystem') as mock_rag, \
-         patch('routes.collaterals.AnthropicClient') as mock_llm:
-        
-        # Setup UserDB mock
-        mock_user_db.get_user_by_id.return_value = mock_user
-        
-        # Setup CollateralDB mock
-        mock_collateral_db.create_collateral_simple.return_value = mock_collateral
-        mock_collateral_db.update_collateral.return_value = mock_collateral
-        
-        # Setup RAG3 mock
-        mock_rag_instance = Mock()
-        mock_rag_instance.find_similar_images.return_value = [
-            {
-                "id": "similar_001",
-                "score": 0.85,
-                "name": "Luxury Watch",
-                "type": "Watch",
-                "user_description": "High-end timepiece"
-            }
-        ]
-        mock_rag.return_value = mock_rag_instance
-        
-        # Setup LLM mock
-        mock_llm_instance = Mock()
-        mock_pricing_result = Mock()
-        mock_pricing_result.product_name = "Luxury Watch"
-        mock_pricing_result.price_range = "$8,000 - $12,000"
-        mock_pricing_result.currency = "USD"
-        mock_pricing_result.marketplace = "Luxury Retail"
-        mock_pricing_result.confidence = "high"
-        mock_llm_instance.comprehensive_product_search.return_value = mock_pricing_result
-        mock_llm.return_value = mock_llm_instance
-        
-        try:
-            # Call the function - handle the fact that it's a route function
-            # We need to mock the database calls at the module level
-            with patch('routes.collaterals.UserDB.get_user_by_id', return_value=mock_user), \
-                 patch('routes.collaterals.CollateralDB.create_collateral_simple', return_value=mock_collateral), \
-                 patch('routes.collaterals.CollateralDB.update_collateral', return_value=mock_collateral):
-                
-                # Call the function
-                result = await create_collateral(test_request)
-            
-            # Verify the result
-            print("✅ Collateral creation successful!")
-            print(f"   Collateral ID: {result.id}")
-            print(f"   User ID: {result.user_id}")
-            print(f"   Status: {result.status}")
-            
-            # Verify metadata contains analysis results
-            if hasattr(result, 'metadata') and result.metadata:
-                metadata = result.metadata
-                print(f"   RAG3 Integration: {metadata.get('rag3_integration', False)}")
-                print(f"   Total Estimated Value: {metadata.get('total_estimated_value', 'N/A')}")
-                print(f"   Loan Limit: {metadata.get('overall_loan_limit', 'N/A')}")
-                print(f"   Interest Rate: {metadata.get('interest_rate', 'N/A')}")
-                
-                if 'image_analyses' in metadata:
-                    print(f"   Images Analyzed: {len(metadata['image_analyses'])}")
-                    for i, analysis in enumerate(metadata['image_analyses']):
-                        print(f"     Image {i+1}: {analysis.get('image_path', 'Unknown')}")
-                        if 'pricing_analysis' in analysis:
-                            pricing = analysis['pricing_analysis']
-                            print(f"       Price: {pricing.get('price_range', 'Unknown')}")
-                            print(f"       Estimated Value: {pricing.get('estimated_value', 'Unknown')}")
-            
-            # Verify mocks were called correctly
-            mock_user_db.get_user_by_id.assert_called_once_with("yashvika")
-            mock_collateral_db.create_collateral_simple.assert_called_once()
-            mock_collateral_db.update_collateral.assert_called_once()
-            mock_rag_instance.find_similar_images.assert_called_once()
-            mock_llm_instance.comprehensive_product_search.assert_called_once()
-            
-            print("✅ All mocks called correctly!")
-            return True
-            
-        except Exception as e:
-            print(f"❌ Test failed: {e}")
-            import traceback
-            traceback.print_exc()
-            return False
-
-
-async def test_error_handling():
-    """Test error handling scenarios"""
-    
-    print("\n🧪 Testing Error Handling...")
-    
-    test_request = CollateralCreateRequest(
-        user_id="yashvika",
-        name="Test Item",
-        description="Test description",
-        images=["test.jpg"]
-    )
-    
-    # Test user not found
-    with patch('routes.collaterals.UserDB') as mock_user_db:
-        mock_user_db.get_user_by_id.return_value = None
-        
-        try:
-            await create_collateral(test_request)
-            print("❌ Should have failed with user not found")
-            return False
-        except Exception as e:
-            if "User not found" in str(e):
-                print("✅ User not found error handled correctly")
-            else:
-                print(f"❌ Unexpected error: {e}")
-                return False
-    
-    # Test RAG3 initialization failure
-    with patch('routes.collaterals.UserDB') as mock_user_db, \
-         patch('routes.collaterals.ImageRAGSystem') as mock_rag:
-        
-        mock_user_db.get_user_by_id.return_value = Mock()
-        mock_rag.side_effect = Exception("RAG3 failed")
-        
-        try:
-            await create_collateral(test_request)
-            print("❌ Should have failed with RAG3 error")
-            return False
-        except Exception as e:
-            if "Failed to initialize image analysis system" in str(e):
-                print("✅ RAG3 initialization error handled correctly")
-            else:
-                print(f"❌ Unexpected error: {e}")
-                return False
-    
-    print("✅ Error handling tests passed!")
-    return True
-
-
-async def test_validation():
-    """Test input validation"""
-    
-    print("\n🧪 Testing Input Validation...")
-    
-    # Test empty images (this should actually work since images is Optional[List[str]])
-    try:
-        test_request = CollateralCreateRequest(
-            user_id="yashvika",
-            name="Test Item",
-            description="Test description",
-            images=[]
-        )
-        print("✅ Empty images allowed (as expected)")
-    except Exception as e:
-        print(f"❌ Empty images validation failed unexpectedly: {e}")
-        return False
-    
-    # Test empty name (this should fail due to min_length=1)
-    try:
-        test_request = CollateralCreateRequest(
-            user_id="yashvika",
-            name="",  # Empty name should fail
-            description="Test description",
-            images=["test.jpg"]
-        )
-        print("❌ Should have failed with empty name")
-        return False
-    except Exception as e:
-        print("✅ Empty name validation working")
-    
-    # Test empty description (this should fail due to min_length=1)
-    try:
-        test_request = CollateralCreateRequest(
-            user_id="yashvika",
-            name="Test Item",
-            description="",  # Empty description should fail
-            images=["test.jpg"]
-        )
-        print("❌ Should have failed with empty description")
-        return False
-    except Exception as e:
-        print("✅ Empty description validation working")
-    
-    print("✅ Input validation tests passed!")
-    return True
-
-
-async def run_all_tests():
-    """Run all tests"""
-    
-    print("🚀 Starting Collateral API Tests...")
-    print("=" * 50)
-    
-    tests = [
-        ("Collateral Creation Logic", test_collateral_creation_logic),
-        ("Error Handling", test_error_handling),
-        ("Input Validation", test_validation)
-    ]
-    
-    passed = 0
-    failed = 0
-    
-    for test_name, test_func in tests:
-        print(f"\n🔍 Running: {test_name}")
-        try:
-            result = await test_func()
-            if result:
-                print(f"✅ {test_name} - PASSED")
-                passed += 1
-            else:
-                print(f"❌ {test_name} - FAILED")
-                failed += 1
-        except Exception as e:
-            print(f"❌ {test_name} - FAILED with exception: {e}")
-            failed += 1
-    
-    print("\n" + "=" * 50)
-    print("📊 Test Results:")
-    print(f"   Passed: {passed}")
-    print(f"   Failed: {failed}")
-    print(f"   Total: {passed + failed}")
-    
-    if failed == 0:
-        print("🎉 All tests passed!")
-    else:
-        print("⚠️  Some tests failed. Check the output above.")
-    
-    return passed, failed
-
-
-if __name__ == "__main__":
-    # Run the tests
-    asyncio.run(run_all_tests())
@@ -5,22 +5,38 @@ This tests the new class-based architecture without requiring RAG3 database conn
 """
 
 import asyncio
-import base64
-import os
-from unittest.mock import Mock, patch, MagicMock
+import copy
+import types
+from unittest.mock import Mock, patch
 import sys
 
-# Mock problematic modules
-sys.modules['rag3'] = MagicMock()
-sys.modules['llmapi'] = MagicMock()
+# Mock problematic modules; plain module shells holding only the names
+# that get imported from them
+sys.modules['rag3'] = types.ModuleType('rag3')
+sys.modules['rag3'].ImageRAGSystem = Mock()
+sys.modules['llmapi'] = types.ModuleType('llmapi')
+sys.modules['llmapi'].AnthropicClient = Mock()
+sys.modules['llmapi'].ProductPriceResult = Mock()
 
 # Mock the specific classes we need
 from unittest.mock import Mock
 ImageRAGSystem = Mock()
 AnthropicClient = Mock()
 
+# Pricing result returned by the mocked LLM client; tests take a copy
+_PRICING_RESULT = Mock(
+    product_name="Luxury Rolex Watch",
+    initial_price="$13,775.00",
+    collateral_price="$9,642.50",
+    price_range="$13,050 - $14,500",
+    currency="USD",
+    marketplace="Various marketplaces",
+    confidence="high"
+)
+
 # Now import our refactored integration
 from rag3_llampi_integration import RAG3LLAMPIIntegrator, quick_price_check, find_similar_only
+from conftest import load_rolex_image
 
 
 def test_class_instantiation():
@@ -28,25 +44,22 @@ def test_class_instantiation():
     print("🧪 Testing Class Instantiation...")
     print("=" * 50)
     
-    try:
-        integrator = RAG3LLAMPIIntegrator(verbose=True)
-        print("   ✅ RAG3LLAMPIIntegrator instantiated successfully")
-        print(f"   Verbose mode: {integrator.verbose}")
-        print(f"   RAG system: {integrator.rag_system}")
-        print(f"   LLM client: {integrator.llm_client}")
-        return True
-    except Exception as e:
-        print(f"   ❌ Failed to instantiate: {e}")
-        return False
+    integrator = RAG3LLAMPIIntegrator(verbose=True)
+    print("   ✅ RAG3LLAMPIIntegrator instantiated successfully")
+    print(f"   Verbose mode: {integrator.verbose}")
+    print(f"   RAG system: {integrator.rag_system}")
+    print(f"   LLM client: {integrator.llm_client}")
+    
+    assert integrator.verbose is True
+    assert integrator.rag_system is None
+    assert integrator.llm_client is None
 
 
-def test_methods_exist():
+def test_methods_exist(integrator):
     """Test that all expected methods exist"""
     print("\n🧪 Testing Method Existence...")
     print("=" * 50)
     
-    integrator = RAG3LLAMPIIntegrator(verbose=False)
-    
     expected_methods = [
         'initialize_systems',
         'find_similar_images', 
@@ -59,20 +72,11 @@ def test_methods_exist():
         '_convert_results_to_json'
     ]
     
-    missing_methods = []
-    for method_name in expected_methods:
-        if hasattr(integrator, method_name):
-            print(f"   ✅ {method_name} exists")
-        else:
-            print(f"   ❌ {method_name} missing")
-            missing_methods.append(method_name)
+    present = set(dir(integrator))
+    missing_methods = [method_name for method_name in expected_methods if method_name not in present]
     
-    if missing_methods:
-        print(f"   ⚠️  Missing methods: {missing_methods}")
-        return False
-    else:
-        print("   ✅ All expected methods present")
-        return True
+    assert not missing_methods, f"Missing methods: {missing_methods}"
+    print("   ✅ All expected methods present")
 
 
 def test_backward_compatibility():
@@ -80,26 +84,19 @@ def test_backward_compatibility():
     print("\n🧪 Testing Backward Compatibility...")
     print("=" * 50)
     
-    try:
-        # Test that old function names still exist
-        from rag3_llampi_integration import (
-            integrate_rag3_with_llampi,
-            quick_price_check,
-            find_similar_only,
-            get_json_results
-        )
-        print("   ✅ All backward compatibility functions imported successfully")
-        
-        # Test that they're callable
-        print("   ✅ integrate_rag3_with_llampi is callable")
-        print("   ✅ quick_price_check is callable")
-        print("   ✅ find_similar_only is callable")
-        print("   ✅ get_json_results is callable")
-        
-        return True
-    except ImportError as e:
-        print(f"   ❌ Import error: {e}")
-        return False
+    # Test that old function names still exist
+    from rag3_llampi_integration import (
+        integrate_rag3_with_llampi,
+        quick_price_check,
+        find_similar_only,
+        get_json_results
+    )
+    print("   ✅ All backward compatibility functions imported successfully")
+    
+    # Test that they're callable
+    for function in (integrate_rag3_with_llampi, quick_price_check, find_similar_only, get_json_results):
+        assert callable(function), f"{function.__name__} is not callable"
+        print(f"   ✅ {function.__name__} is callable")
 
 
 def test_results_manager():
@@ -107,135 +104,95 @@ def test_results_manager():
     print("\n🧪 Testing ResultsManager Class...")
     print("=" * 50)
     
-    try:
-        from rag3_llampi_integration import ResultsManager
-        
-        # Test class instantiation
-        print("   ✅ ResultsManager class imported successfully")
-        
-        # Test static methods exist
-        if hasattr(ResultsManager, 'save_to_text_file'):
-            print("   ✅ save_to_text_file method exists")
-        else:
-            print("   ❌ save_to_text_file method missing")
-            return False
-            
-        if hasattr(ResultsManager, 'save_to_json_file'):
-            print("   ✅ save_to_json_file method exists")
-        else:
-            print("   ❌ save_to_json_file method missing")
-            return False
-        
-        print("   ✅ All ResultsManager methods present")
-        return True
-        
-    except Exception as e:
-        print(f"   ❌ ResultsManager test failed: {e}")
-        return False
+    from rag3_llampi_integration import ResultsManager
+    print("   ✅ ResultsManager class imported successfully")
+    
+    # Test static methods exist
+    for method_name in ('save_to_text_file', 'save_to_json_file'):
+        assert hasattr(ResultsManager, method_name), f"{method_name} method missing"
+        print(f"   ✅ {method_name} method exists")
+    
+    print("   ✅ All ResultsManager methods present")
 
 
-def test_mocked_integration():
+def test_mocked_integration(integrator):
     """Test the integration with mocked dependencies"""
     print("\n🧪 Testing Mocked Integration...")
     print("=" * 50)
     
-    try:
-        # Create mock data
-        mock_pricing_result = Mock()
-        mock_pricing_result.product_name = "Luxury Rolex Watch"
-        mock_pricing_result.initial_price = "$13,775.00"
-        mock_pricing_result.collateral_price = "$9,642.50"
-        mock_pricing_result.price_range = "$13,050 - $14,500"
-        mock_pricing_result.currency = "USD"
-        mock_pricing_result.marketplace = "Various marketplaces"
-        mock_pricing_result.confidence = "high"
+    mock_pricing_result = copy.copy(_PRICING_RESULT)
+    
+    # Mock the LLM client
+    mock_llm = Mock()
+    mock_llm.search_product_price_from_image.return_value = mock_pricing_result
+    
+    # Patch the shared integrator's initialization
+    with patch.object(integrator, 'initialize_systems', return_value=True), \
+         patch.object(integrator, 'rag_system', Mock()), \
+         patch.object(integrator, 'llm_client', mock_llm):
+        
+        # Test the integration flow
+        print("   🔄 Testing integration flow...")
+        
+        # Test input image analysis creation
+        input_analysis = integrator.create_input_image_analysis(
+            "rolex.jpeg", 
+            "Vintage luxury timepiece", 
+            mock_pricing_result
+        )
+        print("   ✅ Input image analysis created")
+        
+        # Test summary creation
+        summary = integrator.create_summary(mock_pricing_result, [])
+        assert summary['successful_price_calculations'] == 1
+        assert summary['failed_price_calculations'] == 0
+        print("   ✅ Summary created")
         
-        # Mock the LLM client
-        mock_llm = Mock()
-        mock_llm.search_product_price_from_image.return_value = mock_pricing_result
+        # Test JSON conversion
+        results = {
+            'input_image_analysis': input_analysis,
+            'similar_images_analysis': [],
+            'summary': summary
+        }
         
-        # Create integrator and patch the initialization
-        integrator = RAG3LLAMPIIntegrator(verbose=False)
+        json_results = integrator._convert_results_to_json(results)
+        assert "error" not in json_results, json_results.get("error")
+        print("   ✅ JSON conversion successful")
         
-        with patch.object(integrator, 'initialize_systems', return_value=True), \
-             patch.object(integrator, 'rag_system', Mock()), \
-             patch.object(integrator, 'llm_client', mock_llm):
-            
-            # Test the integration flow
-            print("   🔄 Testing integration flow...")
-            
-            # Test input image analysis creation
-            input_analysis = integrator.create_input_image_analysis(
-                "rolex.jpeg", 
-                "Vintage luxury timepiece", 
-                mock_pricing_result
-            )
-            print("   ✅ Input image analysis created")
-            
-            # Test summary creation
-            summary = integrator.create_summary(mock_pricing_result, [])
-            print("   ✅ Summary created")
-            
-            # Test JSON conversion
-            results = {
-                'input_image_analysis': input_analysis,
-                'similar_images_analysis': [],
-                'summary': summary
-            }
-            
-            json_results = integrator._convert_results_to_json(results)
-            print("   ✅ JSON conversion successful")
-            
-            # Verify JSON structure
-            required_keys = ['input_image_analysis', 'similar_images_analysis', 'summary', 'metadata']
-            for key in required_keys:
-                if key in json_results:
-                    print(f"   ✅ {key} present in JSON")
-                else:
-                    print(f"   ❌ {key} missing from JSON")
-                    return False
-            
-            print("   ✅ All JSON structure tests passed")
-            return True
-            
-    except Exception as e:
-        print(f"   ❌ Mocked integration test failed: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
+        # Verify JSON structure
+        required_keys = ['input_image_analysis', 'similar_images_analysis', 'summary', 'metadata']
+        missing_keys = [key for key in required_keys if key not in json_results]
+        assert not missing_keys, f"Missing from JSON: {missing_keys}"
+        print("   ✅ All JSON structure tests passed")
 
 
-def test_image_processing():
+def test_image_processing(rolex_image):
     """Test image processing capabilities"""
     print("\n🧪 Testing Image Processing...")
     print("=" * 50)
     
-    if not os.path.exists("rolex.jpeg"):
-        print("   ❌ rolex.jpeg not found")
-        return False
+    assert rolex_image is not None, "rolex.jpeg not found"
+    image_data, image_base64 = rolex_image
     
-    try:
-        # Read and encode the image
-        with open("rolex.jpeg", "rb") as image_file:
-            image_data = image_file.read()
-            image_base64 = base64.b64encode(image_data).decode('utf-8')
-        
-        print(f"   ✅ Image loaded: rolex.jpeg ({len(image_data):,} bytes)")
-        print(f"   ✅ Base64 encoded: {len(image_base64):,} characters")
-        print(f"   ✅ Base64 preview: {image_base64[:50]}...")
-        
-        # Test base64 round-trip
-        decoded_data = base64.b64decode(image_base64)
-        if decoded_data == image_data:
-            print("   ✅ Base64 encoding/decoding successful")
-            return True
-        else:
-            print("   ❌ Base64 encoding/decoding failed")
-            return False
-            
-    except Exception as e:
-        print(f"   ❌ Image processing failed: {e}")
-        return False
+    print(f"   ✅ Image loaded: rolex.jpeg ({len(image_data):,} bytes)")
+    print(f"   ✅ Base64 encoded: {len(image_base64):,} characters")
+    print(f"   ✅ Base64 preview: {image_base64[:50]}...")
+    
+    # Padded base64 is 4 characters per started 3-byte group; checking the
+    # length avoids decoding and comparing the whole image again
+    assert len(image_base64) == ((len(image_data) + 2) // 3) * 4, "Base64 encoding has the wrong length"
+    print("   ✅ Base64 encoding successful")
+
+
+# (name, test) pairs run by main(), in order
+TESTS = (
+    ("Class Instantiation", test_class_instantiation),
+    ("Method Existence", test_methods_exist),
+    ("Backward Compatibility", test_backward_compatibility),
+    ("ResultsManager", test_results_manager),
+    ("Mocked Integration", test_mocked_integration),
+    ("Image Processing", test_image_processing),
+)
 
 
 def main():
@@ -243,28 +200,26 @@ def main():
     print("🚀 Testing Refactored RAG3-LLAMPI Integration...")
     print("=" * 60)
     
-    tests = [
-        ("Class Instantiation", test_class_instantiation),
-        ("Method Existence", test_methods_exist),
-        ("Backward Compatibility", test_backward_compatibility),
-        ("ResultsManager", test_results_manager),
-        ("Mocked Integration", test_mocked_integration),
-        ("Image Processing", test_image_processing)
-    ]
+    # Built once and shared, like the session fixtures in conftest.py
+    integrator = RAG3LLAMPIIntegrator(verbose=False)
+    rolex_image = load_rolex_image()
+    
+    fixtures = {"integrator": integrator, "rolex_image": rolex_image}
     
     passed = 0
     failed = 0
     
-    for test_name, test_func in tests:
+    for test_name, test_func in TESTS:
         print(f"\n🔍 Running: {test_name}")
         try:
-            result = test_func()
-            if result:
-                print(f"✅ {test_name} - PASSED")
-                passed += 1
-            else:
-                print(f"❌ {test_name} - FAILED")
-                failed += 1
+            # Pass fixtures by parameter name, as pytest does
+            arg_names = test_func.__code__.co_varnames[:test_func.__code__.co_argcount]
+            test_func(*(fixtures[name] for name in arg_names))
+            print(f"✅ {test_name} - PASSED")
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test_name} - FAILED: {e}")
+            failed += 1
         except Exception as e:
             print(f"❌ {test_name} - FAILED with exception: {e}")
             failed += 1
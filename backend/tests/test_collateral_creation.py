@@ -0,0 +1,198 @@
+"""
+Simple test for collateral API logic without external dependencies
+Tests the business logic by mocking all external calls
+"""
+
+import copy
+import functools
+import types
+from contextlib import contextmanager, nullcontext
+from unittest.mock import AsyncMock, Mock
+import sys
+
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+# The route module needs these installed; the suite can still run without them
+pytest.importorskip("aiofiles")
+pytest.importorskip("numpy")
+
+# Mock all external modules; plain module shells holding only the names
+# that get imported from them
+sys.modules['db.collateral'] = types.ModuleType('db.collateral')
+sys.modules['db.collateral'].CollateralDB = Mock()
+sys.modules['db.user'] = types.ModuleType('db.user')
+sys.modules['db.user'].UserDB = Mock()
+sys.modules['rag3'] = types.ModuleType('rag3')
+sys.modules['rag3'].ImageRAGSystem = Mock()
+sys.modules['llmapi'] = types.ModuleType('llmapi')
+sys.modules['llmapi'].AnthropicClient = Mock()
+sys.modules['llmapi'].ProductPriceResult = Mock()
+
+# Pricing result returned by the mocked LLM client; tests take a copy
+_PRICING_RESULT = Mock(
+    product_name="Luxury Watch",
+    price_range="$8,000 - $12,000",
+    currency="USD",
+    marketplace="Luxury Retail",
+    confidence="high"
+)
+
+# Now we can import our routes
+import routes.collaterals
+from routes.collaterals import create_collateral
+from dataModels.collateral import CollateralCreateRequest
+from conftest import ROLEX_IMAGE
+
+# Treat the test image's directory as the upload directory
+_UPLOAD_DIR = str(ROLEX_IMAGE.parent.resolve())
+
+
+@functools.lru_cache(maxsize=32)
+def _request(user_id, name, description, images):
+    """Build (once per distinct argument set) a valid CollateralCreateRequest; images is a tuple"""
+    return CollateralCreateRequest(user_id=user_id, name=name, description=description, images=list(images))
+
+
+@contextmanager
+def swap_attrs(target, **attrs):
+    """Temporarily replace attributes of target (much cheaper than stacking mock.patch)"""
+    old = {name: getattr(target, name) for name in attrs}
+    for name, value in attrs.items():
+        setattr(target, name, value)
+    try:
+        yield
+    finally:
+        for name, value in old.items():
+            setattr(target, name, value)
+
+
+def _user_db(user):
+    """UserDB stand-in whose cached lookup returns user"""
+    return Mock(get_user_by_id_cached=AsyncMock(return_value=user))
+
+
+def _no_cached_pricing():
+    """Both pricing cache tiers, always missing"""
+    return {
+        "_pricing_cache": Mock(lookup=Mock(return_value=None)),
+        "_exact_pricing_cache": Mock(get=Mock(return_value=None)),
+    }
+
+
+@pytest.mark.asyncio
+async def test_collateral_creation_logic():
+    """Test the collateral creation logic without database calls"""
+    # Two photos of the watch, priced separately
+    test_request = _request("yashvika", "Luxury Watch", "A high-end timepiece for collateral",
+                            (str(ROLEX_IMAGE), str(ROLEX_IMAGE)))
+
+    mock_user_db = _user_db(Mock(id="yashvika", email="yashvika@example.com"))
+    mock_collateral_db = Mock(create_with_metadata=AsyncMock(return_value=Mock(id="collateral_001")))
+
+    # The shared pricing systems the route would otherwise load on first use
+    mock_rag = Mock()
+    image_embeddings = [Mock(name="embedding_0"), Mock(name="embedding_1")]
+    mock_rag.extract_embeddings_batch.return_value = image_embeddings
+    mock_rag.find_similar_by_embedding.return_value = [
+        {
+            "id": "similar_001",
+            "score": 0.85,
+            "name": "Luxury Watch",
+            "type": "Watch",
+            "user_description": "High-end timepiece"
+        }
+    ]
+    mock_llm = Mock()
+    mock_llm.comprehensive_product_search.return_value = copy.copy(_PRICING_RESULT)
+
+    with swap_attrs(routes.collaterals, UserDB=mock_user_db, CollateralDB=mock_collateral_db,
+                    UPLOAD_DIR=_UPLOAD_DIR, _rag_system=mock_rag, _llm_client=mock_llm, **_no_cached_pricing()):
+        result = await create_collateral(test_request)
+
+    assert result.id == "collateral_001"
+
+    mock_user_db.get_user_by_id_cached.assert_awaited_once_with("yashvika")
+    # Both images are embedded in one batch, for the cache keys, the
+    # description once, and each image's vector is searched
+    mock_rag.extract_embeddings_batch.assert_called_once()
+    assert len(mock_rag.extract_embeddings_batch.call_args.args[0]) == 2
+    mock_rag.extract_embeddings.assert_not_called()
+    mock_rag.extract_text_embeddings.assert_called_once()
+    searched = {call.args[0] for call in mock_rag.find_similar_by_embedding.call_args_list}
+    assert searched == set(image_embeddings)
+    mock_rag.find_similar_images.assert_not_called()
+    assert mock_llm.comprehensive_product_search.call_count == 2
+    mock_collateral_db.create_with_metadata.assert_awaited_once()
+    # Each valued at the low end of the price range, lent at 70%
+    stored = mock_collateral_db.create_with_metadata.await_args.kwargs
+    assert stored["user_id"] == "yashvika"
+    assert stored["metadata"]["total_estimated_value"] == 16000.0
+    assert stored["loan_limit"] == pytest.approx(11200.0)
+
+
+@pytest.mark.asyncio
+async def test_user_not_found():
+    """An unknown user is rejected before any image analysis"""
+    test_request = _request("yashvika", "Test Item", "Test description", ("test.jpg",))
+
+    image_rag_system = Mock()
+    with swap_attrs(routes.collaterals, UserDB=_user_db(None), _rag_system=None), \
+         swap_attrs(sys.modules['rag3'], ImageRAGSystem=image_rag_system):
+        with pytest.raises(HTTPException) as exc_info:
+            await create_collateral(test_request)
+
+    assert exc_info.value.status_code == 404
+    assert exc_info.value.detail == "User not found"
+    image_rag_system.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_rag3_initialization_failure():
+    """Test that a failing image analysis system is reported"""
+    test_request = _request("yashvika", "Test Item", "Test description", (str(ROLEX_IMAGE),))
+
+    image_rag_system = Mock(side_effect=Exception("RAG3 failed"))
+    with swap_attrs(routes.collaterals, UserDB=_user_db(Mock()), UPLOAD_DIR=_UPLOAD_DIR, _rag_system=None), \
+         swap_attrs(sys.modules['rag3'], ImageRAGSystem=image_rag_system):
+        with pytest.raises(HTTPException) as exc_info:
+            await create_collateral(test_request)
+
+    assert exc_info.value.status_code == 500
+    assert "Failed to initialize image analysis system" in exc_info.value.detail
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("image_path", ["/etc/passwd", "data/../../../../etc/passwd", "test.jpg"])
+async def test_image_outside_upload_dir(image_path):
+    """Only uploaded images can be analyzed, never other files on the server"""
+    test_request = _request("yashvika", "Test Item", "Test description", (image_path,))
+
+    image_rag_system = Mock()
+    with swap_attrs(routes.collaterals, UserDB=_user_db(Mock()), _rag_system=None), \
+         swap_attrs(sys.modules['rag3'], ImageRAGSystem=image_rag_system):
+        with pytest.raises(HTTPException) as exc_info:
+            await create_collateral(test_request)
+
+    assert exc_info.value.status_code == 404
+    image_rag_system.assert_not_called()
+
+
+_VALID_REQUEST = {
+    "user_id": "yashvika",
+    "name": "Test Item",
+    "description": "Test description",
+    "images": ["test.jpg"]
+}
+
+
+@pytest.mark.parametrize("kwargs,should_raise", [
+    pytest.param({"name": ""}, True, id="empty-name"),
+    pytest.param({"description": ""}, True, id="empty-description"),
+    pytest.param({"images": []}, False, id="empty-images"),
+])
+def test_validation(kwargs, should_raise):
+    """Name and description must not be empty (min_length=1); images are optional"""
+    with pytest.raises(ValidationError) if should_raise else nullcontext():
+        CollateralCreateRequest(**{**_VALID_REQUEST, **kwargs})
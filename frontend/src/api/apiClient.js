@@ -585,8 +585,8 @@ export const createCollateralMock = async ({ user_id, name, description, images
  * @param {Object} params - Query parameters
  * @param {string} params.status - Filter by status (active, past, all)
  * @param {number} params.limit - Maximum number of items
- * @param {number} params.offset - Number of items to skip
- * @returns {Promise<Object>} - Collaterals list response
+ * @param {string} params.cursor - next_cursor from the previous page (omit for the first page)
+ * @returns {Promise<Object>} - Collaterals list response ({ collaterals, next_cursor, has_more, ... })
  */
 export const listCollaterals = async (params = {}) => {
   try {
@@ -597,8 +597,9 @@ export const listCollaterals = async (params = {}) => {
     if (params.status && params.status !== 'all') {
       queryParams.append('status', params.status);
     }
-    const page = Math.floor((params.offset || 0) / (params.limit || 20)) + 1;
-    queryParams.append('page', page.toString());
+    if (params.cursor) {
+      queryParams.append('cursor', params.cursor);
+    }
     queryParams.append('page_size', (params.limit || 20).toString());
     
     const url = `${API_BASE_URL}/collaterals/?${queryParams.toString()}`;
@@ -715,17 +716,18 @@ export const listCollateralsMock = async (params = {}) => {
     filteredCollaterals = mockCollaterals.filter(c => c.status === backendStatus);
   }
   
-  // Apply pagination
-  const offset = params.offset || 0;
+  // Apply pagination; the mock's cursor is just the offset of the next page
+  const offset = params.cursor ? parseInt(params.cursor, 10) : 0;
   const limit = params.limit || 20;
   const paginatedCollaterals = filteredCollaterals.slice(offset, offset + limit);
+  const hasMore = offset + limit < filteredCollaterals.length;
   
   return {
     collaterals: paginatedCollaterals,
     total: filteredCollaterals.length,
-    limit: limit,
-    offset: offset,
-    has_more: offset + limit < filteredCollaterals.length
+    page_size: limit,
+    next_cursor: hasMore ? String(offset + limit) : null,
+    has_more: hasMore
   };
 };
 